@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/harness.py
+@brief Shared pieces of the benchmarks: load generation, latency recording and reports.
+
+The benchmarks are ItvTestCase classes, run with itv like any other integration test so their
+app_dependencies get started:
+
+    bin/itv benchmarks/test_rpc_load.py
+
+Each one is configured through ion's config under its module name, e.g. in
+res/config/ionlocal.config:
+
+    'benchmarks.test_rpc_load':{
+        'service' : 'resource_registry',
+        'concurrency' : [1, 10, 100],
+        },
+
+Besides logging a summary, each writes a JSON report named bench_<name>.json to the
+'report_dir' of 'benchmarks.harness', by default the directory trial was started from.
+"""
+
+import os, time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.core import ioninit
+from ion.util.procutils import asleep
+
+from itv_trial import stats, resources, procs
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+ERROR_BACKOFF = 0.01    # seconds a load loop waits after a failed request, so failing fast can't starve the reactor
+
+def is_timeout(ex):
+    """
+    Tells a request that timed out from one that failed.
+    """
+    return isinstance(ex, defer.TimeoutError) or 'Timeout' in ex.__class__.__name__
+
+@defer.inlineCallbacks
+def run_load(request, concurrency, duration):
+    """
+    Keeps concurrency requests in flight for duration seconds: each of concurrency loops calls
+    request() and calls it again as soon as the last one is answered.
+
+    @param request  Callable returning a Deferred for one request.
+    @returns        (deferred) A dict with the concurrency, elapsed seconds, number of requests,
+                    ok, errors and timeouts, throughput (ok per second) and the stats.Histogram
+                    summary of the latency of successful requests.
+    """
+    hist = stats.Histogram()
+    counts = {'ok': 0, 'errors': 0, 'timeouts': 0}
+    deadline = time.time() + duration
+
+    @defer.inlineCallbacks
+    def loop():
+        while time.time() < deadline:
+            sent = time.time()
+            try:
+                yield request()
+            except Exception, ex:
+                if is_timeout(ex):
+                    counts['timeouts'] += 1
+                else:
+                    counts['errors'] += 1
+                    log.debug("Request failed: %s" % ex)
+
+                yield asleep(ERROR_BACKOFF)
+                continue
+
+            hist.record(time.time() - sent)
+            counts['ok'] += 1
+
+    started = time.time()
+    yield defer.DeferredList([loop() for i in range(concurrency)])
+    elapsed = time.time() - started
+
+    defer.returnValue({'concurrency'    : concurrency,
+                       'elapsed'        : elapsed,
+                       'requests'       : counts['ok'] + counts['errors'] + counts['timeouts'],
+                       'ok'             : counts['ok'],
+                       'errors'         : counts['errors'],
+                       'timeouts'       : counts['timeouts'],
+                       'throughput'     : counts['ok'] / elapsed,
+                       'latency'        : hist.summary()})
+
+@defer.inlineCallbacks
+def run_batch(items, fn, concurrency):
+    """
+    Calls fn(item) for every item, with at most concurrency calls outstanding at once.
+
+    @param fn       Callable returning a Deferred.
+    @returns        (deferred) A list of dicts in the order of items, each with the "item", the
+                    seconds its call took once started ("elapsed"), and its "result" or "error"
+                    (the exception raised, None if it worked).
+    """
+    sem = defer.DeferredSemaphore(concurrency)
+    results = [None] * len(items)
+
+    @defer.inlineCallbacks
+    def call(index, item):
+        started = time.time()
+        try:
+            result = yield fn(item)
+        except Exception, ex:
+            results[index] = {'item': item, 'elapsed': time.time() - started, 'result': None, 'error': ex}
+        else:
+            results[index] = {'item': item, 'elapsed': time.time() - started, 'result': result, 'error': None}
+
+    yield defer.DeferredList([sem.run(call, i, x) for i, x in enumerate(items)])
+    defer.returnValue(results)
+
+def find_saturation(results, fraction=0.95):
+    """
+    Finds where adding concurrency stops adding throughput.
+
+    @param results  run_load results at increasing concurrency.
+    @returns        The lowest concurrency that reached fraction of the best throughput.
+    """
+    best = max([x['throughput'] for x in results])
+    for result in results:
+        if result['throughput'] >= best * fraction:
+            return result['concurrency']
+
+def format_latency(summary):
+    """
+    @returns    A one line summary of a stats.Histogram summary, in milliseconds.
+    """
+    if summary['n'] == 0:
+        return "no successful requests"
+
+    keys = [x for x in ['p50', 'p90', 'p99', 'p99.9', 'max'] if summary.get(x) is not None]
+    return "  ".join(["%s %.1fms" % (x, summary[x] * 1000) for x in keys])
+
+def get_container_pids(app):
+    """
+    Finds the containers itv started for this test that run app, e.g. "app_integration" matches
+    the container started with res/apps/app_integration.app.
+
+    @returns    A list of their pids.
+    """
+    pids = []
+    for pid in os.environ.get('ION_TEST_CASE_PIDS', '').split(','):
+        if not pid.isdigit():
+            continue
+
+        cmdline = procs.read_proc_file(int(pid), 'cmdline')
+        if cmdline is not None and app in cmdline:
+            pids.append(int(pid))
+
+    return pids
+
+def get_container_rss(app):
+    """
+    Gets the memory in use by the containers running app (see get_container_pids).
+
+    @returns    The total resident set size in bytes, or None if no such container is running.
+    """
+    total = None
+    for pid in get_container_pids(app):
+        proc_stats = resources.read_proc_stats(pid)
+        if proc_stats is not None:
+            total = (total or 0) + proc_stats[0]
+
+    return total
+
+def get_container_io(app):
+    """
+    Gets the I/O done so far by the containers running app (see get_container_pids).
+
+    @returns    A dict of the resources.read_proc_io counters summed over them, or None if no
+                such container is running.
+    """
+    total = None
+    for pid in get_container_pids(app):
+        counters = resources.read_proc_io(pid)
+        if counters is None:
+            continue
+
+        if total is None:
+            total = dict.fromkeys(counters.keys(), 0)
+        for name, value in counters.items():
+            total[name] = total.get(name, 0) + value
+
+    return total
+
+def get_report_dir():
+    report_dir = CONF.getValue('report_dir', None)
+    if report_dir:
+        return report_dir
+
+    # trial runs tests from inside its _trial_temp directory
+    cwd = os.getcwd()
+    if os.path.basename(cwd).startswith('_trial_temp'):
+        return os.path.dirname(cwd)
+
+    return cwd
+
+def write_report(name, report):
+    """
+    Writes a benchmark report as JSON, adding the time and sysname it was run at.
+
+    @returns    The path written to.
+    """
+    report = dict(report)
+    report['benchmark'] = name
+    report['time'] = time.time()
+    report['sysname'] = os.environ.get('ION_TEST_CASE_SYSNAME')
+
+    path = os.path.join(get_report_dir(), 'bench_%s.json' % name)
+    f = open(path, 'w')
+    json.dump(report, f, indent=2, sort_keys=True)
+    f.close()
+
+    log.info("Wrote %s benchmark report to %s" % (name, path))
+    return path
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/seeder.py
+@brief Bulk-creates dataset/datasource pairs, for benchmarks that need a big catalog.
+
+Each pair is made the way IntTestIngest makes one, plus the metadata findDataResources looks at
+(bounds, time coverage, title) and ownership by the anonymous user so it's found, with the bounds
+spread out by the pair's number so bounded queries match a fraction of them. A batch of pairs is
+put in one resource transaction.
+"""
+
+import time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.util.iontime import IonTime
+from ion.core.object.object_utils import CDM_DATASET_TYPE, CDM_GROUP_TYPE
+from ion.services.coi.datastore_bootstrap.ion_preload_config import HAS_A_ID, OWNED_BY_ID, ANONYMOUS_USER_ID
+
+from benchmarks import harness
+from itv_trial.fixtures.ingestion import DATA_SOURCE_RESOURCE_TYPE
+
+log = ion.util.ionlog.getLogger(__name__)
+
+BATCH_SIZE = 100        # pairs put in each resource transaction
+CONCURRENCY = 4         # transactions in flight at once
+
+def get_metadata(index):
+    """
+    @returns    The root group attributes of seeded dataset number index.
+    """
+    lat = -80.0 + index % 160
+    lon = -180.0 + index * 7 % 359
+    year = 2000 + index % 10
+
+    return [('title', 'Seeded dataset %d' % index),
+            ('institution', 'Benchmark seeder'),
+            ('ion_geospatial_lat_min', lat),
+            ('ion_geospatial_lat_max', lat + 1.0),
+            ('ion_geospatial_lon_min', lon),
+            ('ion_geospatial_lon_max', lon + 1.0),
+            ('ion_geospatial_vertical_min', 0.0),
+            ('ion_geospatial_vertical_max', float(index % 100)),
+            ('ion_geospatial_vertical_positive', 'down'),
+            ('ion_time_coverage_start', '%d-01-01T00:00:00Z' % year),
+            ('ion_time_coverage_end', '%d-12-31T23:59:59Z' % year)]
+
+@defer.inlineCallbacks
+def create_pair(rc, ac, owner, index, dataset_url):
+    """
+    Creates seeded dataset/datasource pair number index, associated but not put yet.
+
+    @returns    (deferred) A tuple of (dataset, datasource).
+    """
+    dataset = yield rc.create_instance(CDM_DATASET_TYPE,
+                                       ResourceName = 'Seeded dataset %d' % index,
+                                       ResourceDescription = 'Dataset seeded for benchmarking')
+
+    group = dataset.CreateObject(CDM_GROUP_TYPE)
+    dataset.root_group = group
+    for name, value in get_metadata(index):
+        if isinstance(value, float):
+            group.AddAttribute(name, group.DataType.DOUBLE, value)
+        else:
+            group.AddAttribute(name, group.DataType.STRING, value)
+
+    datasource = yield rc.create_instance(DATA_SOURCE_RESOURCE_TYPE,
+                                          ResourceName = 'Seeded datasource %d' % index,
+                                          ResourceDescription = 'Datasource seeded for benchmarking')
+
+    datasource.source_type = datasource.SourceType.NETCDF_S
+    datasource.request_type = datasource.RequestType.DAP
+    datasource.dataset_url = dataset_url
+    datasource.max_ingest_millis = 120000
+    datasource.registration_datetime_millis = IonTime().time_ms
+    datasource.ion_title = 'Seeded datasource %d' % index
+    datasource.ion_description = 'Datasource seeded for benchmarking'
+    datasource.update_interval_seconds = 86400
+
+    yield ac.create_association(datasource, HAS_A_ID, dataset)
+    yield ac.create_association(dataset, OWNED_BY_ID, owner)
+    yield ac.create_association(datasource, OWNED_BY_ID, owner)
+
+    defer.returnValue((dataset, datasource))
+
+@defer.inlineCallbacks
+def seed(rc, ac, first, count, dataset_url, batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
+    """
+    Creates pairs number first to first + count - 1, batch_size to a transaction and concurrency
+    transactions at a time.
+
+    @returns    (deferred) A list of (dataset id, datasource id) of the pairs created.
+    """
+    owner = yield rc.get_instance(ANONYMOUS_USER_ID)
+
+    @defer.inlineCallbacks
+    def create_batch(start):
+        resources = []
+        ids = []
+        for index in range(start, min(start + batch_size, first + count)):
+            dataset, datasource = yield create_pair(rc, ac, owner, index, dataset_url)
+            resources.extend([dataset, datasource])
+            ids.append((dataset.ResourceIdentity, datasource.ResourceIdentity))
+
+        yield rc.put_resource_transaction(resources)
+        defer.returnValue(ids)
+
+    started = time.time()
+    results = yield harness.run_batch(range(first, first + count, batch_size), create_batch, concurrency)
+
+    created = []
+    for result in results:
+        if result['error'] is not None:
+            raise result['error']
+        created.extend(result['result'])
+
+    log.info("Seeded %d dataset/datasource pairs in %.1fs" % (len(created), time.time() - started))
+    defer.returnValue(created)
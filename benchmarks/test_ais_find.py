@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_ais_find.py
+@test How findDataResources latency and the AIS container's memory grow with the catalog.
+
+Seeds the catalog (benchmarks.seeder) up to each resource count in turn, then calls
+findDataResources as TestAISProcesses.test_memory_footprint does, with no bounds and with
+spatial/temporal bounds, noting the AIS container's memory after each count. The AIS runs in its
+own container, as in TestAISProcesses, so its memory is its own. Configured under
+'benchmarks.test_ais_find':
+
+    resource_counts - dataset/datasource pairs to grow the catalog to, default 100 to 50000.
+    repeats         - findDataResources calls at each count and bounds.
+    bounds          - fields set on the bounded request, default a 20 degree box over one year.
+    seed_batch      - pairs put in each resource transaction while seeding.
+    seed_concurrency - transactions in flight at once while seeding.
+"""
+
+import time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process.process import Process
+from ion.core.messaging.message_client import MessageClient
+from ion.services.coi.resource_registry.resource_client import ResourceClient
+from ion.services.coi.resource_registry.association_client import AssociationClient
+from ion.integration.ais.app_integration_service import AppIntegrationServiceClient
+from ion.integration.ais.ais_object_identifiers import AIS_REQUEST_MSG_TYPE, AIS_RESPONSE_ERROR_TYPE
+from ion.integration.ais.ais_object_identifiers import FIND_DATA_RESOURCES_REQ_MSG_TYPE
+from ion.services.coi.datastore_bootstrap.ion_preload_config import ANONYMOUS_USER_ID
+
+from itv_trial import stats
+from benchmarks import harness, seeder
+from itv_trial.fixtures import ingestion
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+DEFAULT_RESOURCE_COUNTS = [100, 1000, 10000, 50000]
+DEFAULT_BOUNDS = {'minLatitude'  : -10.0,
+                  'maxLatitude'  : 10.0,
+                  'minLongitude' : -10.0,
+                  'maxLongitude' : 10.0,
+                  'minTime'      : '2005-01-01T00:00:00Z',
+                  'maxTime'      : '2005-12-31T23:59:59Z'}
+
+class AisFindBenchmark(ItvTestCase):
+
+    app_dependencies = ["res/apps/datastore.app",
+                        "res/apps/association.app",
+                        "res/apps/resource_registry.app",
+                        "res/apps/ems.app",
+                        "res/apps/attributestore.app",
+                        "res/apps/identity_registry.app",
+                        "res/apps/pubsub.app",
+                        "res/apps/scheduler.app",
+                        "res/apps/dataset_controller.app",
+                        "res/apps/app_integration.app"
+                        ]
+
+    timeout = 3600 * 6
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+        proc = Process()
+        yield proc.spawn()
+
+        self.mc = MessageClient(proc=proc)
+        self.rc = ResourceClient(proc=proc)
+        self.ac = AssociationClient(proc=proc)
+        self.aisc = AppIntegrationServiceClient(proc=proc)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def _find(self, bounds):
+        """
+        @returns    (deferred) A tuple of the seconds findDataResources took and how many it found.
+        """
+        reqMsg = yield self.mc.create_instance(AIS_REQUEST_MSG_TYPE)
+        reqMsg.message_parameters_reference = reqMsg.CreateObject(FIND_DATA_RESOURCES_REQ_MSG_TYPE)
+        reqMsg.message_parameters_reference.user_ooi_id = ANONYMOUS_USER_ID
+        for field, value in bounds.items():
+            setattr(reqMsg.message_parameters_reference, field, value)
+
+        started = time.time()
+        rspMsg = yield self.aisc.findDataResources(reqMsg)
+        elapsed = time.time() - started
+
+        if rspMsg.MessageType == AIS_RESPONSE_ERROR_TYPE:
+            self.fail("findDataResources failed: " + rspMsg.error_str)
+
+        defer.returnValue((elapsed, len(rspMsg.message_parameters_reference[0].dataResourceSummary)))
+
+    @defer.inlineCallbacks
+    def _measure(self, bounds, repeats):
+        latencies = []
+        found = None
+        for i in range(repeats):
+            elapsed, found = yield self._find(bounds)
+            latencies.append(elapsed)
+
+        defer.returnValue({'found': found, 'latency': stats.summarize(latencies)})
+
+    @defer.inlineCallbacks
+    def test_find_scaling(self):
+        counts = CONF.getValue('resource_counts', DEFAULT_RESOURCE_COUNTS)
+        repeats = CONF.getValue('repeats', 5)
+        bounds = CONF.getValue('bounds', DEFAULT_BOUNDS)
+        batch_size = CONF.getValue('seed_batch', seeder.BATCH_SIZE)
+        concurrency = CONF.getValue('seed_concurrency', seeder.CONCURRENCY)
+
+        results = []
+        seeded = 0
+        for count in sorted(counts):
+            started = time.time()
+            created = yield seeder.seed(self.rc, self.ac, seeded, count - seeded, ingestion.REMOTE_DATASET_URL,
+                                        batch_size, concurrency)
+            seed_time = time.time() - started
+            seeded += len(created)
+
+            unbounded = yield self._measure({}, repeats)
+            bounded = yield self._measure(bounds, repeats)
+            rss = harness.get_container_rss('app_integration')
+
+            results.append({'resources' : seeded,
+                            'seed_time' : seed_time,
+                            'unbounded' : unbounded,
+                            'bounded'   : bounded,
+                            'ais_rss'   : rss})
+
+            log.info("%d resources: unbounded found %d, p50 %.3fs; bounded found %d, p50 %.3fs; AIS rss %s MB" %
+                     (seeded, unbounded['found'], unbounded['latency']['p50'], bounded['found'],
+                      bounded['latency']['p50'], rss is not None and rss / 1024 / 1024 or '?'))
+
+        harness.write_report('ais_find', {'repeats': repeats, 'bounds': bounds, 'levels': results})
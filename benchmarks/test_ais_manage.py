@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_ais_manage.py
+@test Bulk createDataResource, updateDataResource and deleteDataResource through the AIS.
+
+At each concurrency level, creates a number of data resources with the same requests
+IntTestAisManageDataResource makes, updates each of them, then deletes them all, batch_size
+ids to a deleteDataResource call (its data_source_resource_id field is repeated). For each
+operation it reports latency percentiles, resources per second, and how many bytes the datastore
+container wrote per resource, from /proc/<pid>/io: 'wchar' counts everything it wrote, including
+to the storage backend and replies, 'write_bytes' only what reached local storage. The datastore
+runs in its own container so those are its own. Configured under 'benchmarks.test_ais_manage':
+
+    resources   - data resources to create, update and delete at each level.
+    concurrency - list of how many calls to have outstanding at once.
+    batch_size  - ids deleted by each deleteDataResource call.
+    dataset_url - what the data resources point at, by default the thredds dataset
+                  IntTestAisManageDataResource uses. The AIS only registers it, nothing fetches it.
+"""
+
+import time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process.process import Process
+from ion.core.messaging.message_client import MessageClient
+from ion.integration.ais.app_integration_service import AppIntegrationServiceClient
+from ion.integration.ais.ais_object_identifiers import AIS_RESPONSE_MSG_TYPE, \
+                                                       AIS_REQUEST_MSG_TYPE, \
+                                                       CREATE_DATA_RESOURCE_REQ_TYPE, \
+                                                       UPDATE_DATA_RESOURCE_REQ_TYPE, \
+                                                       DELETE_DATA_RESOURCE_REQ_TYPE
+
+from itv_trial import stats
+from benchmarks import harness
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+USER_ID = "A3D5D4A0-7265-4EF2-B0AD-3CE2DC7252D8"
+DEFAULT_CONCURRENCY = [1, 10]
+DEFAULT_DATASET_URL = "http://thredds1.pfeg.noaa.gov/thredds/dodsC/satellite/GR/ssta/1day"
+
+class AisManageBenchmark(ItvTestCase):
+
+    app_dependencies = ["res/apps/datastore.app",
+                        "res/apps/association.app",
+                        "res/apps/resource_registry.app",
+                        "res/apps/ems.app",
+                        "res/apps/attributestore.app",
+                        "res/apps/identity_registry.app",
+                        "res/apps/pubsub.app",
+                        "res/apps/scheduler.app",
+                        "res/apps/dataset_controller.app",
+                        "res/apps/app_integration.app"
+                        ]
+
+    timeout = 3600 * 6
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+        proc = Process()
+        yield proc.spawn()
+
+        self.mc = MessageClient(proc=proc)
+        self.aisc = AppIntegrationServiceClient(proc=proc)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    def _check_response(self, result_wrapped, operation):
+        self.failUnlessEqual(result_wrapped.MessageType, AIS_RESPONSE_MSG_TYPE, "%s had an internal failure" % operation)
+        self.failUnlessEqual(200, result_wrapped.result, "%s didn't return 200 OK" % operation)
+        return result_wrapped.message_parameters_reference[0]
+
+    @defer.inlineCallbacks
+    def _create(self, index):
+        ais_req_msg = yield self.mc.create_instance(AIS_REQUEST_MSG_TYPE)
+        create_req_msg = ais_req_msg.CreateObject(CREATE_DATA_RESOURCE_REQ_TYPE)
+        ais_req_msg.message_parameters_reference = create_req_msg
+
+        create_req_msg.user_id                       = USER_ID
+        create_req_msg.source_type                   = create_req_msg.SourceType.NETCDF_S
+        create_req_msg.request_type                  = create_req_msg.RequestType.DAP
+        create_req_msg.ion_description               = "Benchmark data resource %d" % index
+        create_req_msg.ion_institution_id            = "Benchmark"
+        create_req_msg.update_start_datetime_millis  = 30000
+        create_req_msg.ion_title                     = "Benchmark data resource %d" % index
+        create_req_msg.update_interval_seconds       = 3600
+        create_req_msg.dataset_url                   = CONF.getValue('dataset_url', DEFAULT_DATASET_URL)
+
+        result_wrapped = yield self.aisc.createDataResource(ais_req_msg)
+        result = self._check_response(result_wrapped, "createDataResource")
+        defer.returnValue(result.data_source_id)
+
+    @defer.inlineCallbacks
+    def _update(self, data_source_id):
+        ais_req_msg = yield self.mc.create_instance(AIS_REQUEST_MSG_TYPE)
+        update_req_msg = ais_req_msg.CreateObject(UPDATE_DATA_RESOURCE_REQ_TYPE)
+        ais_req_msg.message_parameters_reference = update_req_msg
+
+        update_req_msg.data_source_resource_id      = data_source_id
+        update_req_msg.update_interval_seconds      = 7200
+        update_req_msg.ion_title                    = "Benchmark data resource updated"
+
+        result_wrapped = yield self.aisc.updateDataResource(ais_req_msg)
+        result = self._check_response(result_wrapped, "updateDataResource")
+        self.failUnlessEqual(result.success, True, "updateDataResource didn't report success")
+
+    @defer.inlineCallbacks
+    def _delete(self, data_source_ids):
+        ais_req_msg = yield self.mc.create_instance(AIS_REQUEST_MSG_TYPE)
+        delete_req_msg = ais_req_msg.CreateObject(DELETE_DATA_RESOURCE_REQ_TYPE)
+        ais_req_msg.message_parameters_reference = delete_req_msg
+
+        for data_source_id in data_source_ids:
+            delete_req_msg.data_source_resource_id.append(data_source_id)
+
+        result_wrapped = yield self.aisc.deleteDataResource(ais_req_msg)
+        result = self._check_response(result_wrapped, "deleteDataResource")
+        self.failUnlessEqual(len(data_source_ids), len(result.successfully_deleted_id),
+                             "Expected %d deletions, got %d" % (len(data_source_ids), len(result.successfully_deleted_id)))
+
+    @defer.inlineCallbacks
+    def _run_operation(self, items, fn, concurrency, resources):
+        """
+        Calls fn for each of items, concurrency at a time, noting what the datastore wrote meanwhile.
+
+        @param resources    Number of resources the calls act on in all.
+        @returns            (deferred) A tuple of the operation's report and the results of the calls.
+        """
+        io_before = harness.get_container_io('datastore')
+        started = time.time()
+        results = yield harness.run_batch(items, fn, concurrency)
+        elapsed = time.time() - started
+        io_after = harness.get_container_io('datastore')
+
+        errors = [x for x in results if x['error'] is not None]
+        for x in errors[:5]:
+            log.warn("%s failed: %s" % (fn.__name__, x['error']))
+
+        report = {'calls'                   : len(items),
+                  'resources'               : resources,
+                  'errors'                  : len(errors),
+                  'elapsed'                 : elapsed,
+                  'resources_per_second'    : resources / elapsed,
+                  'latency'                 : stats.summarize([x['elapsed'] for x in results if x['error'] is None])}
+
+        if io_before is not None and io_after is not None and resources:
+            for counter in ['wchar', 'write_bytes']:
+                report['datastore_%s_per_resource' % counter] = (io_after[counter] - io_before[counter]) / float(resources)
+
+        defer.returnValue((report, results))
+
+    @defer.inlineCallbacks
+    def test_bulk_manage(self):
+        count = CONF.getValue('resources', 200)
+        levels = CONF.getValue('concurrency', DEFAULT_CONCURRENCY)
+        batch_size = CONF.getValue('batch_size', 10)
+
+        results = []
+        for level in levels:
+            create, created = yield self._run_operation(range(count), self._create, level, count)
+            ids = [x['result'] for x in created if x['error'] is None]
+
+            update, updated = yield self._run_operation(ids, self._update, level, len(ids))
+
+            batches = [ids[x:x + batch_size] for x in range(0, len(ids), batch_size)]
+            delete, deleted = yield self._run_operation(batches, self._delete, level, len(ids))
+
+            results.append({'concurrency': level, 'batch_size': batch_size,
+                            'create': create, 'update': update, 'delete': delete})
+
+            for name, report in [('create', create), ('update', update), ('delete', delete)]:
+                log.info("%s x%d at concurrency %d: %.1f resources/s, p50 %.3fs p99 %.3fs, %d errors, datastore wrote %s bytes/resource" %
+                         (name, report['resources'], level, report['resources_per_second'],
+                          report['latency']['p50'] or 0, report['latency']['p99'] or 0, report['errors'],
+                          report.get('datastore_wchar_per_resource', '?')))
+
+        harness.write_report('ais_manage', {'resources': count, 'batch_size': batch_size, 'levels': results})
+
+        errors = sum([x[y]['errors'] for x in results for y in ['create', 'update', 'delete']])
+        self.failIf(errors > 0, "%d calls failed, see the report" % errors)
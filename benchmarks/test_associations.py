@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_associations.py
+@test How association service query latency grows with the number of associations.
+
+Grows the association graph on bootlevel4's Cassandra backed datastore to each association count
+in turn, by seeding dataset/datasource pairs (benchmarks.seeder), then times the queries the AIS
+and ingestion make of the association service. Each pair adds ASSOCIATIONS_PER_PAIR: the seeder's
+datasource HAS_A dataset and both OWNED_BY the anonymous user, plus the TYPE_OF and
+HAS_LIFE_CYCLE_STATE the registry gives each of the two resources, which the by-type queries walk.
+The counts are of these seeded associations; the preloaded ones come on top at every size.
+
+    by_subject      - get_objects of a seeded datasource's HAS_A, which finds its dataset.
+    by_object       - get_subjects of HAS_A a seeded dataset, which finds its datasource.
+    by_type_and_lcs - get_subjects of TYPE_OF dataset and HAS_LIFE_CYCLE_STATE ACTIVE, as
+                      AssociationServiceTest.test_association_by_type_and_lcs does. Seeded datasets
+                      are new, so this finds the same preloaded datasets however big the graph.
+    by_type_new     - the same with HAS_LIFE_CYCLE_STATE NEW, which finds every seeded dataset.
+
+The first three find the same number of results at every size, so their latency should stay
+about flat; "growth" in the report is how their p50 grew against the association count between
+the smallest and largest size, as an exponent (1.0 is linear), or None for a query whose p50
+didn't change or was too small to measure. If fewer than two sizes were run, "growth" itself is
+None. Configured under
+'benchmarks.test_associations':
+
+    association_counts  - association counts to grow the graph to, default 10k to 1M.
+    repeats             - times each query is made at each size, against different pairs.
+    seed_batch          - pairs put in each resource transaction while seeding.
+    seed_concurrency    - transactions in flight at once while seeding.
+"""
+
+import math, random, time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process.process import Process
+from ion.services.coi.resource_registry.resource_client import ResourceClient
+from ion.services.coi.resource_registry.association_client import AssociationClient
+from ion.services.dm.inventory.association_service import AssociationServiceClient
+from ion.services.dm.inventory.association_service import PREDICATE_OBJECT_QUERY_TYPE, SUBJECT_PREDICATE_QUERY_TYPE, \
+                                                          IDREF_TYPE, PREDICATE_REFERENCE_TYPE, LCS_REFERENCE_TYPE
+from ion.services.coi.datastore_bootstrap.ion_preload_config import HAS_A_ID, TYPE_OF_ID, HAS_LIFE_CYCLE_STATE_ID, \
+                                                                    DATASET_RESOURCE_TYPE_ID
+
+from itv_trial import stats
+from benchmarks import harness, seeder
+from itv_trial.fixtures import ingestion
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+DEFAULT_ASSOCIATION_COUNTS = [10000, 100000, 1000000]
+SEEDED_PER_PAIR = 3         # datasource HAS_A dataset, dataset and datasource OWNED_BY anonymous
+IMPLICIT_PER_RESOURCE = 2   # TYPE_OF and HAS_LIFE_CYCLE_STATE, made by the registry on put
+ASSOCIATIONS_PER_PAIR = SEEDED_PER_PAIR + 2 * IMPLICIT_PER_RESOURCE
+QUERIES = ['by_subject', 'by_object', 'by_type_and_lcs', 'by_type_new']
+
+class AssociationQueryBenchmark(ItvTestCase):
+
+    app_dependencies = ["res/deploy/bootlevel4.rel"]
+
+    timeout = 3600 * 12
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+        self.proc = Process()
+        yield self.proc.spawn()
+
+        self.rc = ResourceClient(proc=self.proc)
+        self.ac = AssociationClient(proc=self.proc)
+        self.asc = AssociationServiceClient(proc=self.proc)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    def _add_pair(self, request, predicate, obj):
+        pair = request.pairs.add()
+
+        pref = request.CreateObject(PREDICATE_REFERENCE_TYPE)
+        pref.key = predicate
+        pair.predicate = pref
+
+        pair.object = obj
+        return pair
+
+    def _idref(self, request, key):
+        ref = request.CreateObject(IDREF_TYPE)
+        ref.key = key
+        return ref
+
+    @defer.inlineCallbacks
+    def _by_subject(self, datasource_id):
+        request = yield self.proc.message_client.create_instance(SUBJECT_PREDICATE_QUERY_TYPE)
+        pair = request.pairs.add()
+
+        pref = request.CreateObject(PREDICATE_REFERENCE_TYPE)
+        pref.key = HAS_A_ID
+        pair.predicate = pref
+        pair.subject = self._idref(request, datasource_id)
+
+        result = yield self.asc.get_objects(request)
+        defer.returnValue(len(result.idrefs))
+
+    @defer.inlineCallbacks
+    def _by_object(self, dataset_id):
+        request = yield self.proc.message_client.create_instance(PREDICATE_OBJECT_QUERY_TYPE)
+        self._add_pair(request, HAS_A_ID, self._idref(request, dataset_id))
+
+        result = yield self.asc.get_subjects(request)
+        defer.returnValue(len(result.idrefs))
+
+    @defer.inlineCallbacks
+    def _by_type_and_lcs(self, new=False):
+        request = yield self.proc.message_client.create_instance(PREDICATE_OBJECT_QUERY_TYPE)
+        self._add_pair(request, TYPE_OF_ID, self._idref(request, DATASET_RESOURCE_TYPE_ID))
+
+        state_ref = request.CreateObject(LCS_REFERENCE_TYPE)
+        if new:
+            state_ref.lcs = state_ref.LifeCycleState.NEW
+        else:
+            state_ref.lcs = state_ref.LifeCycleState.ACTIVE
+        self._add_pair(request, HAS_LIFE_CYCLE_STATE_ID, state_ref)
+
+        result = yield self.asc.get_subjects(request)
+        defer.returnValue(len(result.idrefs))
+
+    @defer.inlineCallbacks
+    def _measure(self, query, repeats):
+        latencies = []
+        found = []
+        for i in range(repeats):
+            started = time.time()
+            count = yield query()
+            latencies.append(time.time() - started)
+            found.append(count)
+
+        defer.returnValue({'found': max(found), 'latency': stats.summarize(latencies)})
+
+    @defer.inlineCallbacks
+    def test_query_scaling(self):
+        counts = CONF.getValue('association_counts', DEFAULT_ASSOCIATION_COUNTS)
+        repeats = CONF.getValue('repeats', 20)
+        batch_size = CONF.getValue('seed_batch', seeder.BATCH_SIZE)
+        concurrency = CONF.getValue('seed_concurrency', seeder.CONCURRENCY)
+
+        rand = random.Random(0)
+        pairs = []
+        results = []
+        for count in sorted(counts):
+            wanted = max(count // ASSOCIATIONS_PER_PAIR - len(pairs), 0)
+            started = time.time()
+            created = yield seeder.seed(self.rc, self.ac, len(pairs), wanted, ingestion.REMOTE_DATASET_URL,
+                                        batch_size, concurrency)
+            seed_time = time.time() - started
+            pairs.extend(created)
+
+            sample = [rand.choice(pairs) for i in range(repeats)]
+            datasources = iter([x[1] for x in sample])
+            datasets = iter([x[0] for x in sample])
+
+            level = {'associations' : len(pairs) * ASSOCIATIONS_PER_PAIR,
+                     'pairs'        : len(pairs),
+                     'seed_time'    : seed_time}
+            level['by_subject'] = yield self._measure(lambda: self._by_subject(datasources.next()), repeats)
+            level['by_object'] = yield self._measure(lambda: self._by_object(datasets.next()), repeats)
+            level['by_type_and_lcs'] = yield self._measure(self._by_type_and_lcs, repeats)
+            level['by_type_new'] = yield self._measure(lambda: self._by_type_and_lcs(new=True), repeats)
+            results.append(level)
+
+            log.info("%d associations: %s" % (level['associations'], ", ".join(
+                     ["%s found %d p50 %.3fs" % (x, level[x]['found'], level[x]['latency']['p50']) for x in QUERIES])))
+
+        growth = None
+        if len(results) > 1 and results[-1]['associations'] > results[0]['associations']:
+            growth = {}
+            first, last = results[0], results[-1]
+            for query in QUERIES:
+                before, after = first[query]['latency']['p50'], last[query]['latency']['p50']
+                if before and after and before > 0 and after > 0 and before != after:
+                    growth[query] = math.log(after / before) / \
+                                    math.log(float(last['associations']) / first['associations'])
+                else:
+                    growth[query] = None
+            log.info("p50 growth exponents: %s" % ", ".join(["%s %s" % (x, growth[x] is None and '-' or '%.2f' % growth[x])
+                                                             for x in QUERIES]))
+
+        harness.write_report('associations', {'repeats': repeats, 'levels': results, 'growth': growth})
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_attribute_store.py
+@test Throughput and latency of the attribute store under a mixed get/put load.
+
+Fills a key space with values of a given size, then keeps a number of AttributeStoreClient
+requests in flight (harness.run_load), each a get or a put of a random key in the configured
+ratio, at each concurrency level in turn. Reports ops/s and the latency of gets and puts apart.
+
+MultiAttributeStoreBenchmark runs the same against two attributestore apps, told apart with
+"id=" args as in the itv_trial docstring. Both take requests off the one 'attributestore'
+queue, so the load is spread over them, but each keeps its own store: a get that lands on the
+instance that didn't take the key's put comes back empty, and is counted in "misses".
+Configured under 'benchmarks.test_attribute_store':
+
+    key_space   - number of distinct keys.
+    value_size  - bytes in each value.
+    read_ratio  - fraction of requests that are gets, the rest are puts.
+    concurrency - list of in flight request counts to run at.
+    duration    - seconds to run each concurrency level for.
+"""
+
+import random, time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process.process import Process
+from ion.services.coi.attributestore import AttributeStoreClient
+
+from itv_trial import stats
+from benchmarks import harness
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+DEFAULT_CONCURRENCY = [1, 10, 50, 100]
+FILL_CONCURRENCY = 10
+
+def get_key(index):
+    return "bench-key-%d" % index
+
+def get_value(index, version, size):
+    """
+    A value of size bytes, different for each key and each put of it.
+    """
+    prefix = "%d:%d:" % (index, version)
+    return prefix + "x" * max(size - len(prefix), 0)
+
+class AttributeStoreBenchmark(ItvTestCase):
+
+    app_dependencies = ["res/apps/attributestore.app"]
+
+    timeout = 3600
+
+    report_name = 'attribute_store'
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+        proc = Process()
+        yield proc.spawn()
+
+        self.asc = AttributeStoreClient(proc=proc)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def test_mixed_load(self):
+        key_space = CONF.getValue('key_space', 1000)
+        value_size = CONF.getValue('value_size', 1024)
+        read_ratio = CONF.getValue('read_ratio', 0.9)
+        levels = CONF.getValue('concurrency', DEFAULT_CONCURRENCY)
+        duration = CONF.getValue('duration', 10)
+
+        self.failUnless(0.0 <= read_ratio <= 1.0, "read_ratio must be 0 to 1, not %s" % read_ratio)
+
+        started = time.time()
+        filled = yield harness.run_batch(range(key_space),
+                                         lambda i: self.asc.put(get_key(i), get_value(i, 0, value_size)),
+                                         FILL_CONCURRENCY)
+        errors = [x['error'] for x in filled if x['error'] is not None]
+        self.failIf(errors, "%d of %d puts failed filling the key space, the first: %s" %
+                            (len(errors), key_space, errors and errors[0]))
+        log.info("Put %d keys of %d bytes in %.1fs" % (key_space, value_size, time.time() - started))
+
+        versions = [0] * key_space
+        rand = random.Random(0)
+
+        results = []
+        for level in levels:
+            hists = {'get': stats.Histogram(), 'put': stats.Histogram()}
+            counts = {'get': 0, 'put': 0, 'misses': 0}
+
+            @defer.inlineCallbacks
+            def request():
+                index = rand.randrange(key_space)
+                sent = time.time()
+                if rand.random() < read_ratio:
+                    op = 'get'
+                    value = yield self.asc.get(get_key(index))
+                    if not value:
+                        counts['misses'] += 1
+                else:
+                    op = 'put'
+                    versions[index] += 1
+                    yield self.asc.put(get_key(index), get_value(index, versions[index], value_size))
+
+                hists[op].record(time.time() - sent)
+                counts[op] += 1
+
+            result = yield harness.run_load(request, level, duration)
+            for op in ['get', 'put']:
+                result[op] = {'ok': counts[op], 'throughput': counts[op] / result['elapsed'],
+                              'latency': hists[op].summary()}
+            result['misses'] = counts['misses']
+            results.append(result)
+
+            log.info("Attribute store at concurrency %d: %.1f ops/s, %d errors, %d timeouts, %d misses" %
+                     (level, result['throughput'], result['errors'], result['timeouts'], result['misses']))
+            for op in ['get', 'put']:
+                log.info("    %s: %.1f ops/s, %s" % (op, result[op]['throughput'], harness.format_latency(result[op]['latency'])))
+
+        harness.write_report(self.report_name, {'instances'  : len(self.app_dependencies),
+                                                'key_space'  : key_space,
+                                                'value_size' : value_size,
+                                                'read_ratio' : read_ratio,
+                                                'duration'   : duration,
+                                                'levels'     : results,
+                                                'saturation' : harness.find_saturation(results)})
+
+class MultiAttributeStoreBenchmark(AttributeStoreBenchmark):
+
+    app_dependencies = [("res/apps/attributestore.app", "id=1"),
+                        ("res/apps/attributestore.app", "id=2")]
+
+    report_name = 'attribute_store_multi'
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_datastore_pull.py
+@test Throughput of pulling and checking out the preloaded datastore repositories.
+
+Pulls every resource type, identity and predicate repository that Bootlevel4ReadyTest checks,
+then checks out its master branch, at each concurrency level in turn (1 is the serial loop the
+test does). Every level uses a new process, so nothing is cached in its workbench. Configured
+under 'benchmarks.test_datastore_pull':
+
+    concurrency - list of how many pulls to have outstanding at once.
+"""
+
+import time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process.process import Process
+from ion.services.coi.datastore_bootstrap.ion_preload_config import ION_PREDICATES, ION_RESOURCE_TYPES, ION_IDENTITIES
+from ion.services.coi.datastore_bootstrap.ion_preload_config import CONTENT_ARGS_CFG
+from ion.services.coi.datastore import ID_CFG
+
+from itv_trial import stats
+from benchmarks import harness
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+DEFAULT_CONCURRENCY = [1, 4, 16, 64]
+
+def get_preload_repo_names():
+    """
+    Gets the names of the repositories the datastore preloads, as Bootlevel4ReadyTest checks them.
+    """
+    repo_names = []
+
+    defaults = {}
+    defaults.update(ION_RESOURCE_TYPES)
+    defaults.update(ION_IDENTITIES)
+    for key, value in defaults.items():
+        c_args = value.get(CONTENT_ARGS_CFG)
+        if c_args and not c_args.get('filename'):
+            continue
+
+        repo_names.append(value[ID_CFG])
+
+    for key, value in ION_PREDICATES.items():
+        repo_names.append(value[ID_CFG])
+
+    return repo_names
+
+def measure_repository(repo):
+    """
+    Counts the objects a pulled repository holds in the workbench, and their serialized size.
+
+    @returns    A tuple of (objects, bytes).
+    """
+    objects = 0
+    size = 0
+    for element in repo.index_hash.values():
+        objects += 1
+        size += len(element.value)
+
+    return (objects, size)
+
+class DatastorePullBenchmark(ItvTestCase):
+
+    app_dependencies = ["res/deploy/bootlevel4.rel"]
+
+    timeout = 3600
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def _pull_all(self, repo_names, concurrency):
+        p = Process()
+        yield p.spawn()
+
+        @defer.inlineCallbacks
+        def pull(repo_name):
+            started = time.time()
+            result = yield p.workbench.pull('datastore', repo_name)
+            self.assertEqual(result.MessageResponseCode, result.ResponseCodes.OK)
+            pulled = time.time()
+
+            repo = p.workbench.get_repository(repo_name)
+            yield repo.checkout(branchname='master')
+            checkedout = time.time()
+
+            objects, size = measure_repository(repo)
+            defer.returnValue({'pull': pulled - started, 'checkout': checkedout - pulled, 'objects': objects, 'bytes': size})
+
+        started = time.time()
+        results = yield harness.run_batch(repo_names, pull, concurrency)
+        elapsed = time.time() - started
+
+        done = [x['result'] for x in results if x['error'] is None]
+        objects = sum([x['objects'] for x in done])
+        size = sum([x['bytes'] for x in done])
+
+        repos = {}
+        for x in results:
+            if x['error'] is None:
+                repos[x['item']] = x['result']
+            else:
+                repos[x['item']] = {'error': str(x['error'])}
+
+        defer.returnValue({'concurrency'        : concurrency,
+                           'elapsed'            : elapsed,
+                           'errors'             : len(results) - len(done),
+                           'objects'            : objects,
+                           'bytes'              : size,
+                           'objects_per_second' : objects / elapsed,
+                           'bytes_per_second'   : size / elapsed,
+                           'latency'            : stats.summarize([x['elapsed'] for x in results if x['error'] is None]),
+                           'repos'              : repos})
+
+    @defer.inlineCallbacks
+    def test_pull_checkout(self):
+        levels = CONF.getValue('concurrency', DEFAULT_CONCURRENCY)
+        repo_names = get_preload_repo_names()
+
+        results = []
+        for level in levels:
+            result = yield self._pull_all(repo_names, level)
+            results.append(result)
+
+            log.info("%d repos at concurrency %d: %.2fs, %.1f objects/s, %.1f KB/s, %d errors, p50 %.3fs p95 %.3fs" %
+                     (len(repo_names), level, result['elapsed'], result['objects_per_second'],
+                      result['bytes_per_second'] / 1024, result['errors'],
+                      result['latency']['p50'] or 0, result['latency']['p95'] or 0))
+
+        harness.write_report('datastore_pull', {'repos': len(repo_names), 'levels': results})
+
+        errors = sum([x['errors'] for x in results])
+        self.failIf(errors > 0, "%d pulls failed, see the report" % errors)
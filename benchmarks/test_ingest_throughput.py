@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_ingest_throughput.py
+@test Ingestion latency and throughput of the JavaAgentWrapper, through both update paths.
+
+Creates a number of dataset/datasource pairs the way IntTestIngest does, then triggers an update
+of all of them at once, either by rpc (JavaAgentWrapperClient.request_update) or by publishing the
+scheduler's perform ingestion event. The latency of each is from its trigger to the supplement
+added event for its dataset. Configured under 'benchmarks.test_ingest_throughput':
+
+    datasets        - number of dataset/datasource pairs to ingest.
+    concurrency     - most triggers outstanding at once, default all of them.
+    dataset_url     - what the datasources point at, by default test_data/USGS_Test.nc from the
+                      local stand-in server (res/apps/ncserver.app), so the numbers don't depend
+                      on a remote server. Shape its bandwidth and latency in the config of
+                      'itv_trial.fixtures.ncservice'.
+    ingest_timeout  - seconds to wait for all the supplement added events.
+
+test_ingest_sizes ingests synthetic datasets from ncserver instead, one after another, for a
+curve of throughput against size:
+
+    feature_types       - synthetic feature types to ingest, default station, profile and grid.
+    sizes               - sizes of each, default 1MB and 10MB.
+    size_datasets       - datasets of each size to ingest at once, default 1.
+    size_ingest_timeout - seconds to wait for each size to ingest.
+"""
+
+import time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process import process
+from ion.services.coi.resource_registry import resource_client
+from ion.services.coi.resource_registry import association_client
+from ion.services.dm.distribution.events import DatasetSupplementAddedEventSubscriber
+
+from itv_trial import stats
+from itv_trial.eventwait import EventWait, wait_all
+from benchmarks import harness
+from itv_trial.fixtures import ncserver, ncservice, synthetic, ingestion
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+class IngestThroughputBenchmark(ItvTestCase):
+
+    app_dependencies = [
+                ("res/deploy/bootlevel4_local.rel", "id=1"),
+                ("res/deploy/bootlevel5.rel", "id=1"),
+                ("res/apps/pubsub.app", "id=1"),
+                ("res/apps/ingestion.app", "id=1"),
+                ("res/apps/eoiagents.app", "id=1"),
+                ("res/apps/ncserver.app", "id=1"),
+                ]
+
+    timeout = 3600
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+        self.proc = process.Process()
+        yield self.proc.spawn()
+
+        self.rc = resource_client.ResourceClient(proc=self.proc)
+        self.ac = association_client.AssociationClient(proc=self.proc)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def _subscribe_added(self, dataset_id):
+        """
+        @returns    (deferred) A tuple of the subscriber, to terminate when done, and an EventWait of
+                    the supplement added events for the dataset.
+        """
+        added = EventWait(extract=lambda msg: msg['content'].additional_data.datasource_id, unique=True)
+
+        sub = DatasetSupplementAddedEventSubscriber(process=self.proc, origin=dataset_id)
+        sub.ondata = added
+        yield sub.initialize()
+        yield sub.activate()
+        defer.returnValue((sub, added))
+
+    @defer.inlineCallbacks
+    def _ingest(self, name, trigger, dataset_url, count, concurrency, ingest_timeout):
+        """
+        @returns    (deferred) The report of ingesting count datasets from dataset_url.
+        """
+        pairs = []
+        added = {}
+        subs = []
+        try:
+            for i in range(count):
+                dataset, datasource = yield ingestion.create_ingest_resources(self.rc, self.ac, dataset_url,
+                                                                              title="Ingest benchmark %d" % i,
+                                                                              max_ingest_millis=int(ingest_timeout * 1000))
+                pairs.append((dataset.ResourceIdentity, datasource.ResourceIdentity))
+                sub, added[dataset.ResourceIdentity] = yield self._subscribe_added(dataset.ResourceIdentity)
+                subs.append(sub)
+
+            log.info('Created %d datasets for the %s ingest benchmark' % (count, name))
+
+            report = yield self._trigger_all(name, trigger, dataset_url, pairs, added, concurrency, ingest_timeout)
+        finally:
+            # one container runs every batch, so don't leave each batch's subscribers behind
+            for sub in subs:
+                yield sub.terminate()
+
+        defer.returnValue(report)
+
+    @defer.inlineCallbacks
+    def _trigger_all(self, name, trigger, dataset_url, pairs, added, concurrency, ingest_timeout):
+        """
+        Triggers an update of each pair and waits for the supplement added events.
+
+        @returns    (deferred) The report of the ingest.
+        """
+        count = len(pairs)
+
+        triggered = {}
+        def trigger_one(pair):
+            triggered[pair[0]] = time.time()
+            return trigger(*pair)
+
+        started = time.time()
+        results = yield harness.run_batch(pairs, trigger_one, concurrency)
+        failed = [x['item'][0] for x in results if x['error'] is not None]
+        for x in results:
+            if x['error'] is not None:
+                log.warn("Triggering %s failed: %s" % (x['item'][0], x['error']))
+
+        # stop waiting at the deadline, whatever hasn't arrived by then is missing
+        waiting = [added[x[0]] for x in pairs if x[0] not in failed]
+        yield wait_all(waiting, 1, started + ingest_timeout - time.time())
+
+        arrived = dict([(x, added[x].times[0]) for x in added if len(added[x]) > 0])
+        latencies = [arrived[x] - triggered[x] for x in arrived if x not in failed]
+        finished = max([started] + arrived.values())
+
+        elapsed = finished - started
+        missing = count - len(failed) - len(latencies)
+        report = {'path'                : name,
+                  'datasets'            : count,
+                  'concurrency'         : concurrency,
+                  'dataset_url'         : dataset_url,
+                  'ingested'            : len(latencies),
+                  'failed'              : len(failed),
+                  'missing'             : missing,
+                  'elapsed'             : elapsed,
+                  'datasets_per_minute' : (len(latencies) * 60.0 / elapsed) if latencies else 0.0,
+                  'latency'             : stats.summarize(latencies)}
+
+        log.info("%s ingest of %d datasets from %s: %d ingested, %d failed, %d missing, %.1f datasets/min, p50 %.1fs p95 %.1fs" %
+                 (name, count, dataset_url, len(latencies), len(failed), missing, report['datasets_per_minute'],
+                  report['latency']['p50'] or 0, report['latency']['p95'] or 0))
+
+        defer.returnValue(report)
+
+    @defer.inlineCallbacks
+    def _run_ingest(self, name, trigger):
+        count = CONF.getValue('datasets', 10)
+        dataset_url = yield ingestion.get_dataset_url(self.proc, CONF.getValue('dataset_url', None))
+        report = yield self._ingest(name, trigger, dataset_url, count,
+                                    CONF.getValue('concurrency', count),
+                                    CONF.getValue('ingest_timeout', 600))
+
+        harness.write_report('ingest_%s' % name, report)
+
+        self.failIf(report['failed'] or report['missing'],
+                    "%d updates failed and %d never finished ingesting" % (report['failed'], report['missing']))
+
+    def test_rpc_ingest(self):
+        return self._run_ingest('rpc', ingestion.rpc_call_jaw)
+
+    def test_scheduled_ingest(self):
+        return self._run_ingest('scheduled', lambda dataset_id, datasource_id: ingestion.scheduled_jaw_event(self.proc, dataset_id, datasource_id))
+
+    @defer.inlineCallbacks
+    def test_ingest_sizes(self):
+        """
+        Ingests synthetic datasets of each feature type and size from ncserver by rpc, for a curve of
+        throughput against size.
+        """
+        feature_types = CONF.getValue('feature_types', synthetic.FEATURE_TYPES)
+        sizes = CONF.getValue('sizes', synthetic.DEFAULT_SIZES)
+        count = CONF.getValue('size_datasets', 1)
+        ingest_timeout = CONF.getValue('size_ingest_timeout', 3600)
+
+        base_url = yield ncservice.NcServerClient(proc=self.proc).get_url()
+
+        curve = []
+        for feature_type in feature_types:
+            for size in sizes:
+                report = yield self._ingest('rpc', ingestion.rpc_call_jaw,
+                                            ncserver.synthetic_url(feature_type, size, base_url),
+                                            count, count, ingest_timeout)
+
+                report['feature_type'] = feature_type
+                report['size'] = size
+                report['bytes'] = synthetic.make_dataset_of_size(feature_type, ncserver.parse_size(size)).size
+                report['bytes_per_second'] = report['elapsed'] and report['bytes'] * report['ingested'] / report['elapsed']
+                curve.append(report)
+
+                log.info("%s %s: %.1f MB/s" % (feature_type, size, report['bytes_per_second'] / 1024 / 1024))
+
+        harness.write_report('ingest_sizes', {'datasets': count, 'curve': curve})
+
+        failed = sum([x['failed'] + x['missing'] for x in curve])
+        self.failIf(failed > 0, "%d synthetic datasets didn't ingest, see the report" % failed)
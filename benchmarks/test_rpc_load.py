@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_rpc_load.py
+@test RPC latency and throughput of a service under increasing load.
+
+Sends the same rpc Bootlevel4ReadyTest pings with (Process.rpc_send) as fast as the service
+answers, keeping a fixed number of requests in flight, at each concurrency level in turn.
+Configured under 'benchmarks.test_rpc_load':
+
+    service     - name of the service to load, default 'datastore'. Services outside bootlevel4
+                  need their apps started too, e.g. with an .itv file on the itv command line.
+    operation   - rpc operation to send, default 'ping'.
+    content     - message content, default {}.
+    concurrency - list of in flight request counts to run at, 1 to 1000.
+    duration    - seconds to run each concurrency level for.
+    rpc_timeout - seconds before a request counts as timed out.
+    clients     - number of client processes the requests are spread over.
+"""
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process.process import Process
+
+from benchmarks import harness
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+MAX_CONCURRENCY = 1000
+DEFAULT_CONCURRENCY = [1, 10, 50, 100, 500, 1000]
+
+class RpcLoadBenchmark(ItvTestCase):
+
+    app_dependencies = ["res/deploy/bootlevel4.rel"]
+
+    timeout = 3600
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def test_rpc_load(self):
+        service = CONF.getValue('service', 'datastore')
+        operation = CONF.getValue('operation', 'ping')
+        content = CONF.getValue('content', {})
+        levels = CONF.getValue('concurrency', DEFAULT_CONCURRENCY)
+        duration = CONF.getValue('duration', 10)
+        rpc_timeout = CONF.getValue('rpc_timeout', 10)
+        clients = CONF.getValue('clients', 1)
+
+        for level in levels:
+            self.failUnless(1 <= level <= MAX_CONCURRENCY, "concurrency must be 1 to %d, not %s" % (MAX_CONCURRENCY, level))
+
+        procs = []
+        for i in range(clients):
+            p = Process()
+            yield p.spawn()
+            procs.append(p)
+
+        target = procs[0].get_scoped_name('system', service)
+
+        # make sure it's answering before loading it
+        yield procs[0].rpc_send(target, operation, content)
+
+        sent = [0]
+        def request():
+            # spread requests round robin over the client processes
+            p = procs[sent[0] % len(procs)]
+            sent[0] += 1
+            return p.rpc_send(target, operation, content, timeout=rpc_timeout)
+
+        results = []
+        for level in levels:
+            result = yield harness.run_load(request, level, duration)
+            results.append(result)
+
+            log.info("%s.%s at concurrency %d: %.1f req/s, %d errors, %d timeouts, %s" %
+                     (service, operation, level, result['throughput'], result['errors'],
+                      result['timeouts'], harness.format_latency(result['latency'])))
+
+        saturation = harness.find_saturation(results)
+        log.info("%s.%s saturates at concurrency %d" % (service, operation, saturation))
+
+        harness.write_report('rpc_load', {'service'     : service,
+                                          'operation'   : operation,
+                                          'duration'    : duration,
+                                          'rpc_timeout' : rpc_timeout,
+                                          'clients'     : clients,
+                                          'levels'      : results,
+                                          'saturation'  : saturation})
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+"""
+@file benchmarks/test_schedule_events.py
+@test Delivery latency and loss of scheduler events fanned out to many subscribers.
+
+Publishes schedule events with ScheduleEventPublisher, as the scheduler does when a task fires,
+at each rate in turn for a fixed time, to each number of ScheduleEventSubscribers listening on
+the origin, like ExternalUpdateTest's. Each event carries its number in task_id, so its arrival
+at every subscriber is matched to when it was published. After the last publish it waits until
+every subscriber has every event, or drain_timeout passes, and counts what hasn't arrived as
+lost. The highest rate that was kept up with and lost nothing, as were all the lower ones, is the
+"max_sustainable_rate"; a lucky pass above a rate that already failed doesn't count.
+The events go straight through the exchange, so no apps are needed. Configured under
+'benchmarks.test_schedule_events':
+
+    subscribers     - list of subscriber counts to run with.
+    rates           - list of events per second to publish at.
+    duration        - seconds to publish for at each rate.
+    drain_timeout   - seconds to wait for events after the last publish.
+"""
+
+import time
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core import ioninit
+from ion.core.process.process import Process
+from ion.services.dm.distribution.events import ScheduleEventPublisher, ScheduleEventSubscriber
+from ion.util.procutils import asleep
+
+from itv_trial import stats
+from itv_trial.eventwait import EventWait, wait_all
+from benchmarks import harness
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+ORIGIN = 'schedule_event_benchmark'     # nothing else listens here, unlike the real schedule types
+DEFAULT_SUBSCRIBERS = [1, 4, 16]
+DEFAULT_RATES = [10, 50, 100, 500, 1000]
+KEPT_UP = 0.95      # fraction of the rate that has to be published for it to count as kept up with
+
+class ScheduleEventBenchmark(ItvTestCase):
+
+    app_dependencies = []
+
+    timeout = 3600
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+        self.proc = Process()
+        yield self.proc.spawn()
+
+        self.pub = ScheduleEventPublisher(process=self.proc, origin=ORIGIN)
+        yield self.pub.initialize()
+        yield self.pub.activate()
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def _subscribe(self, run):
+        """
+        Adds a subscriber that keeps the number of each event of this run that arrives.
+
+        @returns    (deferred) A tuple of the subscriber and its EventWait.
+        """
+        def get_task_id(msg):
+            return msg['content'].additional_data.task_id
+
+        # you can not keep the received message around after the ondata callback is complete
+        # an event delivered twice only counts once
+        arrived = EventWait(predicate=lambda msg: get_task_id(msg).rsplit(':', 1)[0] == run,
+                            extract=lambda msg: int(get_task_id(msg).rsplit(':', 1)[1]),
+                            unique=True)
+
+        sub = ScheduleEventSubscriber(process=self.proc, origin=ORIGIN)
+        sub.ondata = arrived
+        yield sub.initialize()
+        yield sub.activate()
+        defer.returnValue((sub, arrived))
+
+    @defer.inlineCallbacks
+    def _publish(self, run, rate, duration):
+        """
+        Publishes rate events a second for duration seconds, each when its turn comes, without
+        waiting for the last one to be sent.
+
+        @returns    (deferred) A tuple of the send time of each event and the publishes that failed.
+        """
+        count = int(rate * duration)
+        sent = [None] * count
+        pending = []
+        failed = []
+
+        started = time.time()
+        for seq in range(count):
+            wait = started + float(seq) / rate - time.time()
+            if wait > 0:
+                yield asleep(wait)
+
+            sent[seq] = time.time()
+            d = self.pub.create_and_publish_event(origin=ORIGIN, task_id='%s:%d' % (run, seq))
+            d.addErrback(failed.append)
+            pending.append(d)
+
+        yield defer.DeferredList(pending)
+        defer.returnValue((sent, failed))
+
+    @defer.inlineCallbacks
+    def test_fan_out(self):
+        subscriber_counts = CONF.getValue('subscribers', DEFAULT_SUBSCRIBERS)
+        rates = CONF.getValue('rates', DEFAULT_RATES)
+        duration = CONF.getValue('duration', 10)
+        drain_timeout = CONF.getValue('drain_timeout', 10)
+
+        results = []
+        sustainable = []
+        for subscribers in subscriber_counts:
+            max_sustainable = None
+            kept_up = True
+            for rate in sorted(rates):
+                run = '%d-%d' % (subscribers, rate)
+                arrivals = []
+                subs = []
+                for i in range(subscribers):
+                    sub, arrived = yield self._subscribe(run)
+                    subs.append(sub)
+                    arrivals.append(arrived)
+
+                started = time.time()
+                sent, failed = yield self._publish(run, rate, duration)
+                published = time.time() - started
+                yield wait_all(arrivals, len(sent), drain_timeout)
+
+                for sub in subs:
+                    yield sub.terminate()
+
+                latencies = []
+                for arrived in arrivals:
+                    latencies.extend([t - sent[seq] for seq, t in zip(arrived.values, arrived.times)])
+
+                expected = len(sent) * subscribers
+                result = {'subscribers'     : subscribers,
+                          'rate'            : rate,
+                          'published'       : len(sent),
+                          'publish_rate'    : len(sent) / published,
+                          'publish_errors'  : len(failed),
+                          'delivered'       : len(latencies),
+                          'lost'            : expected - len(latencies),
+                          'loss'            : expected and float(expected - len(latencies)) / expected,
+                          'latency'         : stats.summarize(latencies)}
+                results.append(result)
+
+                kept_up = kept_up and result['lost'] == 0 and result['publish_rate'] >= rate * KEPT_UP
+                if kept_up:
+                    max_sustainable = rate
+
+                log.info("%d subscribers at %d events/s: published %.1f/s, %d of %d delivered, latency p50 %s p99 %s" %
+                         (subscribers, rate, result['publish_rate'], result['delivered'], expected,
+                          result['latency']['p50'], result['latency']['p99']))
+
+            sustainable.append({'subscribers': subscribers, 'max_sustainable_rate': max_sustainable})
+            log.info("%d subscribers: max sustainable rate %s events/s" % (subscribers, max_sustainable))
+
+        harness.write_report('schedule_events', {'duration'      : duration,
+                                                 'drain_timeout' : drain_timeout,
+                                                 'levels'        : results,
+                                                 'sustainable'   : sustainable})
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/bootgraph.py
+@brief Works out which app deps can be started at the same time from their .rel/.app descriptors.
+
+An .app file names the applications it needs already running in its "applications" key, and a
+.rel file lists the apps it starts in its "apps" key (each described by res/apps/<name>.app).
+An app dep only has to wait for the other app deps that start an application it needs, so
+everything else can be started in parallel.
+
+Nearly every .app lists only ioncore, though, while the apps of a later bootlevel rely on what
+an earlier one did when it started (bootlevel4's datastore do-init, for one). So releases keep
+their listed order among themselves: a .rel always waits for the .rel files listed before it.
+
+Descriptors that can't be found or parsed are treated the way itv_trial used to treat every app
+dep: they wait for everything listed before them, and everything listed after waits for them.
+"""
+
+import os
+
+def load_descriptor(path):
+    """
+    Reads an .app or .rel file. These are python literals, eval'ed the same way as .itv files.
+
+    @returns    The descriptor dict, or None if it could not be read.
+    """
+    try:
+        f = open(path)
+        content = f.read()
+        f.close()
+
+        desc = eval(content)
+    except Exception:
+        return None
+
+    if not isinstance(desc, dict):
+        return None
+
+    return desc
+
+def get_app_names(servicename):
+    """
+    Gets the names of the applications an app dep starts, and the names of the applications it
+    needs to be running already.
+
+    @returns    A tuple of two sets (provides, requires), or None if the descriptors could not be read.
+    """
+    desc = load_descriptor(servicename)
+    if desc is None:
+        return None
+
+    if servicename.endswith('.rel'):
+        # apps of a release live in the apps dir next to the deploy dir, i.e. res/apps
+        appdir = os.path.join(os.path.dirname(os.path.dirname(servicename)), 'apps')
+
+        provides = set()
+        requires = set()
+        for app in desc.get('apps', []):
+            provides.add(app['name'])
+
+            appdesc = load_descriptor(os.path.join(appdir, '%s.app' % app['name']))
+            if appdesc is None:
+                return None
+
+            requires.update(appdesc.get('applications', []))
+    else:
+        provides = set([desc.get('name', os.path.splitext(os.path.basename(servicename))[0])])
+        requires = set(desc.get('applications', []))
+
+    return (provides, requires - provides)
+
+def get_descriptor_files(servicename):
+    """
+    Gets every descriptor file an app dep is read from: the .app/.rel itself, plus the .app
+    file of each app in a .rel.
+    """
+    files = [servicename]
+
+    if servicename.endswith('.rel'):
+        desc = load_descriptor(servicename)
+        if desc is not None:
+            appdir = os.path.join(os.path.dirname(os.path.dirname(servicename)), 'apps')
+            for app in desc.get('apps', []):
+                files.append(os.path.join(appdir, '%s.app' % app['name']))
+
+    return files
+
+def build_boot_graph(servicenames):
+    """
+    Builds the dependency graph between app deps.
+
+    @param servicenames     The in order list of app dep paths (.app or .rel).
+    @returns    A list holding, for each entry in servicenames, the set of indices of the entries
+                that must be up before it can be started.
+    """
+    names = [get_app_names(x) for x in servicenames]
+    deps = [set() for x in servicenames]
+
+    for i in range(len(names)):
+        for j in range(len(names)):
+            if i == j:
+                continue
+
+            if names[i] is None or names[j] is None:
+                # unknown: fall back to the listed order
+                if j < i:
+                    deps[i].add(j)
+
+            elif j < i and servicenames[i].endswith('.rel') and servicenames[j].endswith('.rel'):
+                deps[i].add(j)
+
+            elif names[i][1] & names[j][0]:
+                deps[i].add(j)
+
+    # break any cycles in favor of the listed order
+    done = set()
+    remaining = set(range(len(deps)))
+    while len(remaining) > 0:
+        free = [i for i in remaining if deps[i] <= done]
+        if len(free) == 0:
+            for i in remaining:
+                deps[i] = set([j for j in deps[i] if j < i or j in done])
+            continue
+
+        done.update(free)
+        remaining.difference_update(free)
+
+    return deps
+
+def get_boot_levels(deps):
+    """
+    Groups the entries of a boot graph into levels: level 0 needs nothing, and every entry in
+    level N needs something in level N-1. The number of levels is the length of the critical path.
+
+    @returns    A list of lists of indices.
+    """
+    levels = []
+    placed = {}         # index => level
+
+    while len(placed) < len(deps):
+        for i in range(len(deps)):
+            if i in placed or not deps[i] <= set(placed.keys()):
+                continue
+
+            level = 0
+            for j in deps[i]:
+                level = max(level, placed[j] + 1)
+
+            placed[i] = level
+            while len(levels) <= level:
+                levels.append([])
+            levels[level].append(i)
+
+    return levels
@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/discovery.py
+@brief Finds test classes and their app_dependencies by reading test modules instead of importing them.
+
+Importing a test module to learn what's in it pulls in the whole ion stack. Instead, each module
+is parsed, and the class names, test method names and app_dependencies (which must be a literal)
+are read off the syntax tree. The result is kept in a cache file, so a module is only parsed
+again after it changes.
+
+The same rules as trial's loader are followed: a class is a test class if it derives from a
+TestCase, and every test class in a module's namespace is found, including ones imported from
+other modules. Classes imported from outside the current directory can't be read, so they are
+recognized by name (ending in Test or TestCase) and assumed to have no app_dependencies.
+
+Anything that can't be worked out this way (names that aren't files under the current directory,
+app_dependencies that aren't literals, syntax errors) is left for trial's loader.
+"""
+
+import os
+
+try:
+    import ast
+except ImportError:
+    ast = None      # python 2.5, only the loader can be used
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+MODULE_PREFIX = 'test_'             # same as trial's loader
+METHOD_PREFIX = 'test'
+CLASS_ATTRS = ['app_dependencies', 'reuse_app_dependencies', 'ping_services']
+
+# bases that make a class a test case without adding tests or app_dependencies of their own
+HARNESS_BASES = set(['TestCase', 'IonTestCase', 'ItvTestCase'])
+
+CACHE_VERSION = 1
+
+class DynamicModule(Exception):
+    """
+    Raised when a module's test classes can't be worked out without importing it.
+    """
+
+def get_module_name(path):
+    """
+    Gets the dotted module name for a .py file or package dir, going up as long as there
+    are __init__.py files.
+    """
+    path = os.path.abspath(path)
+    if path.endswith('.py'):
+        path = path[:-3]
+    if os.path.basename(path) == '__init__':
+        path = os.path.dirname(path)
+
+    parts = [os.path.basename(path)]
+    path = os.path.dirname(path)
+    while os.path.exists(os.path.join(path, '__init__.py')):
+        parts.insert(0, os.path.basename(path))
+        path = os.path.dirname(path)
+
+    return ".".join(parts)
+
+def find_module_file(modname):
+    """
+    Finds a module under the current directory.
+
+    @returns    The .py file, or the package's __init__.py, or None if not found.
+    """
+    path = modname.replace('.', os.sep)
+
+    if os.path.exists(os.path.join(path, '__init__.py')):
+        return os.path.join(path, '__init__.py')
+
+    if os.path.isfile(path + '.py'):
+        return path + '.py'
+
+    return None
+
+def get_package_modules(dirpath):
+    """
+    Gets the test module files in a package and all its subpackages, like trial does for a
+    package name.
+    """
+    files = []
+    for dirname, subdirs, filenames in os.walk(dirpath):
+        # only descend into packages
+        subdirs[:] = sorted([x for x in subdirs if os.path.exists(os.path.join(dirname, x, '__init__.py'))])
+
+        for filename in sorted(filenames):
+            if filename.startswith(MODULE_PREFIX) and filename.endswith('.py'):
+                files.append(os.path.join(dirname, filename))
+
+    return files
+
+def _dotted_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        if value is not None:
+            return "%s.%s" % (value, node.attr)
+
+    return None
+
+def parse_module(source, filename='<string>'):
+    """
+    Reads the imports and classes of a module from its source.
+
+    @returns    A dict with "imports" (local name => "module.Name") and "classes" (class name =>
+                dict of "bases", test "methods" and "attrs"). attrs values are repr strings, or
+                None for a value that isn't a literal.
+    @raises     SyntaxError if the module can't be parsed.
+    """
+    tree = ast.parse(source, filename)
+
+    imports = {}
+    classes = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            for alias in node.names:
+                imports[alias.asname or alias.name] = "%s.%s" % (node.module, alias.name)
+
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    imports[alias.asname] = alias.name
+
+        elif isinstance(node, ast.ClassDef):
+            info = {'bases'     : [_dotted_name(x) for x in node.bases],
+                    'methods'   : [],
+                    'attrs'     : {}}
+
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name.startswith(METHOD_PREFIX):
+                    info['methods'].append(item.name)
+
+                elif isinstance(item, ast.Assign):
+                    for target in item.targets:
+                        if isinstance(target, ast.Name) and target.id in CLASS_ATTRS:
+                            try:
+                                info['attrs'][target.id] = repr(ast.literal_eval(item.value))
+                            except ValueError:
+                                info['attrs'][target.id] = None
+
+            classes[node.name] = info
+
+    return {'imports': imports, 'classes': classes}
+
+def _is_test_name(name):
+    return name.endswith('Test') or name.endswith('TestCase')
+
+class Discoverer(object):
+    """
+    Finds test classes, reading modules through a cache file keyed on their size, mtime and hash.
+    """
+    def __init__(self, cachefile=None):
+        self.cachefile = cachefile
+        self.cache = {}         # abs path => {"size", "mtime", "md5", "module"}
+        self.dirty = False
+        self.modules = {}       # module name => parsed module or None, for this run
+        self.classes = {}       # (module, class) => stand-in class
+
+        if cachefile and os.path.exists(cachefile):
+            try:
+                f = open(cachefile)
+                cache = json.load(f)
+                f.close()
+
+                if cache.get('version') == CACHE_VERSION:
+                    self.cache = cache['files']
+            except (IOError, ValueError, KeyError, AttributeError):
+                pass    # start over
+
+    def save(self):
+        """
+        Writes the cache file if anything was parsed.
+        """
+        if not self.cachefile or not self.dirty:
+            return
+
+        # write then rename, so a concurrent run never reads half a file
+        tmpfile = "%s.%d" % (self.cachefile, os.getpid())
+        f = open(tmpfile, 'w')
+        json.dump({'version': CACHE_VERSION, 'files': self.cache}, f)
+        f.close()
+        os.rename(tmpfile, self.cachefile)
+        self.dirty = False
+
+    def read_file(self, path):
+        """
+        Gets the parsed contents of a module file, from the cache if it hasn't changed.
+
+        @raises     DynamicModule if the file can't be parsed.
+        """
+        key = os.path.abspath(path)
+        st = os.stat(path)
+        entry = self.cache.get(key)
+
+        if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime:
+            return entry['module']
+
+        f = open(path)
+        source = f.read()
+        f.close()
+        digest = md5(source).hexdigest()
+
+        if entry and entry['md5'] == digest:
+            # touched but not changed
+            entry['mtime'] = st.st_mtime
+            self.dirty = True
+            return entry['module']
+
+        try:
+            module = parse_module(source, path)
+        except SyntaxError, ex:
+            raise DynamicModule("could not parse %s: %s" % (path, ex))
+
+        self.cache[key] = {'size': st.st_size, 'mtime': st.st_mtime, 'md5': digest, 'module': module}
+        self.dirty = True
+        return module
+
+    def get_module(self, modname, path=None):
+        """
+        @returns    The parsed module, or None if it isn't under the current directory.
+        """
+        if modname not in self.modules:
+            if path is None:
+                path = find_module_file(modname)
+
+            if path is None:
+                self.modules[modname] = None
+            else:
+                self.modules[modname] = self.read_file(path)
+
+        return self.modules[modname]
+
+    def resolve_name(self, modname, name):
+        """
+        Turns a (possibly dotted) name used in a module into the module and name it was defined as.
+        """
+        module = self.get_module(modname)
+        head, sep, rest = name.partition('.')
+
+        if head in module['classes'] and not rest:
+            return (modname, name)
+
+        if head in module['imports']:
+            name = module['imports'][head] + sep + rest
+        elif not rest and head not in module['classes']:
+            return ('__builtin__', name)    # object, Exception..
+
+        return tuple(name.rsplit('.', 1)) if '.' in name else (modname, name)
+
+    def resolve_class(self, modname, name, seen=()):
+        """
+        Works out what a class has, including what it inherits.
+
+        @returns    A dict with "is_test", test "methods", whether the methods are "complete" and the
+                    known "attrs" (attribute name => repr string).
+        @raises     DynamicModule if an attribute isn't a literal.
+        """
+        module = self.get_module(modname)
+        if module is None or (modname, name) in seen:
+            # outside the current directory: go by the name
+            harness = name in HARNESS_BASES
+            return {'is_test'   : _is_test_name(name),
+                    'methods'   : [],
+                    'complete'  : harness,
+                    'attrs'     : {}}
+
+        if name not in module['classes']:
+            if name in module['imports'] and '.' in module['imports'][name]:
+                defmod, defname = module['imports'][name].rsplit('.', 1)
+                return self.resolve_class(defmod, defname, seen)
+            raise DynamicModule("%s.%s is not defined at the top level of its module" % (modname, name))
+
+        info = module['classes'][name]
+        seen = seen + ((modname, name),)
+        res = {'is_test': False, 'methods': [], 'complete': True, 'attrs': {}}
+
+        # later bases are overridden by earlier ones, then by the class itself
+        for base in reversed(info['bases']):
+            if base is None:
+                raise DynamicModule("%s.%s has a base that isn't a name" % (modname, name))
+
+            basemod, basename = self.resolve_name(modname, base)
+            baseres = self.resolve_class(basemod, basename, seen)
+
+            res['is_test'] = res['is_test'] or baseres['is_test']
+            res['complete'] = res['complete'] and baseres['complete']
+            res['methods'] = [x for x in baseres['methods'] if x not in res['methods']] + res['methods']
+            res['attrs'].update(baseres['attrs'])
+
+        res['methods'] = [x for x in info['methods'] if x not in res['methods']] + res['methods']
+        res['attrs'].update(info['attrs'])
+
+        for attr, value in res['attrs'].iteritems():
+            if value is None:
+                raise DynamicModule("%s.%s has a %s that isn't a literal" % (modname, name, attr))
+
+        return res
+
+    def get_class(self, modname, name, res):
+        """
+        Makes a stand-in for a test class, with the same module, name and attributes as the real
+        one, so it can be used in its place for everything but running it.
+        """
+        key = (modname, name)
+        if key not in self.classes:
+            attrs = {'__module__': modname}
+            for attr, value in res['attrs'].iteritems():
+                attrs[attr] = ast.literal_eval(value)
+
+            self.classes[key] = type(str(name), (object,), attrs)
+
+        return self.classes[key]
+
+    def find_module_classes(self, modname, path=None):
+        """
+        Finds the test classes trial would find in a module.
+
+        @returns    A list of (stand-in class, test method names, complete) tuples.
+        """
+        module = self.get_module(modname, path)
+        found = []
+
+        names = [(modname, x) for x in module['classes']]
+        names += [tuple(x.rsplit('.', 1)) for x in module['imports'].values() if '.' in x]
+
+        for defmod, name in sorted(set(names)):
+            defmodule = self.get_module(defmod)
+            if defmodule is not None and name not in defmodule['classes'] and name not in defmodule['imports']:
+                continue        # an imported function, variable or submodule
+
+            res = self.resolve_class(defmod, name)
+            if not res['is_test'] or (res['complete'] and len(res['methods']) == 0):
+                continue
+
+            found.append((self.get_class(defmod, name, res), res['methods'], res['complete']))
+
+        return found
+
+    def find(self, testargs):
+        """
+        Finds the test classes for the names given to trial: directories, .py files, or dotted
+        module, class or method names.
+
+        @returns    A tuple of the set of stand-in classes found, the set of "module.Class.method"
+                    names found, and the list of names (from testargs, or modules they contain)
+                    that have to be left for trial's loader.
+        """
+        all_testclasses = set()
+        all_x = set()
+        unresolved = []
+
+        def add(found, method=None):
+            for cls, methods, complete in found:
+                all_testclasses.add(cls)
+                prefix = "%s.%s." % (cls.__module__, cls.__name__)
+
+                if method is not None:
+                    all_x.add(prefix + method)
+                    continue
+
+                all_x.update([prefix + x for x in methods])
+                if not complete:
+                    all_x.add(prefix + '*')     # inherits tests that couldn't be read
+
+        for name in testargs:
+            try:
+                if os.path.isdir(name):
+                    if not os.path.exists(os.path.join(name, '__init__.py')):
+                        unresolved.append(name)
+                        continue
+
+                    for path in get_package_modules(name):
+                        modname = get_module_name(path)
+                        try:
+                            add(self.find_module_classes(modname, path))
+                        except DynamicModule:
+                            unresolved.append(modname)
+                    continue
+
+                if os.path.isfile(name):
+                    if not name.endswith('.py'):
+                        unresolved.append(name)
+                        continue
+
+                    add(self.find_module_classes(get_module_name(name), name))
+                    continue
+
+                # dotted name: the longest part of it that is a module, then a class and a method
+                parts = name.split('.')
+                for i in range(len(parts), 0, -1):
+                    modname = ".".join(parts[:i])
+                    path = find_module_file(modname)
+                    if path is not None:
+                        break
+                else:
+                    unresolved.append(name)
+                    continue
+
+                rest = parts[i:]
+                if len(rest) == 0:
+                    if path.endswith('__init__.py'):
+                        for modpath in get_package_modules(os.path.dirname(path)):
+                            modname = get_module_name(modpath)
+                            try:
+                                add(self.find_module_classes(modname, modpath))
+                            except DynamicModule:
+                                unresolved.append(modname)
+                    else:
+                        add(self.find_module_classes(modname, path))
+                    continue
+
+                if len(rest) > 2:
+                    unresolved.append(name)
+                    continue
+
+                found = [x for x in self.find_module_classes(modname, path) if x[0].__name__ == rest[0]]
+                if len(found) == 0 or (len(rest) == 2 and found[0][2] and rest[1] not in found[0][1]):
+                    unresolved.append(name)     # let the loader report it
+                    continue
+
+                add(found, (rest[1:] or [None])[0])
+
+            except DynamicModule:
+                unresolved.append(name)
+
+        return (all_testclasses, all_x, unresolved)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/eventwait.py
+@brief Waiting for events with a deadline, instead of sleeping for the worst case.
+
+An EventWait is handed events, usually by being an event subscriber's ondata, and keeps the ones
+matching its predicate. wait(count, timeout) fires as soon as count of them have arrived, or at
+the deadline with however many there are, so a test only takes as long as its events do:
+
+    notices = EventWait(extract=lambda msg: msg['content'].additional_data.payload.dataset_id)
+    sub.ondata = notices
+    ...
+    met = yield notices.wait(1, timeout=5)
+    self.failUnless(met, "no notice within 5s")
+
+Messages can't be kept around after ondata returns, so extract picks out what to keep of each.
+When each event arrived is kept too, and how long the last wait took, for latency figures.
+
+Every matching event counts toward a wait, so an event the broker delivers twice counts twice.
+Where a wait is for count distinct events, pass unique=True to drop an event whose extracted
+value has already been kept.
+"""
+
+from twisted.internet import defer, reactor
+
+class EventWait(object):
+    """
+    Collects matching events, and fires waits for a number of them.
+
+    @param predicate    Called with each event, only events it returns true for are kept. By
+                        default all are.
+    @param extract      Called with each kept event, what it returns is kept instead of the event.
+    @param unique       If true, an event whose extracted value was already kept is dropped, so
+                        it doesn't count again. The values have to be hashable.
+    @param clock        Something with seconds() and callLater(), the reactor by default.
+    """
+    def __init__(self, predicate=None, extract=None, unique=False, clock=reactor):
+        self.predicate = predicate
+        self.extract = extract
+        self.unique = unique
+        self.clock = clock
+
+        self.values = []        # what was kept of each matching event, in the order they came
+        self.times = []         # clock.seconds() each matching event came at
+        self.waited = None      # seconds the last wait to finish took
+        self._waits = []        # (count, deferred, started, timer) of waits not finished yet
+        self._seen = set()      # values kept so far, if unique
+
+    def __call__(self, event):
+        self.record(event)
+
+    def __len__(self):
+        return len(self.values)
+
+    def record(self, event):
+        """
+        Hands the EventWait an event, keeping it if it matches and finishing waits it satisfies.
+        """
+        if self.predicate is not None and not self.predicate(event):
+            return
+
+        if self.extract is not None:
+            event = self.extract(event)
+        if self.unique:
+            if event in self._seen:
+                return
+            self._seen.add(event)
+        self.values.append(event)
+        self.times.append(self.clock.seconds())
+
+        for wait in [x for x in self._waits if x[0] <= len(self.values)]:
+            self._finish(wait, True)
+
+    def wait(self, count=1, timeout=None):
+        """
+        Waits for count matching events in all, counting those already kept.
+
+        @param timeout  Seconds to wait at most, None for no deadline.
+        @returns        (deferred) True once there are count, False if the deadline came first.
+        """
+        if len(self.values) >= count:
+            self.waited = 0.0
+            return defer.succeed(True)
+
+        d = defer.Deferred()
+        wait = [count, d, self.clock.seconds(), None]
+        if timeout is not None:
+            wait[3] = self.clock.callLater(max(timeout, 0), self._finish, wait, False)
+        self._waits.append(wait)
+        return d
+
+    def _finish(self, wait, met):
+        count, d, started, timer = wait
+        self._waits.remove(wait)
+        if met and timer is not None and timer.active():
+            timer.cancel()
+
+        self.waited = self.clock.seconds() - started
+        d.callback(met)
+
+def wait_all(waits, count=1, timeout=None):
+    """
+    Waits for count events from each of a list of EventWaits, with one deadline for them all.
+
+    @returns    (deferred) The number of the EventWaits that got count before the deadline.
+    """
+    d = defer.gatherResults([x.wait(count, timeout) for x in waits])
+    d.addCallback(lambda results: len([x for x in results if x]))
+    return d
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/fixtures/ingestion.py
+@brief Sets up and triggers dataset ingestion the way IntTestIngest does, for it and the benchmarks.
+
+create_ingest_resources makes a dataset and a NetCDF datasource pointing at a url, and
+rpc_call_jaw / scheduled_jaw_event make the JavaAgentWrapper update it, by rpc or by the
+scheduler's perform ingestion event. The supplement added event for the dataset says when it's in.
+"""
+
+from twisted.internet import defer
+from ion.util.iontime import IonTime
+from ion.integration.eoi.agent.java_agent_wrapper import JavaAgentWrapperClient
+from ion.core.object.object_utils import CDM_DATASET_TYPE, CDM_GROUP_TYPE, create_type_identifier
+from ion.services.dm.distribution.events import ScheduleEventPublisher
+from ion.services.dm.scheduler.scheduler_service import SCHEDULE_TYPE_PERFORM_INGESTION_UPDATE
+from ion.services.coi.datastore_bootstrap.ion_preload_config import HAS_A_ID
+
+import ncservice
+
+DATA_SOURCE_RESOURCE_TYPE   = create_type_identifier(object_id=4503, version=1)
+SCHEDULER_PERFORM_INGEST    = create_type_identifier(object_id=2607, version=1)
+
+# served by res/apps/ncserver.app
+DATASET_PATH = "/test_data/USGS_Test.nc"
+REMOTE_DATASET_URL = "http://uop.whoi.edu/oceansites/ooi/OS_NTAS_2010_R_M-1.nc"
+
+@defer.inlineCallbacks
+def get_dataset_url(proc, dataset_url=None):
+    """
+    @param dataset_url  A url to use instead, e.g. from the caller's config, or None.
+    @returns            (deferred) dataset_url, or else the url of USGS_Test.nc on the ncserver of
+                        this sysname, which listens on whatever port it was given.
+    """
+    if dataset_url is None:
+        base_url = yield ncservice.NcServerClient(proc=proc).get_url()
+        dataset_url = base_url + DATASET_PATH
+    defer.returnValue(dataset_url)
+
+@defer.inlineCallbacks
+def create_ingest_resources(rc, ac, dataset_url, title="NTAS 1", max_ingest_millis=120000):
+    """
+    Creates a blank dataset and a NetCDF datasource for it, associated and put in one transaction.
+
+    @returns    (deferred) A tuple of the (dataset, datasource) resources.
+    """
+    dataset = yield rc.create_instance(CDM_DATASET_TYPE,
+                                       ResourceName = 'Blank dataset for testing ingestion',
+                                       ResourceDescription= 'An example of a station dataset')
+
+    group = dataset.CreateObject(CDM_GROUP_TYPE)
+    dataset.root_group = group
+
+    datasource = yield rc.create_instance(DATA_SOURCE_RESOURCE_TYPE,
+                                          ResourceName = 'CGSN example for ingestion testing',
+                                          ResourceDescription= 'An example of a data source for the CGSN OSU dataset for testing ingestion')
+
+    datasource.source_type = datasource.SourceType.NETCDF_S
+    datasource.request_type = datasource.RequestType.DAP
+    datasource.dataset_url = dataset_url
+    datasource.max_ingest_millis = max_ingest_millis
+    datasource.registration_datetime_millis = IonTime().time_ms
+    datasource.ion_title = title
+    datasource.ion_description = "OSU CGSN"
+    datasource.update_interval_seconds = 86400
+
+    # Just create it - the workbench/datastore will take care of the rest!
+    yield ac.create_association(datasource, HAS_A_ID, dataset)
+
+    yield rc.put_resource_transaction([dataset, datasource])
+
+    defer.returnValue((dataset, datasource))
+
+@defer.inlineCallbacks
+def rpc_call_jaw(dataset_id, datasource_id):
+    """
+    Asks the JavaAgentWrapper for an update of the dataset directly.
+    """
+    jawc = JavaAgentWrapperClient()
+    yield jawc.request_update(dataset_id, datasource_id)
+
+@defer.inlineCallbacks
+def scheduled_jaw_event(proc, dataset_id, datasource_id):
+    """
+    Publishes the scheduler event that makes the JavaAgentWrapper update the dataset.
+    """
+    pub = ScheduleEventPublisher(process=proc)
+
+    msg = yield pub.create_event(origin=SCHEDULE_TYPE_PERFORM_INGESTION_UPDATE,
+                                 task_id="manage_data_resource_FAKED_TASK_ID")
+
+    msg.additional_data.payload = msg.CreateObject(SCHEDULER_PERFORM_INGEST)
+    msg.additional_data.payload.dataset_id     = dataset_id
+    msg.additional_data.payload.datasource_id  = datasource_id
+
+    yield pub.publish_event(msg, origin=SCHEDULE_TYPE_PERFORM_INGESTION_UPDATE)
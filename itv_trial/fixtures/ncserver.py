@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/fixtures/ncserver.py
+@brief A local stand-in for the remote NetCDF servers the ingestion tests read from.
+
+Serves the NetCDF files in test_data/, and synthetic datasets of any size made up as they're
+read, over HTTP with byte ranges, which is how NetCDF-Java reads a plain http:// NetCDF url:
+
+    http://localhost:<port>/test_data/USGS_Test.nc
+    http://localhost:<port>/synthetic/grid/10GB.nc    (station, profile or grid, see synthetic)
+
+Every response can be shaped with a latency before it starts and a bandwidth limit, so ingest
+numbers don't depend on how a remote server happens to be doing.
+
+Tests start it like any other dependency with res/apps/ncserver.app (bandwidth and latency from
+the 'itv_trial.fixtures.ncservice' config), which listens on a free port so parallel workers
+don't collide, and ask it for its url with ncservice.NcServerClient.get_url. Or run it on its
+own, on port 8001 by default:
+
+    python -m itv_trial.fixtures.ncserver --bandwidth 1MB --latency 0.2
+"""
+
+import os, re, sys, time
+from optparse import OptionParser
+
+from twisted.internet import reactor
+from twisted.web import resource, server, http
+
+import synthetic
+
+DEFAULT_PORT = 8001
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'test_data')
+
+CHUNK_SIZE = 64 * 1024
+SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+
+def parse_size(text):
+    """
+    Parses a number of bytes like "4096", "10MB" or "1.5GB" (units are powers of 1024).
+    """
+    match = re.match(r'^\s*([0-9.]+)\s*([A-Za-z]*)\s*$', text)
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError("Not a size: %r" % text)
+
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+def parse_range(header, size):
+    """
+    Parses a Range header against a file of size bytes. Only a single range is understood.
+
+    @returns    A tuple of (first, last) byte, None for no or an unsupported Range header (send the
+                whole file), or False if the range can't be satisfied.
+    """
+    if not header:
+        return None
+
+    match = re.match(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$', header)
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+
+    if match.group(1) == '':
+        # the last n bytes
+        first = max(size - int(match.group(2)), 0)
+        last = size - 1
+    else:
+        first = int(match.group(1))
+        last = match.group(2) and min(int(match.group(2)), size - 1) or size - 1
+
+    if first >= size or first > last:
+        return False
+
+    return (first, last)
+
+def synthetic_url(feature_type, size, base_url):
+    """
+    @returns    The url of a synthetic dataset, e.g. of a 10MB grid, on the server at base_url.
+    """
+    return "%s/synthetic/%s/%s.nc" % (base_url, feature_type, size)
+
+def get_base_url(listening, host='localhost'):
+    """
+    @param listening    What listen() returned, whatever port it was given (0 for a free one).
+    @returns            The url the server is reachable at, e.g. http://localhost:8001.
+    """
+    return 'http://%s:%d' % (host, listening.getHost().port)
+
+class FileSource(object):
+    """
+    A file on disk, read the same way as a synthetic dataset.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    def read(self, offset, length):
+        f = open(self.path, 'rb')
+        try:
+            f.seek(offset)
+            return f.read(length)
+        finally:
+            f.close()
+
+class ShapedProducer(object):
+    """
+    Writes bytes first to last of a source to a request, a chunk each time the transport wants
+    more, but starting no sooner than latency seconds from now and at most bandwidth bytes/s.
+    """
+    def __init__(self, request, source, first, last, bandwidth=None, latency=0):
+        self.request = request
+        self.source = source
+        self.offset = first
+        self.last = last
+        self.bandwidth = bandwidth
+        self.started = time.time() + latency
+        self.sent = 0
+        self.call = None
+        self.stopped = False
+
+        request.notifyFinish().addErrback(lambda failure: self.stopProducing())
+
+    def start(self):
+        self.request.registerProducer(self, False)
+
+    def resumeProducing(self):
+        if self.stopped or self.call:
+            return
+
+        length = min(CHUNK_SIZE, self.last + 1 - self.offset)
+        wait = self.started - time.time()
+        if self.bandwidth:
+            wait += float(self.sent + length) / self.bandwidth
+
+        if wait > 0:
+            self.call = reactor.callLater(wait, self._write, length)
+        else:
+            self._write(length)
+
+    def _write(self, length):
+        self.call = None
+        if self.stopped:
+            return
+
+        data = self.source.read(self.offset, length)
+        self.offset += len(data)
+        self.sent += len(data)
+        self.request.write(data)
+
+        if self.offset > self.last or not data:
+            self.stopped = True
+            self.request.unregisterProducer()
+            self.request.finish()
+
+    def pauseProducing(self):
+        pass
+
+    def stopProducing(self):
+        self.stopped = True
+        if self.call:
+            self.call.cancel()
+            self.call = None
+
+class ShapedResource(resource.Resource):
+    """
+    Serves sources with byte ranges and shaping. Subclasses find the source for a request.
+    """
+    isLeaf = True
+
+    def __init__(self, bandwidth=None, latency=0):
+        resource.Resource.__init__(self)
+        self.bandwidth = bandwidth
+        self.latency = latency
+
+    def get_source(self, path):
+        """
+        @returns    An object with size and read(offset, length) for the path after this
+                    resource, or None if there's no such thing.
+        """
+        raise NotImplementedError()
+
+    def _prepare(self, request):
+        """
+        Sets the response code and headers.
+
+        @returns    A tuple of (source, first, last), or None if there is nothing to send.
+        """
+        source = self.get_source('/'.join(request.postpath))
+        if source is None:
+            request.setResponseCode(http.NOT_FOUND)
+            return None
+
+        request.setHeader('content-type', 'application/x-netcdf')
+        request.setHeader('accept-ranges', 'bytes')
+
+        byterange = parse_range(request.getHeader('range'), source.size)
+        if byterange is False:
+            request.setResponseCode(http.REQUESTED_RANGE_NOT_SATISFIABLE)
+            request.setHeader('content-range', 'bytes */%d' % source.size)
+            request.setHeader('content-length', '0')
+            return None
+
+        if byterange is None:
+            first, last = 0, source.size - 1
+        else:
+            first, last = byterange
+            request.setResponseCode(http.PARTIAL_CONTENT)
+            request.setHeader('content-range', 'bytes %d-%d/%d' % (first, last, source.size))
+        request.setHeader('content-length', str(last + 1 - first))
+
+        return (source, first, last)
+
+    def render_HEAD(self, request):
+        self._prepare(request)
+        return ''
+
+    def render_GET(self, request):
+        prepared = self._prepare(request)
+        if prepared is None or prepared[2] < prepared[1]:
+            return ''
+
+        source, first, last = prepared
+        ShapedProducer(request, source, first, last, self.bandwidth, self.latency).start()
+        return server.NOT_DONE_YET
+
+class DirectoryResource(ShapedResource):
+    """
+    Serves the files in a directory.
+    """
+    def __init__(self, path, **kwargs):
+        ShapedResource.__init__(self, **kwargs)
+        self.path = path
+
+    def get_source(self, name):
+        # just the files right in the directory
+        path = os.path.join(self.path, name)
+        if name.startswith('.') or os.path.basename(name) != name or not os.path.isfile(path):
+            return None
+        return FileSource(path)
+
+class SyntheticResource(ShapedResource):
+    """
+    Serves synthetic datasets by feature type and size, e.g. station/10MB.nc.
+    """
+    def __init__(self, **kwargs):
+        ShapedResource.__init__(self, **kwargs)
+        self.datasets = {}
+
+    def get_source(self, path):
+        if path not in self.datasets:
+            parts = path.split('/')
+            if len(parts) != 2 or parts[0] not in synthetic.FEATURE_TYPES:
+                return None
+            try:
+                size = parse_size(os.path.splitext(parts[1])[0])
+            except ValueError:
+                return None
+            self.datasets[path] = synthetic.make_dataset_of_size(parts[0], size)
+        return self.datasets[path]
+
+def get_site(data_dir=DATA_DIR, bandwidth=None, latency=0):
+    root = resource.Resource()
+    root.putChild('test_data', DirectoryResource(data_dir, bandwidth=bandwidth, latency=latency))
+    root.putChild('synthetic', SyntheticResource(bandwidth=bandwidth, latency=latency))
+    return server.Site(root)
+
+def listen(port=DEFAULT_PORT, data_dir=DATA_DIR, bandwidth=None, latency=0, interface=''):
+    """
+    Starts serving.
+
+    @param bandwidth    Bytes per second each response is limited to, None for no limit.
+    @param latency      Seconds before each response starts.
+    @returns            The twisted listening port, stopListening() to stop.
+    """
+    return reactor.listenTCP(port, get_site(data_dir, bandwidth, latency), interface=interface)
+
+def main():
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-p", "--port", type="int", default=DEFAULT_PORT, help="Port to listen on.")
+    parser.add_option("-d", "--data-dir", default=DATA_DIR, help="Directory of files to serve under /test_data.")
+    parser.add_option("-b", "--bandwidth", default=None, help="Limit each response to this many bytes per second, e.g. 1MB.")
+    parser.add_option("-l", "--latency", type="float", default=0, help="Seconds to wait before each response starts.")
+    opts, args = parser.parse_args()
+
+    bandwidth = opts.bandwidth and parse_size(opts.bandwidth) or None
+    listening = listen(opts.port, opts.data_dir, bandwidth, opts.latency)
+    print "Serving %s and synthetic datasets at %s" % (opts.data_dir, get_base_url(listening))
+    reactor.run()
+
+if __name__ == "__main__":
+    sys.exit(main())
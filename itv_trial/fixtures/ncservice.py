@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/fixtures/ncservice.py
+@brief Runs the NetCDF stand-in server (ncserver) in a capability container, for
+       res/apps/ncserver.app. Configured under 'itv_trial.fixtures.ncservice':
+
+    port        - port to listen on, default 0 for a free one, so the containers of parallel itv
+                  workers don't fight over it. Ask the service for its url with
+                  NcServerClient.get_url rather than building one.
+    host        - host name in that url, default localhost.
+    data_dir    - directory served under /test_data, default the repository's test_data.
+    bandwidth   - bytes per second each response is limited to, e.g. '1MB', default no limit.
+    latency     - seconds before each response starts, default 0.
+"""
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.core import ioninit
+from ion.core.process.process import ProcessFactory
+from ion.core.process.service_process import ServiceProcess, ServiceClient
+
+import ncserver
+
+log = ion.util.ionlog.getLogger(__name__)
+CONF = ioninit.config(__name__)
+
+class NcServerService(ServiceProcess):
+
+    declare = ServiceProcess.service_declare(name='ncserver', version='0.1.0', dependencies=[])
+
+    def slc_init(self):
+        port = CONF.getValue('port', 0)
+        data_dir = CONF.getValue('data_dir', ncserver.DATA_DIR)
+        bandwidth = CONF.getValue('bandwidth', None)
+        latency = CONF.getValue('latency', 0)
+
+        if bandwidth is not None:
+            bandwidth = ncserver.parse_size(str(bandwidth))
+
+        self.listening = ncserver.listen(port, data_dir, bandwidth, latency)
+        self.url = ncserver.get_base_url(self.listening, CONF.getValue('host', 'localhost'))
+        log.info("Serving %s and synthetic datasets at %s" % (data_dir, self.url))
+
+    def slc_terminate(self):
+        return self.listening.stopListening()
+
+    @defer.inlineCallbacks
+    def op_get_url(self, content, headers, msg):
+        yield self.reply_ok(msg, {'url': self.url})
+
+class NcServerClient(ServiceClient):
+
+    def __init__(self, proc=None, **kwargs):
+        if not 'targetname' in kwargs:
+            kwargs['targetname'] = "ncserver"
+        ServiceClient.__init__(self, proc, **kwargs)
+
+    @defer.inlineCallbacks
+    def get_url(self):
+        """
+        @returns    (deferred) The url the ncserver of this sysname serves at, e.g.
+                    http://localhost:41234, to put /test_data/... or a synthetic_url path after.
+        """
+        yield self._check_init()
+        (content, headers, msg) = yield self.rpc_send('get_url', {})
+        defer.returnValue(content['url'])
+
+factory = ProcessFactory(NcServerService)
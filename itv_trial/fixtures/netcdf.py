@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/fixtures/netcdf.py
+@brief NetCDF classic (64-bit offset) files whose data is made up as it's read.
+
+A Dataset lays out its header and where each variable goes up front, but only produces the bytes
+of the ranges actually read, so a file of any size can be served or written out a chunk at a time
+without holding it in memory. Variables with the record (unlimited) dimension are made a block of
+records at a time, so big data belongs in record variables; the others are made whole, once.
+
+See http://www.unidata.ucar.edu/software/netcdf/docs/netcdf/Classic-Format-Spec.html
+"""
+
+import struct
+from itertools import chain, izip
+
+NC_BYTE = 1
+NC_CHAR = 2
+NC_SHORT = 3
+NC_INT = 4
+NC_FLOAT = 5
+NC_DOUBLE = 6
+
+TYPE_FORMATS = {NC_BYTE: 'b', NC_CHAR: 'c', NC_SHORT: 'h', NC_INT: 'i', NC_FLOAT: 'f', NC_DOUBLE: 'd'}
+
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+MAGIC = 'CDF\x02'       # 64-bit offsets, so files can be over 2GB
+ABSENT = '\0' * 8
+MAX_VSIZE = 2 ** 32 - 1 # what vsize says when the real size doesn't fit
+
+CHUNK_SIZE = 1024 * 1024
+RECORD_BLOCK_SIZE = 256 * 1024  # records are made in blocks of about this many bytes
+
+def type_size(nc_type):
+    return struct.calcsize('>' + TYPE_FORMATS[nc_type])
+
+def pack(nc_type, values):
+    """
+    Packs a flat list of values (a string for NC_CHAR) as big-endian nc_type.
+    """
+    if nc_type == NC_CHAR:
+        return values
+    return struct.pack('>%d%s' % (len(values), TYPE_FORMATS[nc_type]), *values)
+
+def pad(data):
+    return data + '\0' * (-len(data) % 4)
+
+def _pack_name(name):
+    return struct.pack('>i', len(name)) + pad(name)
+
+def _pack_attrs(attrs):
+    """
+    Packs a list of (name, value) attributes. A value is a string, a number or a list of numbers,
+    typed NC_CHAR, NC_INT or NC_DOUBLE from the python type, or a (nc_type, values) tuple.
+    """
+    if not attrs:
+        return ABSENT
+
+    data = struct.pack('>ii', NC_ATTRIBUTE, len(attrs))
+    for name, value in attrs:
+        if isinstance(value, tuple):
+            nc_type, values = value
+        elif isinstance(value, str):
+            nc_type, values = NC_CHAR, value
+        else:
+            values = isinstance(value, list) and value or [value]
+            nc_type = isinstance(values[0], float) and NC_DOUBLE or NC_INT
+        if nc_type != NC_CHAR and not isinstance(values, (list, tuple)):
+            values = [values]
+
+        data += _pack_name(name) + struct.pack('>ii', nc_type, len(values)) + pad(pack(nc_type, values))
+
+    return data
+
+class Variable(object):
+    """
+    A variable and where it goes in the file.
+
+    values is called with a record number, and returns that record of the variable as a flat list
+    (a string for NC_CHAR). For a variable without the record dimension it's called with None and
+    returns the whole variable. With period set, record n is made once and reused for every record
+    n + k * period, which is what makes writing gigabytes of record data quick.
+    """
+    def __init__(self, name, dims, nc_type, values, attrs=None, period=None):
+        self.name = name
+        self.dims = dims
+        self.nc_type = nc_type
+        self.values = values
+        self.attrs = attrs or []
+        self.period = period
+        self._cache = {}
+
+        self.is_record = False
+        self.length = 0         # bytes in a record, or in the whole variable
+        self.vsize = 0          # padded length, as the header has it
+        self.begin = 0
+
+    def pack(self, record=None):
+        key = record
+        if self.period and record is not None:
+            key = record % self.period
+            if key in self._cache:
+                return self._cache[key]
+
+        data = pack(self.nc_type, self.values(record))
+        if len(data) != self.length:
+            raise ValueError("%s made %d bytes, not %d" % (self.name, len(data), self.length))
+
+        if self.period and record is not None:
+            self._cache[key] = data
+        return data
+
+    def pack_records(self, first, count):
+        """
+        @returns    A list of records first to first + count - 1, packed.
+        """
+        if self.period:
+            return [self.pack(x) for x in xrange(first, first + min(count, self.period))] + \
+                   [self._cache[x % self.period] for x in xrange(first + self.period, first + count)]
+
+        values = []
+        for record in xrange(first, first + count):
+            values.extend(self.values(record))
+
+        data = pack(self.nc_type, values)
+        if len(data) != self.length * count:
+            raise ValueError("%s made %d bytes, not %d" % (self.name, len(data), self.length * count))
+        return [data[x:x + self.length] for x in xrange(0, len(data), self.length)]
+
+class Dataset(object):
+    """
+    A NetCDF file laid out from dimensions, variables and global attributes.
+
+    @param dims     List of (name, length) in order, the length of the record dimension None.
+    @param numrecs  Number of records, for the record dimension.
+    """
+    def __init__(self, dims, variables, attrs=None, numrecs=0):
+        self.dims = dims
+        self.variables = variables
+        self.attrs = attrs or []
+        self.numrecs = numrecs
+
+        self._fixed_data = {}
+        self._last_block = (None, None)
+
+        dim_ids = dict([(name, i) for i, (name, length) in enumerate(dims)])
+        dim_lengths = dict(dims)
+
+        for var in variables:
+            count = 1
+            for i, dim in enumerate(var.dims):
+                if dim_lengths[dim] is None:
+                    if i != 0:
+                        raise ValueError("%s: only the first dimension can be the record dimension" % var.name)
+                    var.is_record = True
+                else:
+                    count *= dim_lengths[dim]
+            var.length = count * type_size(var.nc_type)
+            var.vsize = len(pad('\0' * var.length))
+
+        # a lone record variable isn't padded in the records
+        record_vars = [x for x in variables if x.is_record]
+        if len(record_vars) == 1:
+            self.recsize = record_vars[0].length
+        else:
+            self.recsize = sum([x.vsize for x in record_vars])
+
+        # the header's length doesn't depend on where the variables begin, so lay it out once to
+        # find where the data starts, then again with the offsets
+        self.header = self._pack_header(dim_ids)
+        offset = len(self.header)
+        for var in variables:
+            if not var.is_record:
+                var.begin = offset
+                offset += var.vsize
+        self.record_begin = offset
+        for var in record_vars:
+            var.begin = offset
+            offset += var.vsize
+        self.header = self._pack_header(dim_ids)
+
+        self.fixed_vars = [x for x in variables if not x.is_record]
+        self.record_vars = record_vars
+        self.size = self.record_begin + self.recsize * numrecs
+        self.block_records = max(RECORD_BLOCK_SIZE // max(self.recsize, 1), 1)
+
+    def _pack_header(self, dim_ids):
+        data = MAGIC + struct.pack('>i', self.numrecs)
+
+        if self.dims:
+            data += struct.pack('>ii', NC_DIMENSION, len(self.dims))
+            for name, length in self.dims:
+                data += _pack_name(name) + struct.pack('>i', length or 0)
+        else:
+            data += ABSENT
+
+        data += _pack_attrs(self.attrs)
+
+        if self.variables:
+            data += struct.pack('>ii', NC_VARIABLE, len(self.variables))
+            for var in self.variables:
+                data += _pack_name(var.name) + struct.pack('>i', len(var.dims))
+                data += ''.join([struct.pack('>i', dim_ids[x]) for x in var.dims])
+                data += _pack_attrs(var.attrs)
+                data += struct.pack('>iiq', var.nc_type, min(var.vsize, MAX_VSIZE), var.begin)
+        else:
+            data += ABSENT
+
+        return data
+
+    def _pack_records(self, first, count):
+        columns = []
+        for var in self.record_vars:
+            records = var.pack_records(first, count)
+            padding = '\0' * (var.vsize - var.length)
+            if padding and len(self.record_vars) > 1:
+                records = [x + padding for x in records]
+            columns.append(records)
+
+        return ''.join(chain.from_iterable(izip(*columns)))
+
+    def _block_at(self, offset):
+        """
+        @returns    A tuple of (start, data) of the header, fixed variable or record at offset.
+        """
+        if offset < len(self.header):
+            return (0, self.header)
+
+        if offset < self.record_begin:
+            for var in self.fixed_vars:
+                if offset < var.begin + var.vsize:
+                    if var.name not in self._fixed_data:
+                        self._fixed_data[var.name] = pad(var.pack())
+                    return (var.begin, self._fixed_data[var.name])
+
+        block = (offset - self.record_begin) // self.recsize // self.block_records
+        if self._last_block[0] != block:
+            first = block * self.block_records
+            self._last_block = (block, self._pack_records(first, min(self.block_records, self.numrecs - first)))
+        return (self.record_begin + block * self.block_records * self.recsize, self._last_block[1])
+
+    def read(self, offset, length):
+        """
+        @returns    Up to length bytes of the file from offset, less at the end of the file.
+        """
+        end = min(offset + length, self.size)
+        parts = []
+        while offset < end:
+            start, data = self._block_at(offset)
+            part = data[offset - start:end - start]
+            parts.append(part)
+            offset += len(part)
+
+        return ''.join(parts)
+
+    def write(self, f, chunk_size=CHUNK_SIZE):
+        """
+        Writes the whole file to the file object f, chunk_size bytes at a time.
+        """
+        for offset in xrange(0, self.size, chunk_size):
+            f.write(self.read(offset, chunk_size))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/fixtures/synthetic.py
+@brief Synthetic CDM datasets of any size, for ingestion scale tests.
+
+Makes station, profile and grid datasets laid out like the ones the OOI dataset agents write
+(test_data/USGS_Test.nc is a station), with a chosen number of data variables, time length and,
+for profiles and grids, depth levels or lat/lon size. They're written to disk a chunk at a time,
+or served by ncserver under /synthetic/<feature type>/<size>.nc:
+
+    python -m itv_trial.fixtures.synthetic grid grid_1GB.nc --size 1GB
+    python -m itv_trial.fixtures.synthetic profile profile.nc --times 1000 --depths 200 --variables 4
+
+The data repeats every PATTERN_RECORDS records, which keeps writing gigabytes quick.
+"""
+
+import os, sys
+from optparse import OptionParser
+
+import netcdf
+
+FEATURE_TYPES = ['station', 'profile', 'grid']
+
+# sizes the ingest size benchmark runs over by default, ncserver.parse_size style; bigger ones
+# (1GB, 10GB) take minutes each to generate and ingest, so they have to be asked for in its config
+DEFAULT_SIZES = ['1MB', '10MB']
+
+PATTERN_RECORDS = 24
+TIME_START = 1293840000     # 2011-01-01
+TIME_STEP = 3600
+
+TIME_ATTRS = [('units', 'seconds since 1970-01-01 00:00:00'), ('long_name', 'time'),
+              ('standard_name', 'time'), ('_CoordinateAxisType', 'Time')]
+LAT_ATTRS = [('units', 'degree_north'), ('long_name', 'latitude'), ('standard_name', 'latitude')]
+LON_ATTRS = [('units', 'degree_east'), ('long_name', 'longitude'), ('standard_name', 'longitude')]
+DEPTH_ATTRS = [('units', 'm'), ('long_name', 'depth'), ('standard_name', 'depth'), ('positive', 'down')]
+
+def _get_times(record):
+    return [float(TIME_START + record * TIME_STEP)]
+
+def _constant(values):
+    return lambda record: values
+
+def _data_variable(index, dims, count, coordinates):
+    """
+    Data variable number index, count floats per record, a different wave for each variable.
+    """
+    def get_values(record):
+        return [float(((record + index) * 7 + i) % 100) / 4 for i in xrange(count)]
+
+    attrs = [('units', 'celcius'), ('long_name', 'synthetic variable %d' % index),
+             ('standard_name', 'sea_water_temperature'), ('coordinates', coordinates),
+             ('_FillValue', (netcdf.NC_FLOAT, [-999.0]))]
+    return netcdf.Variable('var%d' % index, dims, netcdf.NC_FLOAT, get_values, attrs, period=PATTERN_RECORDS)
+
+def _global_attrs(feature_type, title):
+    return [('Conventions', 'CF-1.5'), ('CF:featureType', feature_type), ('title', title),
+            ('institution', 'Synthetic data'), ('source', 'itv_trial.fixtures.synthetic'),
+            ('history', 'Generated by itv_trial.fixtures.synthetic')]
+
+def station_dataset(times=1, variables=1):
+    """
+    A time series at one station: scalar position and id, and each variable by time.
+    """
+    dims = [('time', None)]
+    coordinates = 'time lon lat'
+    data = [netcdf.Variable('lon', [], netcdf.NC_FLOAT, _constant([-72.6]), LON_ATTRS),
+            netcdf.Variable('lat', [], netcdf.NC_FLOAT, _constant([41.9]), LAT_ATTRS),
+            netcdf.Variable('stnId', [], netcdf.NC_INT, _constant([1]), [('standard_name', 'station_id')]),
+            netcdf.Variable('stnDepth', [], netcdf.NC_FLOAT, _constant([0.0]),
+                            [('units', 'm'), ('long_name', 'station depth'), ('positive', 'down')]),
+            netcdf.Variable('time', ['time'], netcdf.NC_DOUBLE, _get_times, TIME_ATTRS)]
+    data += [_data_variable(i, ['time'], 1, coordinates) for i in range(variables)]
+
+    return netcdf.Dataset(dims, data, _global_attrs('station', 'Synthetic station time series'), times)
+
+def profile_dataset(times=1, variables=1, depths=50):
+    """
+    A profile per record, each at its own time and position, on fixed depth levels.
+    """
+    dims = [('profile', None), ('z', depths)]
+    coordinates = 'time lon lat z'
+    data = [netcdf.Variable('z', ['z'], netcdf.NC_FLOAT, _constant([float(x) for x in range(depths)]), DEPTH_ATTRS),
+            netcdf.Variable('time', ['profile'], netcdf.NC_DOUBLE, _get_times, TIME_ATTRS),
+            netcdf.Variable('lat', ['profile'], netcdf.NC_FLOAT, lambda record: [40.0 + (record % 100) * 0.01], LAT_ATTRS),
+            netcdf.Variable('lon', ['profile'], netcdf.NC_FLOAT, lambda record: [-70.0 - (record % 100) * 0.01], LON_ATTRS)]
+    data += [_data_variable(i, ['profile', 'z'], depths, coordinates) for i in range(variables)]
+
+    return netcdf.Dataset(dims, data, _global_attrs('profile', 'Synthetic profiles'), times)
+
+def grid_dataset(times=1, variables=1, lats=180, lons=360):
+    """
+    A regular lat/lon grid of each variable per time.
+    """
+    dims = [('time', None), ('lat', lats), ('lon', lons)]
+    coordinates = 'time lat lon'
+    data = [netcdf.Variable('lat', ['lat'], netcdf.NC_FLOAT,
+                            _constant([-90.0 + 180.0 * (x + 0.5) / lats for x in range(lats)]), LAT_ATTRS),
+            netcdf.Variable('lon', ['lon'], netcdf.NC_FLOAT,
+                            _constant([-180.0 + 360.0 * (x + 0.5) / lons for x in range(lons)]), LON_ATTRS),
+            netcdf.Variable('time', ['time'], netcdf.NC_DOUBLE, _get_times, TIME_ATTRS)]
+    data += [_data_variable(i, ['time', 'lat', 'lon'], lats * lons, coordinates) for i in range(variables)]
+
+    return netcdf.Dataset(dims, data, _global_attrs('grid', 'Synthetic grid'), times)
+
+DATASETS = {'station': station_dataset, 'profile': profile_dataset, 'grid': grid_dataset}
+
+def make_dataset(feature_type, times=1, **kwargs):
+    """
+    @param kwargs   variables, and depths for a profile or lats and lons for a grid.
+    """
+    if feature_type not in DATASETS:
+        raise ValueError("Unknown feature type %r, not one of %s" % (feature_type, ", ".join(FEATURE_TYPES)))
+    return DATASETS[feature_type](times=times, **kwargs)
+
+def make_dataset_of_size(feature_type, size, **kwargs):
+    """
+    Makes a dataset with as many times as it takes to be at least size bytes.
+    """
+    empty = make_dataset(feature_type, 0, **kwargs)
+    times = max(-(-(size - empty.size) // empty.recsize), 1)
+    return make_dataset(feature_type, times, **kwargs)
+
+def write(dataset, path, chunk_size=netcdf.CHUNK_SIZE):
+    """
+    Writes a dataset to path, by way of a temporary file so a partly written one is never left there.
+    """
+    tmp = path + '.tmp'
+    f = open(tmp, 'wb')
+    try:
+        dataset.write(f, chunk_size)
+    finally:
+        f.close()
+    os.rename(tmp, path)
+
+def main():
+    import ncserver
+
+    parser = OptionParser(usage="%prog [options] station|profile|grid output.nc")
+    parser.add_option("-s", "--size", default=None, help="Write as many times as it takes to make a file this big, e.g. 1GB.")
+    parser.add_option("-t", "--times", type="int", default=1, help="Number of times (records) to write, if no --size.")
+    parser.add_option("-v", "--variables", type="int", default=1, help="Number of data variables.")
+    parser.add_option("--depths", type="int", default=50, help="Depth levels of each profile.")
+    parser.add_option("--lats", type="int", default=180, help="Latitudes in the grid.")
+    parser.add_option("--lons", type="int", default=360, help="Longitudes in the grid.")
+    opts, args = parser.parse_args()
+
+    if len(args) != 2 or args[0] not in FEATURE_TYPES:
+        parser.error("Give a feature type (%s) and an output file" % ", ".join(FEATURE_TYPES))
+
+    kwargs = {'variables': opts.variables}
+    if args[0] == 'profile':
+        kwargs['depths'] = opts.depths
+    elif args[0] == 'grid':
+        kwargs['lats'] = opts.lats
+        kwargs['lons'] = opts.lons
+
+    if opts.size:
+        dataset = make_dataset_of_size(args[0], ncserver.parse_size(opts.size), **kwargs)
+    else:
+        dataset = make_dataset(args[0], opts.times, **kwargs)
+
+    write(dataset, args[1])
+    print "Wrote %d times, %d bytes to %s" % (dataset.numrecs, dataset.size, args[1])
+
+if __name__ == "__main__":
+    sys.exit(main())
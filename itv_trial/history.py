@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/history.py
+@brief Records how long test classes and their containers took, and estimates future runs from it.
+
+The history file holds one JSON object per line, one line per test class (or group of classes,
+with --merge) run:
+
+    {"time": 1307462400.0, "classes": ["tests.services.coi.test_attribute_store.AttributeStoreTest"],
+     "sysname": "3f2a1b", "status": 0, "reused": false,
+     "start": 4.21, "trial": 2.93, "teardown": 0.01,
+     "containers": [{"app": "res/apps/attributestore.app", "args": "", "ready": 4.18, "status": "ready"}]}
+
+"start" is the time taken to get all containers up, "trial" the trial run and "teardown" the time
+to stop (or pool) the containers, all in seconds. For each container, "ready" is the time from
+spawning it to its lockfile being unlocked.
+"""
+
+import os, time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+HISTORY_WINDOW = 5              # how many of the most recent runs estimates are averaged over
+DEFAULT_CONTAINER_COST = 10.0   # seconds, guessed for a container with no history
+DEFAULT_TRIAL_COST = 10.0       # seconds, guessed for the trial run of a class with no history
+
+def record(path, classes, sysname, status, start, trial, teardown, containers, reused=False):
+    """
+    Appends the timings of one test class run to the history file.
+    """
+    entry = {'time'      : time.time(),
+             'classes'   : classes,
+             'sysname'   : sysname,
+             'status'    : status,
+             'reused'    : reused,
+             'start'     : start,
+             'trial'     : trial,
+             'teardown'  : teardown,
+             'containers': containers}
+
+    append_json_line(path, entry)
+
+def append_json_line(path, obj):
+    """
+    Appends obj to path as one line of JSON. Used for every file itv_trial workers add to at once
+    (history, traces, resource samples).
+    """
+    # a single write to a file opened for append, so parallel workers don't interleave lines
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0644)
+    try:
+        os.write(fd, json.dumps(obj) + "\n")
+    finally:
+        os.close(fd)
+
+def _mean(values):
+    return sum(values) / len(values)
+
+class TimingHistory(object):
+    """
+    Past timings read from a history file, used to estimate how long a test class will take.
+    """
+    def __init__(self, path, window=HISTORY_WINDOW):
+        self.window = window
+        self.classes = {}       # ",".join(classes) => list of total run times, oldest first
+        self.apps = {}          # (app, args) => list of spawn to ready times, oldest first
+
+        if not os.path.exists(path):
+            return
+
+        f = open(path)
+        for line in f:
+            try:
+                entry = json.loads(line)
+                total = entry['start'] + entry['trial'] + entry['teardown']
+            except (ValueError, KeyError, TypeError):
+                continue        # ignore lines from interrupted writes
+
+            # reused containers didn't pay the start, so they'd skew the estimate
+            if not entry.get('reused'):
+                self.classes.setdefault(",".join(entry['classes']), []).append(total)
+
+            for container in entry.get('containers', []):
+                if container.get('status') == 'ready':
+                    self.apps.setdefault((container['app'], container['args']), []).append(container['ready'])
+        f.close()
+
+    def app_cost(self, app, args):
+        """
+        Estimates the seconds it takes a container to come up.
+        """
+        times = self.apps.get((app, args))
+        if not times:
+            return DEFAULT_CONTAINER_COST
+
+        return _mean(times[-self.window:])
+
+    def class_cost(self, classes, apps):
+        """
+        Estimates the seconds it takes to run a group of test classes.
+
+        @param classes  List of the "module.Class" names of the group.
+        @param apps     List of (app, args) tuples the group depends on, used if the group has no history.
+        """
+        times = self.classes.get(",".join(classes))
+        if times:
+            return _mean(times[-self.window:])
+
+        return sum([self.app_cost(app, args) for app, args in apps]) + DEFAULT_TRIAL_COST
+
+def lpt_makespan(costs, jobs):
+    """
+    Simulates handing out work longest first to whichever of the jobs frees up first.
+
+    @returns    The estimated wall time to run everything.
+    """
+    finish = [0.0] * max(jobs, 1)
+    for cost in sorted(costs, reverse=True):
+        finish.sort()
+        finish[0] += cost
+
+    return max(finish)
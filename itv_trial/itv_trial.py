@@ -27,9 +27,9 @@ the command line, intended to be used by the app_dependencies themselves. Some s
     app_dependencies = ["res/apps/attributestore.app"]
 
     # starts two attribute store apps
-    app_dependencies = [("res/apps/attributestore.app, "id=1")      # id is not used by attributestore but is used
-                ("res/apps/attributestore.app, "id=2")]     #   to differentiate the two attributestore
-                                                            #   app_dependencies here.
+    app_dependencies = [("res/apps/attributestore.app", "id=1"),    # id is not used by attributestore but is used
+                        ("res/apps/attributestore.app", "id=2")]    #   to differentiate the two attributestore
+                                                                    #   app_dependencies here.
 
 Example:
 
@@ -64,6 +64,26 @@ Important points:
   system. itv_trial takes care of this for you, but if you want to deploy these tests vs 
   a CEI spawned environment, you must set the environment variable ION_TEST_CASE_SYSNAME
   to be the same as the sysname the CEI environment was spawned with.
+- With --reuse, containers are kept running between test classes that have identical
+  app_dependencies. If your test leaves state behind in its apps that would break the next
+  test class, set "reuse_app_dependencies = False" on it.
+- "itv serve tests/..." starts everything those tests need once and keeps it running;
+  "itv run tests/..." then runs tests against it without starting anything, and "itv stop"
+  shuts it down. Containers whose .app/.rel files change are restarted by the server.
+- "itv bench tests/boot_level_tests" boots the app_dependencies of each test class --runs times
+  and reports how long it takes until the containers unlock, until the class's ping_services
+  answer, and to tear them down, as JSON in --bench-output to compare between ioncore versions.
+  ping_services is an optional class attribute listing the service names that answer a ping
+  once the class's app_dependencies are up, e.g. ['datastore', 'resource_registry'].
+- Containers run in their own process groups and are stopped with SIGTERM, then SIGKILL if they
+  don't exit in time. Containers left running by an itv_trial that died are stopped by the next
+  run; "itv sweep [sysnames]" does the same, and also stops everything under the given sysnames.
+  Either way only the current user's containers are touched.
+- Test classes are found by reading test modules rather than importing them, so app_dependencies
+  should be a literal list in the class body. Tests whose app_dependencies are computed still work,
+  but their modules get imported to find them. Use --no-discovery-cache to always import.
+- To wait for events, don't sleep for the worst case: make an itv_trial.eventwait.EventWait the
+  subscriber's ondata and yield its wait(count, timeout), which returns as soon as they're in.
 """
 
 import os, tempfile, signal, time
@@ -75,6 +95,27 @@ import optparse
 import sys
 import fcntl
 import string
+import threading
+import Queue
+import socket
+import select
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import bootgraph
+import discovery
+import history
+import tracing
+import resources
+import procs
+import stats
+
+READY_POLL_INTERVAL = 0.05      # seconds between checks for a starting container's lockfile
+SERVE_CHECK_INTERVAL = 2.0      # seconds between checks for changed .app/.rel files by "itv serve"
+PING_DEADLINE = 300.0           # seconds "itv bench" waits for a stack's ping_services to answer
 
 def gen_sysname():
     return str(uuid4())[:6]     # gen uuid, use at most 6 chars
@@ -84,30 +125,68 @@ def get_opts():
     Get command line options.
     Sets up option parser, calls gen_sysname to create a new sysname for defaults.
     """
-    p = optparse.OptionParser()
+    p = optparse.OptionParser(usage="%prog [options] [serve|run|stop|bench] [tests and .itv files]\n       %prog sweep [sysnames]")
 
     p.add_option("--sysname",   action="store",     dest="sysname", help="Use this sysname for CCs/trial. If not specified, one is automatically generated.")
     p.add_option("--hostname",  action="store",     dest="hostname",help="Connect to the broker at this hostname. If not specified, uses localhost.")
     p.add_option("--merge",     action="store_true",dest="merge",   help="Merge the environment for all integration tests and run them in one shot.")
-    p.add_option("--no-pause",  action="store_true",dest="nopause", help="Do not pause after finding all tests and deps to run.")
+    p.add_option("--no-pause",  action="store_true",dest="nopause", help="Do not ask for confirmation after finding all tests and deps to run. Never asked when stdin is not a terminal.")
     p.add_option("--debug",     action="store_true",dest="debug",   help="Prints verbose debugging messages.")
     p.add_option("--debug-cc",  action="store_true",dest="debug_cc",help="If specified, instead of running trial, drops you into a CC shell after starting apps.")
     p.add_option("--wrap-twisted-bin", action="store",dest="wrapbin",help="Wrap calls to start twisted containers for dependencies in this specified binary. i.e. profiler, valgrind, etc.")
-
-    p.set_defaults(sysname=gen_sysname(), hostname="localhost", debug=False, debug_cc=False)  # make up a new random sysname
+    p.add_option("-j", "--jobs", action="store", type="int", dest="jobs", help="Run this many test classes at once, each against its own containers and sysname. Output of each class goes to a log file.")
+    p.add_option("--parallel-start", action="store_true", dest="parallelstart", help="Start app deps in parallel as far as their .rel/.app dependencies allow, instead of one at a time in the listed order. The descriptors don't say everything (a level's do-init, say), so this is off by default.")
+    p.add_option("--reuse",     action="store_true",dest="reuse",   help="Keep containers running after a test class and reuse them for later classes with identical app_dependencies.")
+    p.add_option("--pool-size", action="store", type="int", dest="poolsize", help="With --reuse, the most sets of containers to keep running at once (least recently used are stopped first). Default 2.")
+    p.add_option("--history",   action="store",     dest="history", help="Record timings of test classes and containers to this file, and use them to order --jobs runs. Default .itv_history.")
+    p.add_option("--no-history",action="store_const",const=None, dest="history", help="Do not record or use timings.")
+    p.add_option("--trace",     action="store",     dest="trace",   help="Record a timeline of container starts, trial runs and teardowns to this file, as Chrome trace-event JSON (load it in chrome://tracing or ui.perfetto.dev).")
+    p.add_option("--sample-interval", action="store", type="float", dest="sampleinterval", help="Sample the memory, CPU time, open files and threads of every container this often (in seconds) while its tests run, and report the peak and growth per test class.")
+    p.add_option("--samples",   action="store",     dest="samples", help="With --sample-interval, write the samples to this file. Default .itv_samples.")
+    p.add_option("--no-sweep",  action="store_true",dest="nosweep", help="Do not stop containers left running by itv_trial processes that are gone before starting.")
+    p.add_option("--runs",      action="store", type="int", dest="runs", help="With \"itv bench\", how many times to boot the app_dependencies of each test class. Default 5.")
+    p.add_option("--bench-output", action="store",  dest="benchoutput", help="With \"itv bench\", write the report to this file as JSON. Default itv_bench.json.")
+    p.add_option("--control-socket", action="store", dest="controlsocket", help="Socket \"itv serve\" listens on, and \"itv run\"/\"itv stop\" connect to. Default .itv_serve.sock.")
+    p.add_option("--discovery-cache", action="store", dest="discoverycache", help="Find test classes by reading test modules, caching what was read in this file, instead of importing them. Default .itv_discovery.")
+    p.add_option("--no-discovery-cache", action="store_const", const=None, dest="discoverycache", help="Find test classes by importing every test module, like trial does.")
+    p.add_option("--reset-hook",action="store",     dest="resethook",help="With --reuse, run this shell command before handing reused containers to the next test class. A non-zero exit status causes them to be restarted.")
+
+    p.set_defaults(sysname=gen_sysname(), hostname="localhost", debug=False, debug_cc=False, jobs=1, parallelstart=False, reuse=False, poolsize=2, history='.itv_history', samples='.itv_samples', controlsocket='.itv_serve.sock', discoverycache='.itv_discovery', runs=5, benchoutput='itv_bench.json')  # make up a new random sysname
     return p.parse_args()
 
-def get_test_classes(testargs, debug=False):
+def get_test_classes(testargs, debug=False, cachefile=None):
     """
     Gets a set of test classes that will be run.
     Uses the same parsing loader that trial does (which we eventually run).
 
+    With a cachefile, test modules are read instead of imported (see discovery.py), and the classes
+    returned are stand-ins with the same module, name and attributes. Only names that can't be
+    worked out that way are handed to the loader.
+
     @returns    A tuple of all TestCase classes found and all test_ methods found.
     """
-    totalsuite = TestLoader().loadByNames(testargs, True)
     all_testclasses = set()     # a set of all TestCase derived classes we find
     all_x = set()               # a set of every single test method in the test suite
 
+    if cachefile is not None and discovery.ast is not None:
+        finder = discovery.Discoverer(cachefile)
+        all_testclasses, all_x, testargs = finder.find(testargs)
+        try:
+            finder.save()
+        except (IOError, OSError), ex:
+            print "WARNING: could not write discovery cache %s: %s" % (cachefile, ex)
+
+        if debug:
+            for x in all_testclasses:
+                print "Adding to test suites (read)", x
+            for x in testargs:
+                print "Loading with trial's loader", x
+
+        if len(testargs) == 0:
+            return (all_testclasses, all_x)
+
+    totalsuite = TestLoader().loadByNames(testargs, True)
+
     def walksuite(suite, res):
         for x in suite:
             all_x.add(x)
@@ -155,14 +234,10 @@ def build_twistd_args(service, serviceargs, pidfile, logfile, lockfile, opts, sh
 
     return sargs
 
-def main():
-    opts, args = get_opts()
-
-    # split args into two groups - probable tests, and .itv eval'able files
-    itvfiles = [x for x in args if x.endswith('.itv')]
-    testfiles = [x for x in args if x not in itvfiles]
-
-    # parse and load .itvs, merge into one big set
+def load_itv_files(itvfiles):
+    """
+    Parses and loads .itv files, merging them into one big in order list of apps.
+    """
     itvfileapps = []
     for itvfile in itvfiles:
         f = open(itvfile)
@@ -175,226 +250,1172 @@ def main():
         except SyntaxError:
             print "ERROR: Could not parse itv file", itvfile
 
-    if opts.debug and len(itvfileapps) > 0:
-        print "Apps to run with all tests (via .itv):", itvfileapps
+    return itvfileapps
 
-    all_testclasses, all_x = get_test_classes(testfiles, opts.debug)
+def get_app_dependencies(testclass, itvfileapps):
+    """
+    Collects the app_dependencies for a group of test classes.
 
-    # if we have no tests, yet we have itvfiles, that means we need to imply --debug-cc
-    if len(testfiles) == 0 and len(itvfileapps) > 0:
-        print "ITV files only specified, no tests: implying --debug-cc"
-        opts.debug_cc = True
+    @returns    A tuple of the in order list of app deps (itv file apps on the end) and a dict
+                associating each app dep to the test classes that require it.
+    """
+    app_dependencies = []
+    dep_assoc = {}          # associates app deps to test classes
+    for x in testclass:
+        if hasattr(x, 'app_dependencies'):
+            for y in x.app_dependencies:
 
-        # we also need to fake that we have a test so the logic below runs
-        all_testclasses = [object]
+                # add to in order list of app deps
+                if not y in app_dependencies:
+                    app_dependencies.append(y)
 
-    if opts.debug and len(all_x) == 1:
-        print "\n** SINGLE TEST METHOD SPECIFIED **\n"
+                # add association to class (mostly for debugging only)
+                if not dep_assoc.has_key(y):
+                    dep_assoc[y] = []
 
-    if opts.merge:
-        # merge all tests into one set
-        testset = [all_testclasses]
+                dep_assoc[y].append(x)
+
+    # add any and all itv file apps (on the end)
+    app_dependencies.extend(itvfileapps)
+
+    return (app_dependencies, dep_assoc)
+
+def get_class_names(testclass):
+    """
+    Returns the "module.Class" names of a group of test classes.
+    """
+    return ["%s.%s" % (x.__module__, x.__name__) for x in testclass]
+
+def estimate_cost(testclass, itvfileapps, timings=None):
+    """
+    Estimates the cost of running a group of test classes, used to order the work queue when
+    running with --jobs. With a TimingHistory, this is the expected run time in seconds.
+    Without one, booting containers dominates the run time of most classes, so the number
+    of app deps is used.
+    """
+    app_dependencies, dep_assoc = get_app_dependencies(testclass, itvfileapps)
+    if timings is None:
+        return len(app_dependencies)
+
+    return timings.class_cost(get_class_names(testclass), get_pool_key(app_dependencies))
+
+def parse_service(service):
+    """
+    Splits an app_dependencies entry into the app and the arguments to pass to it.
+
+    @returns    A tuple of the app name and a comma separated string of param=value pairs, or None
+                if the entry could not be understood.
+    """
+    # service - allowed to be a string or a list/tuple iterable, first item must be a string
+    if isinstance(service, str):
+        servicename = service
+        serviceargs = []
+    elif hasattr(service, '__iter__'):
+        if len(service) == 0 or not isinstance(service[0], str):
+            print "Unknown service specified: list/tuple but first item is not a string?", service
+            return None
+        servicename = service[0]
+        serviceargs = service[1:]
     else:
-        # split out each test on its own
-        testset = [[x] for x in all_testclasses]
+        print "Unknown service type specified:", service
+        return None
+
+    # build serviceargsstr to pass to service (should be param=value pairs as strings, comma separated, no spaces)
+    serviceargsstr=""
+    if len(serviceargs) and serviceargs[0] is not None:
+        flatparams = []
+        for x in serviceargs:
+            if isinstance(x, list):
+                flatparams.extend((string.strip(y) for y in x))
+            else:
+                flatparams.append(string.strip(x))
 
-    # mapping of testclass => result (as a status code, returned by executing trial)
-    results = {}
+        serviceargsstr = ",".join(flatparams)
 
-    for testclass in testset:
-        app_dependencies = []
-        dep_assoc = {}          # associates app deps to test classes
-        for x in testclass:
-            print str(x), "%s.%s" % (x.__module__, x.__name__)
-            if hasattr(x, 'app_dependencies'):
-                for y in x.app_dependencies:
-
-                    # add to in order list of app deps
-                    if not y in app_dependencies:
-                        app_dependencies.append(y)
-
-                    # add association to class (mostly for debugging only)
-                    if not dep_assoc.has_key(y):
-                        dep_assoc[y] = []
-
-                    dep_assoc[y].append(x)
-
-        # add any and all itv file apps (on the end)
-        app_dependencies.extend(itvfileapps)
-
-        if len(app_dependencies) > 0:
-            print "The following app_dependencies will be started:"
-            for service in app_dependencies:
-                if service in itvfileapps:
-                    extra = "(via .itv file)"
-                else:
-                    extra = "(%s)" % ",".join([tc.__name__ for tc in dep_assoc[service]])
+    return (servicename, serviceargsstr)
 
-                print "\t", service, extra
+def get_pool_key(app_dependencies):
+    """
+    Normalizes a list of app deps into a hashable key: a tuple of (app path, args string)
+    pairs, so equivalent string/tuple/list spellings of the same deps compare equal.
+    """
+    key = []
+    for service in app_dependencies:
+        parsed = parse_service(service)
+        if parsed is None:
+            continue
+        key.append((os.path.normpath(parsed[0]), parsed[1]))
 
-            if not opts.nopause:
-                print "Pausing before starting..."
-                time.sleep(5)
+    return tuple(key)
 
-        ccs = []
-        pid_files = []
-        for service in app_dependencies:
+def is_reusable(testclass):
+    """
+    Returns True if every class in the group allows its containers to be reused. Test classes
+    that leave state behind in their apps can opt out with "reuse_app_dependencies = False".
+    """
+    for x in testclass:
+        if not getattr(x, 'reuse_app_dependencies', True):
+            return False
+
+    return True
+
+def wait_for_lockfile(index, po, lockfile, events):
+    """
+    Waits for a spawned container to come up, putting (index, event) tuples on the events queue:
+    "appeared" once its lockfile exists, then "ready" once the container unlocks it, or "exited"
+    if the container process died first.
+
+    Meant to run in its own thread. The lockfile appearing is polled for every
+    READY_POLL_INTERVAL seconds, but the unlock is waited on with a blocking lock so it is seen
+    as soon as it happens.
+    """
+    while not os.path.exists(lockfile):
+        if po.poll() is not None:
+            events.put((index, "exited"))
+            return
+        time.sleep(READY_POLL_INTERVAL)
+
+    events.put((index, "appeared"))
+
+    # ok, lock file is up - wait until os tells us it is unlocked
+    lfh = open(lockfile, 'w')
+    fcntl.lockf(lfh, fcntl.LOCK_EX)
+    lfh.close()
+    os.unlink(lockfile)
+
+    # a container that dies releases its lock too
+    if po.poll() is not None:
+        events.put((index, "exited"))
+    else:
+        events.put((index, "ready"))
+
+def start_containers(app_dependencies, opts, timings=None, classes=None):
+    """
+    Spawns a capability container for each app dep and waits for them to come up.
+
+    Each container is only spawned once the ones listed before it are up. With --parallel-start,
+    each is spawned as soon as the containers it needs (see bootgraph) are up, and all of them
+    are waited on together, so starting takes as long as the critical path through the app deps
+    instead of the sum of all of them.
+
+    The returned lists are in the order of app_dependencies (leaving out entries that could
+    not be parsed). If a timings list is given, a dict with the app, its args, the seconds it took to come up
+    and whether it did ("ready" or "exited") is appended to it for every container. With --trace, the
+    boot of every container is recorded, tagged with the names of the test classes it is for.
+
+    @returns    A tuple of the list of Popen objects for the spawned containers and the list of their pidfiles.
+    """
+    services = []
+    for service in app_dependencies:
+        parsed = parse_service(service)
+        if parsed is not None:
+            services.append(parsed)
+
+    if opts.parallelstart:
+        bootdeps = bootgraph.build_boot_graph([x[0] for x in services])
+    else:
+        bootdeps = [set(range(i)) for i in range(len(services))]
+
+    if opts.debug:
+        for level, indices in enumerate(bootgraph.get_boot_levels(bootdeps)):
+            print "Boot level %d:" % level, ", ".join([services[i][0] for i in indices])
+
+    ccs = [None] * len(services)        # in the order of the app deps, not the order started
+    pid_files = [None] * len(services)
+    events = Queue.Queue()
+    starting = {}       # index into services => spawn time, for containers that are not up yet
+    appeared = {}       # index into services => time its lockfile appeared
+    unstarted = range(len(services))
+    up = set()          # indices of containers that are up (or died trying)
+
+    try:
+        while len(unstarted) > 0 or len(starting) > 0:
+
+            for nextidx in [x for x in unstarted if bootdeps[x] <= up]:
+                unstarted.remove(nextidx)
+                servicename, serviceargsstr = services[nextidx]
+
+                # build command line
+                uniqueid = uuid4()
+                basepath = os.path.join(tempfile.gettempdir(), 'cc-%s' % (str(uniqueid)))
+                pidfile = '%s.pid' % (basepath)
+                logfile = '%s.log' % (basepath)
+                lockfile = '%s.lock' % (basepath)
+                pid_files[nextidx] = pidfile
+
+                sargs = build_twistd_args(servicename, serviceargsstr, pidfile, logfile, lockfile, opts)
+
+                if opts.debug:
+                    print sargs
+
+                # set alternate logging conf to just go to stdout
+                newenv = os.environ.copy()
+                newenv['ION_ALTERNATE_LOGGING_CONF'] = 'res/logging/ionlogging_stdout.conf'
+                newenv[procs.OWNER_ENV] = procs.get_owner_id()
+
+                # spawn container, in its own process group so it can be stopped along with
+                # anything it starts
+                po = subprocess.Popen(sargs, env=newenv, preexec_fn=os.setpgrp)
+
+                # add to list of open containers
+                ccs[nextidx] = po
+
+                print "Waiting for container to start:", servicename
+                tracing.name_row(opts.trace, po.pid, "%s (%s)" % (servicename, opts.sysname))
+
+                waiter = threading.Thread(target=wait_for_lockfile, args=(nextidx, po, lockfile, events))
+                waiter.setDaemon(True)
+                waiter.start()
+
+                starting[nextidx] = time.time()
+
+            # use a timeout, a blocking get can't be interrupted by CTRL-C
+            try:
+                index, event = events.get(True, 1)
+            except Queue.Empty:
+                continue
+
+            servicename = services[index][0]
+            if event == "appeared":
+                print "\tLockfile appeared, waiting for container unlock:", servicename
+                appeared[index] = time.time()
+                continue
 
-            # service - allowed to be a string or a list/tuple iterable, first item must be a string
-            if isinstance(service, str):
-                servicename = service
-                serviceargs = []
-            elif hasattr(service, '__iter__'):
-                if len(service) == 0 or not isinstance(service[0], str):
-                    print "Unknown service specified: list/tuple but first item is not a string?", service
-                    continue
-                servicename = service[0]
-                serviceargs = service[1:]
+            spawned = starting.pop(index)
+            now = time.time()
+            elapsed = now - spawned
+            up.add(index)
+
+            pid = ccs[index].pid
+            if index in appeared:
+                tracing.span(opts.trace, "wait for lockfile", spawned, appeared[index], "container", pid)
+                tracing.span(opts.trace, "wait for unlock", appeared[index], now, "container", pid)
+            tracing.span(opts.trace, os.path.basename(servicename), spawned, now, "container", pid,
+                         sysname=opts.sysname, app=servicename, args=services[index][1], status=event,
+                         classes=classes, after=[services[x][0] for x in sorted(bootdeps[index])])
+
+            if event == "ready":
+                print "\tUnlocked! %s (%.2fs)" % (servicename, elapsed)
             else:
-                print "Unknown service type specified:", service
+                print "ERROR: Container exited before it came up:", servicename
+
+            if timings is not None:
+                timings.append({'app': os.path.normpath(servicename), 'args': services[index][1], 'ready': elapsed, 'status': event})
+
+    except KeyboardInterrupt:
+        print "CTRL-C PRESSED, ATTEMPTING TO TERMINATE CCS"
+
+        # must cleanup spawned subprocess(es)!
+        stop_containers([cc for cc in ccs if cc is not None], opts.trace)
+
+        # reraise, should kill program
+        raise
+
+    return (ccs, pid_files)
+
+def stop_containers(ccs, trace=None):
+    """
+    Terminates spawned containers and waits for them to exit.
+
+    The process group of each container (which includes anything it started) is sent SIGTERM,
+    and SIGKILL if it hasn't exited procs.STOP_TIMEOUT seconds later. Containers that already
+    exited get their group signalled too, in case they left something behind. With a trace, the
+    SIGTERM, any SIGKILL and the exit are marked on each container's row.
+    """
+    print "Cleaning up app_dependencies..."
+    bypid = {}
+    exited = {}
+    stopping = time.time()
+    for cc in ccs:
+        if cc.poll() is not None:
+            print "\tContainer with pid %d already exited (%d)" % (cc.pid, cc.returncode)
+            exited[cc.pid] = None       # when isn't known
+        else:
+            print "\tClosing container with pid:", cc.pid
+            tracing.instant(trace, "SIGTERM", stopping, "container", cc.pid)
+
+        bypid[cc.pid] = cc
+
+    def reap(pgid):
+        if bypid[pgid].poll() is not None and pgid not in exited:
+            exited[pgid] = time.time()
+
+    # containers are process group leaders, their pid is their pgid
+    killed = procs.stop_groups(bypid.keys(), reap)
+    for pid in killed:
+        print "\tContainer with pid %d did not exit within %ds, killed" % (pid, procs.STOP_TIMEOUT)
+        tracing.instant(trace, "SIGKILL", time.time(), "container", pid)
+
+    for cc in ccs:
+        cc.wait()
+        when = exited.get(cc.pid, time.time())
+        if when is not None:
+            tracing.instant(trace, "exit", when, "container", cc.pid, returncode=cc.returncode)
+
+def read_pidfiles(pid_files):
+    """
+    Reads the pids of started containers out of their pidfiles.
+
+    @returns    A list of pids, as strings.
+    """
+    app_pids = []
+    for pidfile in pid_files:
+        try:
+            f = open(pidfile)
+            pid = f.read().strip()
+            f.close()
+            app_pids.append(pid)
+        except IOError, ex:
+            print "Problem with the pidfile: %s  errno: %s message: %s" % (pidfile, ex.errno, ex.message)
+
+    return app_pids
+
+class ContainerPool(object):
+    """
+    Keeps sets of started containers running between test classes, keyed by get_pool_key of
+    their app deps, so a later class with identical app_dependencies can reuse them instead of
+    booting the same stack again.
+
+    Each set keeps the sysname it was started with. At most maxsize sets are kept; when more
+    are released, the least recently used set is stopped. Before a set is reused, its
+    containers are checked to still be alive and the --reset-hook (if any) is run against it.
+    """
+    def __init__(self, opts, maxsize):
+        self.opts = opts
+        self.maxsize = maxsize
+        self.entries = []       # [key, sysname, ccs, pid_files], least recently used first
+
+    def acquire(self, app_dependencies, reusable=True, timings=None, classes=None):
+        """
+        Gets running containers for these app deps, starting them if there are none to reuse
+        (or reusable is False). Sets opts.sysname to the sysname they run under.
+
+        @returns    A tuple of the list of Popen objects, the list of their pidfiles, and whether
+                    they were reused.
+        """
+        key = get_pool_key(app_dependencies)
+
+        for entry in self.entries:
+            if entry[0] != key or not reusable:
                 continue
 
-            # build serviceargsstr to pass to service (should be param=value pairs as strings, comma separated, no spaces)
-            serviceargsstr=""
-            if len(serviceargs) and serviceargs[0] is not None:
-                flatparams = []
-                for x in serviceargs:
-                    if isinstance(x, list):
-                        flatparams.extend((string.strip(y) for y in x))
-                    else:
-                        flatparams.append(string.strip(x))
+            self.entries.remove(entry)
+            ekey, sysname, ccs, pid_files = entry
 
-                serviceargsstr = ",".join(flatparams)
+            if not self._check_alive(ccs):
+                print "Pooled containers for sysname", sysname, "have exited, restarting them"
+                stop_containers(ccs, self.opts.trace)
+                break
 
-            # build command line
-            uniqueid = uuid4()
-            basepath = os.path.join(tempfile.gettempdir(), 'cc-%s' % (str(uniqueid)))
-            pidfile = '%s.pid' % (basepath)
-            logfile = '%s.log' % (basepath)
-            lockfile = '%s.lock' % (basepath)
-            pid_files.append(pidfile)
+            if not self._reset(sysname, pid_files):
+                print "Reset hook failed for sysname", sysname, "restarting containers"
+                stop_containers(ccs, self.opts.trace)
+                break
 
-            sargs = build_twistd_args(servicename, serviceargsstr, pidfile, logfile, lockfile, opts)
+            print "Reusing running containers (sysname %s)" % sysname
+            self.opts.sysname = sysname
+            return (ccs, pid_files, True)
 
-            if opts.debug:
-                print sargs
+        # a live set may already be using the current sysname, new containers need their own
+        if self.opts.sysname in [entry[1] for entry in self.entries]:
+            self.opts.sysname = gen_sysname()
 
-            # set alternate logging conf to just go to stdout
-            newenv = os.environ.copy()
-            newenv['ION_ALTERNATE_LOGGING_CONF'] = 'res/logging/ionlogging_stdout.conf'
+        ccs, pid_files = start_containers(app_dependencies, self.opts, timings, classes)
+        return (ccs, pid_files, False)
 
-            # spawn container
-            po = subprocess.Popen(sargs, env=newenv)
+    def release(self, app_dependencies, ccs, pid_files, reusable=True):
+        """
+        Returns containers to the pool as the most recently used, stopping the least recently
+        used sets if over maxsize. Containers that are not reusable are stopped right away.
+        """
+        if not reusable:
+            stop_containers(ccs, self.opts.trace)
+            return
 
-            # add to list of open containers
-            ccs.append(po)
+        self.entries.append([get_pool_key(app_dependencies), self.opts.sysname, ccs, pid_files])
 
-            print "Waiting for container to start:", servicename
+        while len(self.entries) > self.maxsize:
+            entry = self.entries.pop(0)
+            print "Evicting pooled containers (sysname %s)" % entry[1]
+            stop_containers(entry[2], self.opts.trace)
 
-            # wait for lockfile to appear
-            try:
-                while not os.path.exists(lockfile):
-                    if opts.debug:
-                        print "\tWaiting for lockfile", lockfile, "to appear"
-                    time.sleep(1)
-                else:
-                    # ok, lock file is up - wait until os tells us it is unlocked
-                    lfh = open(lockfile, 'w')
-                    print "\tLockfile appeared, waiting for container unlock..."
-                    result = fcntl.lockf(lfh, fcntl.LOCK_EX)
-                    print "\tUnlocked!"
-                    lfh.close()
-                    os.unlink(lockfile)
+    def drain(self):
+        """
+        Stops every pooled container.
+        """
+        while len(self.entries) > 0:
+            entry = self.entries.pop(0)
+            stop_containers(entry[2], self.opts.trace)
 
-            except KeyboardInterrupt:
-                print "CTRL-C PRESSED, ATTEMPTING TO TERMINATE CCS"
+    def _check_alive(self, ccs):
+        for cc in ccs:
+            if cc.poll() is not None:
+                return False
 
-                # must cleanup spawned subprocess(es)!
-                for cc in ccs:
-                    os.kill(cc.pid, signal.SIGTERM)
+        return True
 
-                # reraise, should kill program
-                raise
+    def _reset(self, sysname, pid_files):
+        if not self.opts.resethook:
+            return True
 
-            #The containers has started so open the pidfiles
-           
-            
-        # relay signals to trial process we're waiting for
-        def handle_signal(signum, frame):
-            os.kill(trialpid, signum)
+        newenv = os.environ.copy()
+        newenv["ION_TEST_CASE_PIDS"] = ",".join(read_pidfiles(pid_files))
+        newenv["ION_TEST_CASE_SYSNAME"] = sysname
+        newenv["ION_TEST_CASE_BROKER_HOST"] = self.opts.hostname
 
-        trialpid = os.fork()
-        if trialpid != 0:
-            if opts.debug:
-                print "TRIAL CHILD PID IS ", trialpid
+        if self.opts.debug:
+            print "Running reset hook:", self.opts.resethook
 
-            # PARENT PROCESS: this script
+        return subprocess.call(self.opts.resethook, shell=True, env=newenv) == 0
 
-            # set new signal handlers to relay signals into trial
-            oldterm = signal.signal(signal.SIGTERM, handle_signal)
-            #oldkill = signal.signal(signal.SIGKILL, handle_signal)
-            oldint  = signal.signal(signal.SIGINT, handle_signal)
+def get_trial_env(pid_files, opts):
+    """
+    Gets the environment for running ItvTestCase tests against started containers.
+    """
+    newenv = os.environ.copy()
+    newenv["ION_TEST_CASE_PIDS"] = ",".join(read_pidfiles(pid_files))
+    newenv['ION_ALTERNATE_LOGGING_CONF'] = 'res/logging/ionlogging_stdout.conf'
+    newenv["ION_TEST_CASE_SYSNAME"] = opts.sysname
+    newenv["ION_TEST_CASE_BROKER_HOST"] = opts.hostname
 
-            # wait on trial
-            try:
-                cpid, status = os.waitpid(trialpid, 0)
+    return newenv
+
+def run_trial(testclass, pid_files, opts, args, all_x):
+    """
+    Forks and runs trial (or a CC shell, if --debug-cc) for a group of test classes against
+    the already running containers, relaying signals to it while we wait.
 
-                # STATUS FROM TRIAL:
-                # 0     - test OK
-                # 256   - test FAIL or ERROR
+    @returns    The status of the trial process as returned by os.waitpid, or None if it could
+                not be waited on.
+    """
+    status = None
 
-                results[str(testclass)] = status
+    # relay signals to trial process we're waiting for
+    def handle_signal(signum, frame):
+        os.kill(trialpid, signum)
 
-                if opts.debug:
-                    print "Trial complete for", testclass, " status: ", status
+    forked = time.time()
+    trialpid = os.fork()
+    if trialpid != 0:
+        if opts.debug:
+            print "TRIAL CHILD PID IS ", trialpid
 
-            except OSError:
-                pass
+        # PARENT PROCESS: this script
+
+        # set new signal handlers to relay signals into trial
+        oldterm = signal.signal(signal.SIGTERM, handle_signal)
+        #oldkill = signal.signal(signal.SIGKILL, handle_signal)
+        oldint  = signal.signal(signal.SIGINT, handle_signal)
+
+        # wait on trial
+        try:
+            cpid, status = os.waitpid(trialpid, 0)
+
+            # STATUS FROM TRIAL:
+            # 0     - test OK
+            # 256   - test FAIL or ERROR
+
+            if opts.debug:
+                print "Trial complete for", testclass, " status: ", status
+
+        except OSError:
+            pass
+
+        tracing.span(opts.trace, "trial", forked, time.time(), "trial", pid=trialpid, status=status,
+                     sysname=opts.sysname, classes=get_class_names(testclass))
 
-            # restore old signal handlers
-            signal.signal(signal.SIGTERM, oldterm)
-            #signal.signal(signal.SIGKILL, oldkill)
-            signal.signal(signal.SIGINT, oldint)
+        # restore old signal handlers
+        signal.signal(signal.SIGTERM, oldterm)
+        #signal.signal(signal.SIGKILL, oldkill)
+        signal.signal(signal.SIGINT, oldint)
+    else:
+        # NEW CHILD PROCESS: spawn trial, exec into nothingness
+        newenv = get_trial_env(pid_files, opts)
+
+        if not opts.debug_cc:
+
+            # SPECIAL BEHAVIOR FOR SINGLE TEST SPECIFIED
+            if len(all_x) == 1:
+                trialargs = args
+            else:
+                trialargs = get_class_names(testclass)
+
+            os.execve("bin/trial", ["bin/trial"] + trialargs, newenv)
         else:
-            # NEW CHILD PROCESS: spawn trial, exec into nothingness
-            newenv = os.environ.copy()
-            app_pids = []
-            for pidfile in pid_files:
+            # spawn an interactive twistd shell into this system
+            print "DEBUG_CC:"
+            sargs = build_twistd_args("", "", 'debugcc.pid', 'debugcc.log', None, opts, True)
+            os.execve("bin/twistd", sargs, newenv)
+
+    return status
+
+def print_plan(testset, itvfileapps):
+    """
+    Prints every group of test classes that will be run, with the app deps each needs.
+    """
+    print "The following test classes will be run:"
+
+    for testclass in testset:
+        app_dependencies, dep_assoc = get_app_dependencies(testclass, itvfileapps)
+
+        print "\t", ", ".join(get_class_names(testclass))
+        for service in app_dependencies:
+            if service in itvfileapps:
+                print "\t\t", service, "(via .itv file)"
+            else:
+                print "\t\t", service
+
+def confirm_start(opts):
+    """
+    Asks to go ahead, unless --no-pause was given or nobody is at a terminal to answer.
+    CTRL-C here aborts the run before anything is started.
+    """
+    if opts.nopause or not sys.stdin.isatty():
+        return
+
+    raw_input("Press enter to start, CTRL-C to abort: ")
+
+def start_sampler(app_dependencies, ccs, pid_files, opts):
+    """
+    Starts sampling the resource usage of running containers.
+
+    @returns    The started resources.ResourceSampler.
+    """
+    services = [parse_service(x) for x in app_dependencies]
+    services = [x for x in services if x is not None]
+
+    containers = []
+    for (servicename, serviceargsstr), cc, pidfile in zip(services, ccs, pid_files):
+        # the pidfile has twistd's pid even when it's started through --wrap-twisted-bin
+        pid = cc.pid
+        pids = read_pidfiles([pidfile])
+        if len(pids) > 0 and pids[0].strip().isdigit():
+            pid = int(pids[0])
+
+        containers.append((os.path.normpath(servicename), serviceargsstr, pid))
+
+    sampler = resources.ResourceSampler(containers, opts.sampleinterval)
+    sampler.start()
+    return sampler
+
+def stop_sampler(sampler, classes, opts):
+    """
+    Stops sampling, prints the peak and growth of every container and records the samples to
+    the --samples file (and as counters to the --trace file).
+    """
+    sampler.stop()
+
+    if len(sampler.containers) == 0:
+        return
+
+    print "Resource usage of app_dependencies (sysname %s):" % opts.sysname
+    print resources.format_summary(sampler.containers, sampler.series)
+
+    if opts.samples:
+        resources.record(opts.samples, classes, opts.sysname, sampler.containers, sampler.series)
+
+    for (app, args, pid), samples in zip(sampler.containers, sampler.series):
+        for when, rss, cpu, fds, threads in samples:
+            if rss is not None:
+                tracing.counter(opts.trace, "%s %d" % (os.path.basename(app), pid), when,
+                                rss_mb=rss / 1048576.0, fds=fds, threads=threads)
+
+def run_testclass(testclass, itvfileapps, opts, args, all_x, pool=None):
+    """
+    Runs a group of test classes: starts their app_dependencies, runs trial, and tears the
+    containers down again. If a ContainerPool is given and the classes allow it, containers
+    are taken from and given back to the pool instead. Timings are recorded to the --history file,
+    and spans for starting, trial and teardown to the --trace file. With --sample-interval, the
+    containers are sampled while trial runs.
+
+    @returns    A tuple of the status of the trial process (None if it could not be determined)
+                and the seconds it all took.
+    """
+    for x in testclass:
+        print str(x), "%s.%s" % (x.__module__, x.__name__)
+
+    app_dependencies, dep_assoc = get_app_dependencies(testclass, itvfileapps)
+
+    if len(app_dependencies) > 0:
+        print "The following app_dependencies will be started:"
+        for service in app_dependencies:
+            if service in itvfileapps:
+                extra = "(via .itv file)"
+            else:
+                extra = "(%s)" % ",".join([tc.__name__ for tc in dep_assoc[service]])
+
+            print "\t", service, extra
+
+    reusable = is_reusable(testclass) and len(app_dependencies) > 0
+    reused = False
+    containers = []
+    classes = get_class_names(testclass)
+
+    started = time.time()
+
+    if pool is not None:
+        ccs, pid_files, reused = pool.acquire(app_dependencies, reusable, containers, classes)
+    else:
+        ccs, pid_files = start_containers(app_dependencies, opts, containers, classes)
+
+    ready = time.time()
+
+    try:
+        sampler = None
+        if opts.sampleinterval and not opts.debug_cc:
+            sampler = start_sampler(app_dependencies, ccs, pid_files, opts)
+
+        status = run_trial(testclass, pid_files, opts, args, all_x)
+
+        trialdone = time.time()
+
+        if sampler is not None:
+            stop_sampler(sampler, classes, opts)
+    except:
+        # containers are in their own process groups, a CTRL-C doesn't reach them
+        stop_containers(ccs, opts.trace)
+        raise
+
+    if pool is not None:
+        pool.release(app_dependencies, ccs, pid_files, reusable)
+    else:
+        stop_containers(ccs, opts.trace)
+
+    finished = time.time()
+
+    tracing.span(opts.trace, "start containers", started, ready, reused=reused)
+    tracing.span(opts.trace, "teardown", trialdone, finished, reusable=reusable)
+    tracing.span(opts.trace, ", ".join([x.__name__ for x in testclass]), started, finished, "testclass",
+                 sysname=opts.sysname, classes=classes, status=status)
+
+    if opts.history and not opts.debug_cc:
+        history.record(opts.history, classes, opts.sysname, status,
+                       ready - started, trialdone - ready, finished - trialdone, containers, reused)
+
+    return (status, finished - started)
+
+def run_parallel(testset, itvfileapps, opts, args, all_x):
+    """
+    Runs groups of test classes concurrently in opts.jobs forked worker processes.
+
+    Work is handed out from a queue ordered by estimate_cost, most expensive first (using the
+    --history timings when there are any), so the long running classes do not end up starting
+    last and the rest are packed around them. Each group runs against its own
+    containers under a freshly generated sysname, and its output is written to a log file
+    named after that sysname. Workers report the trial status back over a pipe.
+
+    With --reuse, every worker keeps its own ContainerPool. The work queue mirrors what each
+    worker has pooled and prefers to hand it a class it already has containers running for.
+
+    @returns    A tuple of dicts mapping str(testclass) => trial status and str(testclass) =>
+                seconds taken, same as a serial run.
+    """
+    timings = None
+    if opts.history:
+        timings = history.TimingHistory(opts.history)
+
+    costs = {}
+    for testclass in testset:
+        costs[str(testclass)] = estimate_cost(testclass, itvfileapps, timings)
+
+    queue = sorted(testset, key=lambda x: costs[str(x)], reverse=True)
+    pending = range(len(queue))
+    results = {}
+    durations = {}
+
+    if timings is not None:
+        print "Estimated run time: %ds with %d jobs (%ds serially)" % \
+            (history.lpt_makespan(costs.values(), opts.jobs), opts.jobs, sum(costs.values()))
+
+    resultr, resultw = os.pipe()
+    workers = {}        # worker pid => write end of its command pipe
+    warm = {}           # worker pid => pool keys the worker should have running, least recently used first
+    keys = [get_pool_key(get_app_dependencies(x, itvfileapps)[0]) for x in queue]
+
+    for i in range(min(opts.jobs, len(queue))):
+        cmdr, cmdw = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # WORKER PROCESS: must not hold the other workers' command pipes open
+            os.close(resultr)
+            os.close(cmdw)
+            for fd in workers.itervalues():
+                os.close(fd)
+
+            pool = None
+            if opts.reuse:
+                pool = ContainerPool(opts, opts.poolsize)
+
+            cmdf = os.fdopen(cmdr)
+            exitcode = 0
+            try:
                 try:
-                    f = open(pidfile)
-                    pid = f.read(6)
-                    f.close()
-                    app_pids.append(pid)
-                except IOError, ex:
-                    print "Problem with the pidfile: %s  errno: %s message: %s" % (pidfile, ex.errno, ex.message)
-            newenv["ION_TEST_CASE_PIDS"] = ",".join(app_pids)   
-            newenv['ION_ALTERNATE_LOGGING_CONF'] = 'res/logging/ionlogging_stdout.conf'
-            newenv["ION_TEST_CASE_SYSNAME"] = opts.sysname
-            newenv["ION_TEST_CASE_BROKER_HOST"] = opts.hostname
- 
-            if not opts.debug_cc:
-
-                # SPECIAL BEHAVIOR FOR SINGLE TEST SPECIFIED
-                if len(all_x) == 1:
-                    trialargs = args
-                else:
-                    trialargs = ["%s.%s" % (x.__module__, x.__name__) for x in testclass]
-                    
-                os.execve("bin/trial", ["bin/trial"] + trialargs, newenv)
+                    while True:
+                        line = cmdf.readline()
+                        if not line:
+                            break
+
+                        idx, opts.sysname, logpath = line.split()
+                        idx = int(idx)
+
+                        # send everything from here on (including trial and the containers) to the log
+                        sys.stdout.flush()
+                        sys.stderr.flush()
+                        logfd = os.open(logpath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+                        os.dup2(logfd, 1)
+                        os.dup2(logfd, 2)
+                        os.close(logfd)
+
+                        status, elapsed = run_testclass(queue[idx], itvfileapps, opts, args, all_x, pool)
+                        if status is None:
+                            status = -1
+
+                        sys.stdout.flush()
+                        os.write(resultw, "%d %d %d %f\n" % (os.getpid(), idx, status, elapsed))
+                finally:
+                    if pool is not None:
+                        pool.drain()
+            except KeyboardInterrupt:
+                exitcode = 1
+
+            os._exit(exitcode)
+
+        os.close(cmdr)
+        workers[pid] = cmdw
+        warm[pid] = []
+
+    os.close(resultw)
+
+    def dispatch(pid):
+        if len(pending) == 0:
+            os.close(workers.pop(pid))
+            return
+
+        idx = pending[0]
+        if opts.reuse:
+            # prefer the most expensive class this worker has containers pooled for
+            for x in pending:
+                if is_reusable(queue[x]) and keys[x] in warm[pid]:
+                    idx = x
+                    break
+
+            if is_reusable(queue[idx]):
+                if keys[idx] in warm[pid]:
+                    warm[pid].remove(keys[idx])
+                warm[pid].append(keys[idx])
+                del warm[pid][:-opts.poolsize]
+
+        pending.remove(idx)
+        sysname = gen_sysname()
+        logpath = os.path.join(tempfile.gettempdir(), 'itv-%s.log' % sysname)
+        print "Starting %s (sysname %s, log %s)" % (queue[idx], sysname, logpath)
+        os.write(workers[pid], "%d %s %s\n" % (idx, sysname, logpath))
+
+    try:
+        for pid in workers.keys():
+            dispatch(pid)
+
+        resultf = os.fdopen(resultr)
+        while len(workers) > 0:
+            line = resultf.readline()
+            if not line:
+                print "ERROR: All workers exited unexpectedly"
+                break
+
+            pid, idx, status, elapsed = line.split()
+            pid, idx, status, elapsed = int(pid), int(idx), int(status), float(elapsed)
+            if status != -1:
+                results[str(queue[idx])] = status
+                durations[str(queue[idx])] = elapsed
+
+            print "Finished %s, status: %d (%.1fs)" % (queue[idx], status, elapsed)
+            dispatch(pid)
+
+    finally:
+        for fd in workers.itervalues():
+            os.close(fd)
+
+        # reap the workers
+        while True:
+            try:
+                os.wait()
+            except OSError:
+                break
+
+    return (results, durations)
+
+def get_descriptor_mtimes(servicename):
+    """
+    Returns the modification times of the .app/.rel files an app dep is read from, None for
+    files that don't exist.
+    """
+    mtimes = {}
+    for path in bootgraph.get_descriptor_files(servicename):
+        try:
+            mtimes[path] = os.path.getmtime(path)
+        except OSError:
+            mtimes[path] = None
+
+    return mtimes
+
+def serve(app_dependencies, opts):
+    """
+    Runs "itv serve": starts the app deps once and keeps them running until stopped, answering
+    requests on the --control-socket so that "itv run" can run tests against them without
+    starting anything.
+
+    Requests are a single line:
+        status  - replies with a JSON object holding the sysname, broker hostname, app deps (as
+                  [app, args] pairs), pids and pidfiles of the running containers.
+        stop    - stops the containers and exits.
+
+    Every SERVE_CHECK_INTERVAL seconds (and before answering a status request), containers whose
+    .app/.rel files changed or that died are restarted on their own.
+    """
+    if os.path.exists(opts.controlsocket):
+        try:
+            request_server(opts, "status")
+            print "ERROR: Already serving on", opts.controlsocket
+            return
+        except socket.error:
+            os.unlink(opts.controlsocket)     # left over from a server that died
+
+    # the same app can be spelled differently by different test classes, only start it once
+    services = []
+    for service in app_dependencies:
+        if parse_service(service) is not None and get_pool_key([service])[0] not in get_pool_key(services):
+            services.append(service)
+
+    print "Serving the following app_dependencies (sysname %s):" % opts.sysname
+    for service in services:
+        print "\t", service
+
+    # a TERM should clean up the same way CTRL-C does
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    ccs, pid_files = start_containers(services, opts)
+    mtimes = [get_descriptor_mtimes(parse_service(x)[0]) for x in services]
+
+    def restart_changed():
+        changed = []
+        for i, service in enumerate(services):
+            newmtimes = get_descriptor_mtimes(parse_service(service)[0])
+            if newmtimes != mtimes[i]:
+                print "Descriptor changed, restarting:", service
+            elif ccs[i].poll() is not None:
+                print "Container exited, restarting:", service
             else:
-                # spawn an interactive twistd shell into this system
-                print "DEBUG_CC:"
-                sargs = build_twistd_args("", "", 'debugcc.pid', 'debugcc.log', None, opts, True)
-                os.execve("bin/twistd", sargs, newenv)
+                continue
+
+            mtimes[i] = newmtimes
+            changed.append(i)
+
+        if len(changed) == 0:
+            return
+
+        stop_containers([ccs[i] for i in changed], opts.trace)
+        newccs, newpid_files = start_containers([services[i] for i in changed], opts)
+        for i, cc, pidfile in zip(changed, newccs, newpid_files):
+            ccs[i] = cc
+            pid_files[i] = pidfile
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(opts.controlsocket)
+    sock.listen(5)
+
+    print "Ready, listening on", opts.controlsocket
+
+    try:
+        while True:
+            readable, writable, errored = select.select([sock], [], [], SERVE_CHECK_INTERVAL)
+
+            restart_changed()
+
+            if len(readable) == 0:
+                continue
+
+            conn, addr = sock.accept()
+            try:
+                request = conn.makefile().readline().strip()
+
+                if request == "status":
+                    info = {'sysname'   : opts.sysname,
+                            'hostname'  : opts.hostname,
+                            'apps'      : get_pool_key(services),
+                            'pids'      : read_pidfiles(pid_files),
+                            'pidfiles'  : pid_files}
+                    conn.sendall(json.dumps(info))
+
+                elif request == "stop":
+                    conn.sendall(json.dumps({'stopping': True}))
+                    break
+
+                else:
+                    conn.sendall(json.dumps({'error': 'unknown request %r' % request}))
+
+            finally:
+                conn.close()
+
+    finally:
+        sock.close()
+        os.unlink(opts.controlsocket)
+        stop_containers(ccs, opts.trace)
+
+def request_server(opts, request):
+    """
+    Sends a request to a running "itv serve".
+
+    @returns    The decoded JSON reply.
+    @throws     socket.error if nothing is serving on the --control-socket.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(opts.controlsocket)
+        sock.sendall(request + "\n")
+
+        reply = []
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            reply.append(data)
+    finally:
+        sock.close()
+
+    return json.loads("".join(reply))
+
+def run_attached(testset, itvfileapps, info, opts, args, all_x):
+    """
+    Runs "itv run": runs trial for each group of test classes against the containers of a
+    running "itv serve", as described by its status reply.
+
+    @returns    A tuple of dicts mapping str(testclass) => trial status and str(testclass) =>
+                seconds taken.
+    """
+    results = {}
+    durations = {}
+
+    opts.sysname = str(info['sysname'])
+    opts.hostname = str(info['hostname'])
+
+    served = [(str(app), str(args)) for app, args in info['apps']]
+    print "Attached to sysname %s on %s" % (opts.sysname, opts.hostname)
+
+    for testclass in testset:
+        app_dependencies, dep_assoc = get_app_dependencies(testclass, itvfileapps)
+        missing = [x for x in get_pool_key(app_dependencies) if x not in served]
+        if len(missing) > 0:
+            print "WARNING: app_dependencies not being served for %s: %s" % (testclass, missing)
+
+        started = time.time()
+        status = run_trial(testclass, info['pidfiles'], opts, args, all_x)
+        if status is not None:
+            results[str(testclass)] = status
+            durations[str(testclass)] = time.time() - started
+
+    return (results, durations)
+
+def get_ioncore_version():
+    """
+    @returns    The version of the installed ioncore, or None if it can't be found.
+    """
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('ioncore').version
+    except Exception:
+        return None
+
+def start_ping_probe(services, opts, basepath, deadline):
+    """
+    Starts trial running pingprobe, which pings the services until they answer and writes the
+    times they did to basepath.ping.
+
+    @returns    The Popen object of the trial process.
+    """
+    newenv = get_trial_env([], opts)
+    newenv['ITV_PING_SERVICES'] = ",".join(services)
+    newenv['ITV_PING_DEADLINE'] = str(deadline)
+    newenv['ITV_PING_RESULT'] = basepath + '.ping'
+
+    logf = open(basepath + '.log', 'w')
+    po = subprocess.Popen(["bin/trial", "--temp-directory", basepath + '.trial', "itv_trial.pingprobe"],
+                          env=newenv, stdout=logf, stderr=subprocess.STDOUT)
+    logf.close()
+
+    return po
+
+def wait_for_ping_probe(po, basepath, deadline, failed):
+    """
+    Waits for a ping probe to finish, stopping it at the deadline or as soon as failed() is true.
+
+    @returns    A dict of service name => epoch seconds it first answered a ping.
+    """
+    while po.poll() is None:
+        if time.time() >= deadline or failed():
+            os.kill(po.pid, signal.SIGTERM)
+            po.wait()
+            break
+        time.sleep(READY_POLL_INTERVAL)
+
+    try:
+        f = open(basepath + '.ping')
+        answered = json.load(f)
+        f.close()
+    except (IOError, ValueError):
+        answered = {}
+
+    return answered
+
+def bench_testclass(testclass, itvfileapps, opts):
+    """
+    Boots the app_dependencies of a group of test classes once, timing how long it takes for all
+    the containers to unlock their lockfiles, for all their ping_services to answer, and to tear
+    them down again, all in seconds. The pings start right as the containers are spawned.
+
+    @returns    A dict with the "unlock", "ping" and "teardown" times ("ping" is None if a service
+                never answered, or there are no ping_services), the "containers" timings from
+                start_containers and the time each service first answered in "services".
+    """
+    app_dependencies, dep_assoc = get_app_dependencies(testclass, itvfileapps)
 
-        def cleanup():
-            print "Cleaning up app_dependencies..."
-            for cc in ccs:
-                print "\tClosing container with pid:", cc.pid
-                os.kill(cc.pid, signal.SIGTERM)
+    services = []
+    for x in testclass:
+        services += [y for y in getattr(x, 'ping_services', []) if y not in services]
 
-        cleanup()
+    # a fresh sysname every time, nothing is left over from the last run
+    opts.sysname = gen_sysname()
+    basepath = os.path.join(tempfile.gettempdir(), 'itv-bench-%s' % opts.sysname)
+    containers = []
 
+    started = time.time()
+
+    probe = None
+    if len(services) > 0:
+        probe = start_ping_probe(services, opts, basepath, started + PING_DEADLINE)
+
+    try:
+        ccs, pid_files = start_containers(app_dependencies, opts, containers, get_class_names(testclass))
+    except:
+        if probe is not None:
+            os.kill(probe.pid, signal.SIGTERM)
+            probe.wait()
+        raise
+
+    ready = time.time()
+
+    answered = {}
+    if probe is not None:
+        answered = wait_for_ping_probe(probe, basepath, started + PING_DEADLINE,
+                                       lambda: len([x for x in ccs if x.poll() is not None]) > 0)
+
+    pinged = time.time()
+    stop_containers(ccs, opts.trace)
+    finished = time.time()
+
+    tracing.span(opts.trace, "bench unlock", started, ready)
+    tracing.span(opts.trace, "bench ping", started, pinged, services=answered.keys())
+    tracing.span(opts.trace, "bench teardown", pinged, finished)
+
+    ping = None
+    if len(services) > 0 and len(answered) == len(services):
+        ping = max(answered.values()) - started
+
+    return {'unlock'    : ready - started,
+            'ping'      : ping,
+            'teardown'  : finished - pinged,
+            'containers': containers,
+            'services'  : dict([(x, t - started) for x, t in answered.iteritems()])}
+
+def run_benchmark(testset, itvfileapps, opts):
+    """
+    Runs "itv bench": boots the app_dependencies of each group of test classes --runs times
+    (see bench_testclass), and summarizes the times.
+
+    @returns    The report, a dict holding the time, run count, ioncore version and, for each
+                group of classes, the stats.summarize of every timing plus the raw samples.
+                A run where a container exited or a service never answered counts as a failure
+                and is left out of the stats.
+    """
+    report = {'time'    : time.time(),
+              'runs'    : opts.runs,
+              'hostname': opts.hostname,
+              'ioncore' : get_ioncore_version(),
+              'classes' : {}}
+
+    for testclass in testset:
+        name = ",".join(get_class_names(testclass))
+        samples = {'unlock': [], 'ping': [], 'teardown': []}
+        apps = {}           # app => list of seconds to unlock
+        services = {}       # service => list of seconds to answer a ping
+        failures = 0
+        pingable = len([x for x in testclass if getattr(x, 'ping_services', [])]) > 0
+
+        for i in range(opts.runs):
+            print "Benchmark run %d of %d: %s" % (i + 1, opts.runs, name)
+            run = bench_testclass(testclass, itvfileapps, opts)
+
+            if [x for x in run['containers'] if x['status'] != 'ready'] or (pingable and run['ping'] is None):
+                print "ERROR: Benchmark run failed, a container exited or a service never answered a ping"
+                failures += 1
+                continue
+
+            for key in samples:
+                if run[key] is not None:
+                    samples[key].append(run[key])
+            for container in run['containers']:
+                apps.setdefault(container['app'], []).append(container['ready'])
+            for service, elapsed in run['services'].iteritems():
+                services.setdefault(service, []).append(elapsed)
+
+        entry = {'failures': failures, 'samples': samples}
+        for key in samples:
+            entry[key] = stats.summarize(samples[key])
+        entry['apps'] = dict([(x, stats.summarize(y)) for x, y in apps.iteritems()])
+        entry['services'] = dict([(x, stats.summarize(y)) for x, y in services.iteritems()])
+
+        report['classes'][name] = entry
+
+    return report
+
+def print_benchmark(report):
+    """
+    Prints the summary of an "itv bench" report.
+
+    @returns    The exit code for this script: 0 if every run worked, 1 otherwise.
+    """
+    def fmt(summary):
+        if summary['n'] == 0:
+            return "-"
+        return "p50 %7.2fs  p95 %7.2fs  max %7.2fs" % (summary['p50'], summary['p95'], summary['max'])
+
+    exitcode = 0
+
+    print "\n\n++++++++++++++++++++++++++++++++++++++++++++++++++++\n"
+    print "ITV BENCHMARK RESULTS (%d runs each, ioncore %s):" % (report['runs'], report['ioncore'])
+
+    for name, entry in sorted(report['classes'].iteritems()):
+        print "\t", name
+        print "\t\tspawn to unlock    ", fmt(entry['unlock'])
+        print "\t\tspawn to ping      ", fmt(entry['ping'])
+        print "\t\tteardown           ", fmt(entry['teardown'])
+        for app, summary in sorted(entry['apps'].iteritems()):
+            print "\t\t\t%-40s %s" % (app, fmt(summary))
+
+        if entry['failures'] > 0:
+            print "\t\t%d runs FAILED" % entry['failures']
+            exitcode = 1
+
+    print "\n++++++++++++++++++++++++++++++++++++++++++++++++++++\n\n"
+
+    return exitcode
+
+def print_results(results, durations=None):
+    """
+    Prints the results table, with the seconds each test class took if known.
+
+    @returns    The exit code for this script: 0 if all passed, 1 if some failed, 2 if all failed.
+    """
+    durations = durations or {}
     exitcode = 0
     resultlen = len(results)
     countfail = 0
@@ -416,6 +1437,9 @@ def main():
             else:
                 resultstr = "UNKNOWN??? (%d)" % result
 
+            if durations.has_key(testclass):
+                resultstr += " (%.1fs)" % durations[testclass]
+
             print "\t", classstr, "\t", resultstr
 
         print "\n++++++++++++++++++++++++++++++++++++++++++++++++++++\n\n"
@@ -424,6 +1448,131 @@ def main():
     if countfail == resultlen:
         exitcode = 2
 
+    return exitcode
+
+def print_swept(swept):
+    """
+    Prints the containers stopped by procs.sweep.
+    """
+    for container in swept:
+        print "Stopped leftover container with pid %d (sysname %s, started by pid %d)" % \
+            (container['pid'], container['sysname'], container['owner'])
+
+def main():
+    opts, args = get_opts()
+
+    # "serve", "run" and "stop" commands, see serve(), "sweep" and "bench"
+    command = None
+    if len(args) > 0 and args[0] in ("serve", "run", "stop", "sweep", "bench"):
+        command = args.pop(0)
+
+    if command == "sweep":
+        # stop leftovers, and everything running under the given sysnames
+        print_swept(procs.sweep(args))
+        sys.exit(0)
+
+    if command == "stop":
+        try:
+            request_server(opts, "stop")
+            print "Stopped server on", opts.controlsocket
+        except socket.error:
+            print "ERROR: Nothing is serving on", opts.controlsocket
+            sys.exit(1)
+        sys.exit(0)
+
+    # split args into two groups - probable tests, and .itv eval'able files
+    itvfiles = [x for x in args if x.endswith('.itv')]
+    testfiles = [x for x in args if x not in itvfiles]
+
+    # parse and load .itvs, merge into one big set
+    itvfileapps = load_itv_files(itvfiles)
+
+    if opts.debug and len(itvfileapps) > 0:
+        print "Apps to run with all tests (via .itv):", itvfileapps
+
+    all_testclasses, all_x = get_test_classes(testfiles, opts.debug, opts.discoverycache)
+
+    tracing.begin(opts.trace)
+
+    if not opts.nosweep:
+        print_swept(procs.sweep())
+
+    if command == "serve":
+        # boot the union of everything the tests need
+        app_dependencies, dep_assoc = get_app_dependencies(all_testclasses, itvfileapps)
+        try:
+            serve(app_dependencies, opts)
+        finally:
+            tracing.export(opts.trace)
+        sys.exit(0)
+
+    # if we have no tests, yet we have itvfiles, that means we need to imply --debug-cc
+    if len(testfiles) == 0 and len(itvfileapps) > 0:
+        print "ITV files only specified, no tests: implying --debug-cc"
+        opts.debug_cc = True
+
+        # we also need to fake that we have a test so the logic below runs
+        all_testclasses = [object]
+
+    if opts.debug and len(all_x) == 1:
+        print "\n** SINGLE TEST METHOD SPECIFIED **\n"
+
+    if opts.merge:
+        # merge all tests into one set
+        testset = [all_testclasses]
+    else:
+        # split out each test on its own
+        testset = [[x] for x in all_testclasses]
+
+    # ask once up front rather than pausing before each class
+    print_plan(testset, itvfileapps)
+    confirm_start(opts)
+
+    # mapping of testclass => result (as a status code, returned by executing trial)
+    results = {}
+    # mapping of testclass => seconds it took
+    durations = {}
+
+    try:
+        if command == "bench":
+            report = run_benchmark(testset, itvfileapps, opts)
+
+            f = open(opts.benchoutput, 'w')
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.close()
+            print "Wrote benchmark report to", opts.benchoutput
+
+            sys.exit(print_benchmark(report))
+
+        if command == "run":
+            try:
+                info = request_server(opts, "status")
+            except socket.error:
+                print "ERROR: Nothing is serving on %s, start it with \"itv serve\"" % opts.controlsocket
+                sys.exit(2)
+
+            results, durations = run_attached(testset, itvfileapps, info, opts, args, all_x)
+        elif opts.jobs > 1 and len(testset) > 1 and not opts.debug_cc:
+            results, durations = run_parallel(testset, itvfileapps, opts, args, all_x)
+        else:
+            pool = None
+            if opts.reuse and not opts.debug_cc:
+                pool = ContainerPool(opts, opts.poolsize)
+
+            try:
+                for testclass in testset:
+                    status, elapsed = run_testclass(testclass, itvfileapps, opts, args, all_x, pool)
+                    if status is not None:
+                        results[str(testclass)] = status
+                        durations[str(testclass)] = elapsed
+            finally:
+                if pool is not None:
+                    pool.drain()
+    finally:
+        tracing.export(opts.trace)
+
+    exitcode = print_results(results, durations)
+
     sys.exit(exitcode)
 
 if __name__ == "__main__":
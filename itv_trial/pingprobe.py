@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/pingprobe.py
+@brief Pings services until they answer, for "itv bench".
+
+Run by trial while the containers of a benchmarked test class are still starting. Each service
+named in ITV_PING_SERVICES (comma separated) is pinged every PING_INTERVAL seconds until it
+answers or ITV_PING_DEADLINE (epoch seconds) passes, and the time each first answered is written
+to the ITV_PING_RESULT file as a JSON object of service name => epoch seconds. Services that never
+answered are left out.
+
+Pings sent before a service is listening are never answered, only timed out, so they go out
+without waiting for the ones before: the first answer then comes within PING_INTERVAL of the
+service being up, rather than at the end of whichever ping timeout it started in.
+"""
+
+import os, time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import ion.util.ionlog
+from twisted.internet import defer
+from ion.test.iontest import ItvTestCase
+from ion.core.process.process import Process
+from ion.util.procutils import asleep
+
+log = ion.util.ionlog.getLogger(__name__)
+
+PING_TIMEOUT = 2        # seconds to wait for each ping to be answered
+PING_INTERVAL = 0.1     # seconds between pings to a service that hasn't answered yet
+
+class PingProbe(ItvTestCase):
+
+    timeout = 3600      # the deadline comes from itv bench
+
+    @defer.inlineCallbacks
+    def setUp(self):
+        yield self._start_container()
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self._stop_container()
+
+    @defer.inlineCallbacks
+    def _ping_until_answered(self, p, servicename, deadline, answered):
+        def on_answer(result):
+            if servicename not in answered:
+                answered[servicename] = time.time()
+
+        def on_failure(failure):
+            log.debug("%s not answering yet: %s" % (servicename, failure.getErrorMessage()))
+
+        pings = []
+        while time.time() < deadline and servicename not in answered:
+            d = p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {}, timeout=PING_TIMEOUT)
+            d.addCallbacks(on_answer, on_failure)
+            pings.append(d)
+            yield asleep(PING_INTERVAL)
+
+        # let the pings still out time out, so none is left pending when the test ends
+        yield defer.DeferredList(pings)
+
+    @defer.inlineCallbacks
+    def test_ping(self):
+        services = [x for x in os.environ.get('ITV_PING_SERVICES', '').split(',') if x]
+        deadline = float(os.environ['ITV_PING_DEADLINE'])
+
+        p = Process()
+        yield p.spawn()
+
+        answered = {}
+        yield defer.DeferredList([self._ping_until_answered(p, x, deadline, answered) for x in services])
+
+        f = open(os.environ['ITV_PING_RESULT'], 'w')
+        json.dump(answered, f)
+        f.close()
+
+        self.assertEqual(sorted(answered.keys()), sorted(services))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/procs.py
+@brief Stops container process groups, and sweeps up containers left behind by earlier runs.
+
+Every container is started in its own process group, so stopping it also stops whatever it
+spawned. It is sent SIGTERM first and SIGKILL if it is still around STOP_TIMEOUT seconds later.
+
+Containers are started with ITV_TRIAL_OWNER set to "<pid>:<start time>" of the itv_trial process
+that started them (see get_owner_id); the start time, from /proc/<pid>/stat, tells the owner from
+a later process that got the same pid. A container whose owner is gone (killed, or crashed before
+it could stop them) will never be stopped by anyone, so sweep() finds those by reading /proc and
+stops them. It can also stop every container of given sysnames, whoever started them. Only
+containers of the current user are swept, so other users' and other jobs' runs are left alone.
+"""
+
+import os, signal, time, errno
+
+STOP_TIMEOUT = 10.0         # seconds between SIGTERM and SIGKILL
+STOP_POLL_INTERVAL = 0.1    # seconds between checks for stopped processes
+OWNER_ENV = 'ITV_TRIAL_OWNER'
+
+def kill_group(pgid, signum):
+    """
+    Sends a signal to a process group.
+
+    @returns    False if there was no such group (left), True otherwise.
+    """
+    try:
+        os.killpg(pgid, signum)
+    except OSError, ex:
+        if ex.errno == errno.ESRCH:
+            return False
+        if ex.errno != errno.EPERM:
+            raise
+
+    return True
+
+def group_exists(pgid):
+    return kill_group(pgid, 0)
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError, ex:
+        return ex.errno == errno.EPERM
+
+    return True
+
+def stop_groups(pgids, reap=None, timeout=STOP_TIMEOUT):
+    """
+    Stops process groups: SIGTERM to all of them, then SIGKILL to those still running after
+    timeout seconds.
+
+    @param reap     Called with a pgid to collect its leader if it is our child (e.g. Popen.poll).
+                    The group counts as stopped once it's empty.
+    @returns        The list of pgids that needed a SIGKILL.
+    """
+    remaining = [x for x in pgids if kill_group(x, signal.SIGTERM)]
+
+    deadline = time.time() + timeout
+    while True:
+        if reap is not None:
+            for pgid in remaining:
+                reap(pgid)
+
+        remaining = [x for x in remaining if group_exists(x)]
+        if len(remaining) == 0 or time.time() >= deadline:
+            break
+
+        time.sleep(STOP_POLL_INTERVAL)
+
+    killed = [x for x in remaining if kill_group(x, signal.SIGKILL)]
+    return killed
+
+def read_proc_file(pid, name):
+    """
+    @returns    The contents of /proc/<pid>/<name>, or None if it can't be read.
+    """
+    try:
+        f = open('/proc/%d/%s' % (pid, name))
+        content = f.read()
+        f.close()
+    except (IOError, OSError):
+        return None
+
+    return content
+
+def get_start_time(pid):
+    """
+    @returns    When the process started, in clock ticks since boot (field 22 of /proc/<pid>/stat),
+                as a string, or None if it can't be read.
+    """
+    stat = read_proc_file(pid, 'stat')
+    if stat is None:
+        return None
+
+    # the command name in parentheses can hold spaces, so count fields from after it
+    fields = stat[stat.rfind(')') + 2:].split()
+    if len(fields) < 20:
+        return None
+
+    return fields[19]
+
+def get_owner_id(pid=None):
+    """
+    @returns    The ITV_TRIAL_OWNER value for containers started by pid (by default this process).
+    """
+    if pid is None:
+        pid = os.getpid()
+
+    start = get_start_time(pid)
+    if start is None:
+        return str(pid)
+
+    return "%d:%s" % (pid, start)
+
+def is_owner_alive(container):
+    """
+    @returns    Whether the itv_trial process that started a container (see find_containers) is
+                still running, and not just some later process with the same pid.
+    """
+    if not is_alive(container['owner']):
+        return False
+
+    if container['owner_start'] is None:
+        return True     # started without a start time, the pid is all there is to go by
+
+    return get_start_time(container['owner']) in (None, container['owner_start'])
+
+def find_containers():
+    """
+    Finds running containers started by itv_trial.
+
+    @returns    A list of dicts with the pid, pgid, uid, sysname, owner pid and owner start time
+                (None if not known) of each one.
+    """
+    containers = []
+    if not os.path.isdir('/proc'):
+        return containers
+
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+
+        pid = int(entry)
+        environ = read_proc_file(pid, 'environ')
+        cmdline = read_proc_file(pid, 'cmdline')
+        if environ is None or cmdline is None:
+            continue
+
+        owner = None
+        for var in environ.split('\0'):
+            if var.startswith(OWNER_ENV + '='):
+                owner = var[len(OWNER_ENV) + 1:]
+        if owner is None:
+            continue
+
+        owner, sep, owner_start = owner.partition(':')
+        if not owner.isdigit():
+            continue
+
+        sysname = None
+        for arg in cmdline.split('\0'):
+            for part in arg.split(','):
+                if part.startswith('sysname='):
+                    sysname = part[len('sysname='):]
+
+        try:
+            pgid = os.getpgid(pid)
+            uid = os.stat('/proc/%d' % pid).st_uid
+        except OSError:
+            continue        # exited meanwhile
+
+        containers.append({'pid': pid, 'pgid': pgid, 'uid': uid, 'sysname': sysname,
+                           'owner': int(owner), 'owner_start': owner_start or None})
+
+    return containers
+
+def sweep(sysnames=None, timeout=STOP_TIMEOUT, uid=None):
+    """
+    Stops containers whose owning itv_trial process is gone, and every container with one of
+    the given sysnames.
+
+    @param uid      Only containers running as this user are stopped, by default the current one.
+    @returns        The list of container dicts (see find_containers) that were stopped, one per
+                    process group.
+    """
+    if uid is None:
+        uid = os.getuid()
+
+    mypid = os.getpid()
+    mypgid = os.getpgrp()
+    groups = {}     # pgid => container dict of its leader (or whichever process was found first)
+    for container in find_containers():
+        if container['uid'] != uid or container['owner'] == mypid or container['pgid'] == mypgid:
+            continue
+
+        if not is_owner_alive(container) or (sysnames and container['sysname'] in sysnames):
+            if container['pgid'] not in groups or container['pid'] == container['pgid']:
+                groups[container['pgid']] = container
+
+    stop_groups(groups.keys(), timeout=timeout)
+
+    return [groups[x] for x in sorted(groups.keys())]
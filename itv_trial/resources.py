@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/resources.py
+@brief Samples the memory, CPU time, open files and threads of running containers from /proc.
+
+While a test class runs, every container it uses is sampled every --sample-interval seconds.
+The samples file holds one JSON object per line, one line per test class run, with a time
+series for each app:
+
+    {"time": 1307462400.0, "classes": ["tests.integration.ais.test_ais.TestAISProcesses"],
+     "sysname": "3f2a1b",
+     "apps": [{"app": "res/apps/app_integration.app", "args": "", "pid": 4330,
+               "samples": [[1307462395.2, 48103424, 2.31, 23, 3], ...]}]}
+
+Each sample is [time, rss bytes, cpu seconds (user + system), open fds, threads]. Values
+that couldn't be read (the container exited, or its fds belong to another user) are null.
+"""
+
+import os, time, threading
+
+import history
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+def read_proc_stats(pid):
+    """
+    Reads the current resource usage of a process.
+
+    @returns    A tuple of (rss bytes, cpu seconds, open fds, threads), or None if the process is gone.
+    """
+    try:
+        f = open('/proc/%d/stat' % pid)
+        stat = f.read()
+        f.close()
+    except IOError:
+        return None
+
+    # the command name is in parens and may contain spaces, the fields we want come after it
+    fields = stat[stat.rindex(')') + 2:].split()
+    cpu = (int(fields[11]) + int(fields[12])) / float(CLOCK_TICKS)     # utime + stime
+    threads = int(fields[17])
+    rss = int(fields[21]) * PAGE_SIZE
+
+    try:
+        fds = len(os.listdir('/proc/%d/fd' % pid))
+    except OSError:
+        fds = None
+
+    return (rss, cpu, fds, threads)
+
+def read_proc_io(pid):
+    """
+    Reads how much I/O a process has done so far.
+
+    @returns    A dict of the counters in /proc/<pid>/io (rchar and wchar count every read and
+                write, including sockets; read_bytes and write_bytes only storage), or None if the
+                process is gone or belongs to another user.
+    """
+    try:
+        f = open('/proc/%d/io' % pid)
+        content = f.read()
+        f.close()
+    except (IOError, OSError):
+        return None
+
+    counters = {}
+    for line in content.splitlines():
+        name, value = line.split(':', 1)
+        counters[name.strip()] = int(value)
+
+    return counters
+
+class ResourceSampler(object):
+    """
+    Samples a set of containers in a background thread until stopped.
+    """
+    def __init__(self, containers, interval):
+        """
+        @param containers   List of (app, args, pid) tuples.
+        @param interval     Seconds between samples.
+        """
+        self.containers = containers
+        self.interval = interval
+        self.series = [[] for x in containers]      # per container, list of [time, rss, cpu, fds, threads]
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        now = time.time()
+        for i, (app, args, pid) in enumerate(self.containers):
+            stats = read_proc_stats(pid)
+            if stats is None:
+                stats = (None, None, None, None)
+
+            self.series[i].append([now] + list(stats))
+
+    def start(self):
+        self.sample()
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops sampling, taking one last sample so growth covers the whole run.
+        """
+        self._stopped.set()
+        self._thread.join()
+        self.sample()
+
+    def _run(self):
+        while True:
+            self._stopped.wait(self.interval)
+            if self._stopped.isSet():
+                break
+            self.sample()
+
+def summarize(samples):
+    """
+    Gets the peak and growth of a container's usage over a run.
+
+    @returns    A dict with peak_rss, rss_growth, cpu (seconds used during the run), peak_fds,
+                fd_growth and peak_threads. Values are None if never read.
+    """
+    def column(index):
+        return [x[index] for x in samples if x[index] is not None]
+
+    def growth(values):
+        if len(values) == 0:
+            return None
+        return values[-1] - values[0]
+
+    def peak(values):
+        if len(values) == 0:
+            return None
+        return max(values)
+
+    rss, cpu, fds, threads = column(1), column(2), column(3), column(4)
+    return {'peak_rss'      : peak(rss),
+            'rss_growth'    : growth(rss),
+            'cpu'           : growth(cpu),
+            'peak_fds'      : peak(fds),
+            'fd_growth'     : growth(fds),
+            'peak_threads'  : peak(threads)}
+
+def format_summary(containers, series):
+    """
+    @returns    A printable table of the summary of each container, one line per container.
+    """
+    def mb(value, sign=''):
+        if value is None:
+            return '?'
+        return ('%' + sign + '.1fMB') % (value / 1048576.0)
+
+    def num(value, fmt='%d'):
+        if value is None:
+            return '?'
+        return fmt % value
+
+    lines = []
+    for (app, args, pid), samples in zip(containers, series):
+        s = summarize(samples)
+        name = app
+        if args:
+            name += " (%s)" % args
+
+        lines.append("\t%-40s peak rss %8s  growth %8s  cpu %7ss  fds %s (%s)  threads %s" %
+                     (name, mb(s['peak_rss']), mb(s['rss_growth'], '+'), num(s['cpu'], '%.2f'),
+                      num(s['peak_fds']), num(s['fd_growth'], '%+d'), num(s['peak_threads'])))
+
+    return "\n".join(lines)
+
+def record(path, classes, sysname, containers, series):
+    """
+    Appends the samples of one test class run to the samples file.
+    """
+    apps = []
+    for (app, args, pid), samples in zip(containers, series):
+        apps.append({'app': app, 'args': args, 'pid': pid, 'samples': samples})
+
+    entry = {'time'     : time.time(),
+             'classes'  : classes,
+             'sysname'  : sysname,
+             'apps'     : apps}
+
+    history.append_json_line(path, entry)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/stats.py
+@brief Percentiles and summaries of timing samples, for benchmark reports.
+"""
+
+REPORT_PERCENTILES = [50, 95, 99]
+
+def percentile(values, p):
+    """
+    Gets the p-th percentile (0-100) of a list of numbers, interpolating between the two
+    closest ranks.
+
+    @returns    The percentile, or None for an empty list.
+    """
+    if len(values) == 0:
+        return None
+
+    values = sorted(values)
+    rank = (len(values) - 1) * p / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+def summarize(values, percentiles=REPORT_PERCENTILES):
+    """
+    Summarizes a list of samples.
+
+    @returns    A dict with n, min, mean, max and a "pNN" entry for each of percentiles. All but n
+                are None for an empty list.
+    """
+    summary = {'n': len(values), 'min': None, 'mean': None, 'max': None}
+    for p in percentiles:
+        summary['p%d' % p] = percentile(values, p)
+
+    if len(values) > 0:
+        summary['min'] = min(values)
+        summary['mean'] = sum(values) / float(len(values))
+        summary['max'] = max(values)
+
+    return summary
+
+class Histogram(object):
+    """
+    A latency histogram in the style of HdrHistogram: values are counted in buckets that keep
+    significant_digits decimal digits of precision, so any number of samples is held in a
+    bounded amount of memory and percentiles are accurate to that precision.
+
+    Values are seconds, recorded internally in whole microseconds.
+    """
+    def __init__(self, significant_digits=3):
+        self.significant_digits = significant_digits
+        self.buckets = {}       # lowest microsecond value of the bucket => count
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value):
+        # round down to significant_digits digits, e.g. 123456 => 123000 for 3
+        unit = 1
+        while value >= 10 ** self.significant_digits * unit:
+            unit *= 10
+        return value - value % unit
+
+    def record(self, seconds):
+        value = max(int(round(seconds * 1000000)), 0)
+        bucket = self._bucket(value)
+
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for bucket, count in other.buckets.iteritems():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = min(self.min, value) if self.min is not None else value
+                self.max = max(self.max, value) if self.max is not None else value
+
+    def percentile(self, p):
+        """
+        @returns    The value (in seconds) at or below which p percent of the recorded values fall,
+                    or None if nothing was recorded.
+        """
+        if self.count == 0:
+            return None
+
+        needed = max(int(round(self.count * p / 100.0)), 1)
+        seen = 0
+        for bucket in sorted(self.buckets.keys()):
+            seen += self.buckets[bucket]
+            if seen >= needed:
+                # the bucket's lowest value, but never outside what was actually recorded
+                return min(max(bucket, self.min), self.max) / 1000000.0
+
+        return self.max / 1000000.0
+
+    def summary(self, percentiles=[50, 90, 99, 99.9, 99.99]):
+        """
+        @returns    A dict with n, min, mean, max and a "pNN" entry for each of percentiles, in
+                    seconds ("p99.9" for fractional ones).
+        """
+        summary = {'n': self.count, 'min': None, 'mean': None, 'max': None}
+        for p in percentiles:
+            summary[('p%f' % p).rstrip('0').rstrip('.')] = self.percentile(p)
+
+        if self.count > 0:
+            summary['min'] = self.min / 1000000.0
+            summary['mean'] = self.total / 1000000.0 / self.count
+            summary['max'] = self.max / 1000000.0
+
+        return summary
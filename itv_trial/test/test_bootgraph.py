@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_bootgraph.py
+@test Boot ordering of app deps from .rel/.app descriptors.
+"""
+
+import os
+from twisted.trial import unittest
+
+from itv_trial import bootgraph
+
+class BootGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.res = self.mktemp()
+        os.makedirs(os.path.join(self.res, 'apps'))
+        os.makedirs(os.path.join(self.res, 'deploy'))
+
+    def _write(self, name, content):
+        path = os.path.join(self.res, name)
+        f = open(path, 'w')
+        f.write(content)
+        f.close()
+        return path
+
+    def _app(self, name, applications):
+        return self._write('apps/%s.app' % name, '{"type":"application", "name":"%s", "applications":%r}' % (name, applications))
+
+    def test_independent_apps(self):
+        a = self._app('a', ['ioncore'])
+        b = self._app('b', ['ioncore'])
+
+        deps = bootgraph.build_boot_graph([a, b])
+        self.assertEqual(deps, [set(), set()])
+        self.assertEqual(bootgraph.get_boot_levels(deps), [[0, 1]])
+
+    def test_dependency_listed_after(self):
+        a = self._app('a', ['ioncore'])
+        b = self._app('b', ['ioncore', 'a'])
+        c = self._app('c', ['b'])
+
+        deps = bootgraph.build_boot_graph([c, b, a])
+        self.assertEqual(deps, [set([1]), set([2]), set()])
+        self.assertEqual(bootgraph.get_boot_levels(deps), [[2], [1], [0]])
+
+    def test_rel(self):
+        self._app('datastore', ['ioncore'])
+        self._app('association', ['ioncore', 'datastore'])
+        self._app('ems', ['ioncore', 'datastore'])
+        level4 = self._write('deploy/level4.rel', """{
+            "type":"release",
+            "apps":[
+                # comments are allowed, same as .itv files
+                {'name':'datastore', 'version':'0.1'},
+                {'name':'association', 'version':'0.1'},
+            ]}""")
+        level5 = self._write('deploy/level5.rel', '{"type":"release", "apps":[{"name":"ems"}]}')
+
+        self.assertEqual(bootgraph.get_app_names(level4), (set(['datastore', 'association']), set(['ioncore'])))
+        self.assertEqual(bootgraph.build_boot_graph([level4, level5]), [set(), set([0])])
+        self.assertEqual(bootgraph.get_descriptor_files(level5), [level5, os.path.join(self.res, 'apps', 'ems.app')])
+
+    def test_rels_keep_order(self):
+        # level5 needs nothing of level4 by its descriptors, but relies on what level4 did at boot
+        self._app('datastore', ['ioncore'])
+        self._app('ems', ['ioncore'])
+        other = self._app('other', ['ioncore'])
+        level4 = self._write('deploy/level4.rel', '{"type":"release", "apps":[{"name":"datastore"}]}')
+        level5 = self._write('deploy/level5.rel', '{"type":"release", "apps":[{"name":"ems"}]}')
+
+        deps = bootgraph.build_boot_graph([level4, other, level5])
+        self.assertEqual(deps, [set(), set(), set([0])])
+        self.assertEqual(bootgraph.get_boot_levels(deps), [[0, 1], [2]])
+
+    def test_unknown_keeps_order(self):
+        a = self._app('a', ['ioncore'])
+        b = self._app('b', ['ioncore'])
+        missing = os.path.join(self.res, 'apps', 'missing.app')
+
+        deps = bootgraph.build_boot_graph([a, missing, b])
+        self.assertEqual(deps, [set(), set([0]), set([1])])
+
+    def test_cycle_keeps_order(self):
+        a = self._app('a', ['b'])
+        b = self._app('b', ['a'])
+        c = self._app('c', ['ioncore'])
+
+        deps = bootgraph.build_boot_graph([a, b, c])
+        self.assertEqual(deps, [set(), set([0]), set()])
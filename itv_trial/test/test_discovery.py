@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_discovery.py
+@test Finding test classes and app_dependencies by reading test modules.
+"""
+
+import os
+from twisted.trial import unittest
+
+from itv_trial import discovery
+
+BASE_MODULE = """
+from twisted.trial import unittest
+
+class SharedTest(unittest.TestCase):
+    app_dependencies = ["res/apps/shared.app"]
+
+    def test_shared(self):
+        pass
+"""
+
+TEST_MODULE = """
+from ion.test.iontest import ItvTestCase
+from ion.core.process.test.test_service import EchoServiceTest
+from pkg.base import SharedTest, helper
+
+class Mixin(object):
+    def test_mixed(self):
+        pass
+
+class LocalTest(ItvTestCase, Mixin):
+    app_dependencies = [("res/deploy/level4.rel", "id=1"), "res/apps/a.app"]
+    reuse_app_dependencies = False
+
+    def test_one(self):
+        pass
+
+class InheritedTest(SharedTest):
+    def test_two(self):
+        pass
+
+class NoTestsTest(ItvTestCase):
+    def helper(self):
+        pass
+"""
+
+class DiscoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        root = os.path.abspath(self.mktemp())
+        os.makedirs(os.path.join(root, 'pkg'))
+        os.chdir(root)
+
+        self._write('pkg/__init__.py', '')
+        self._write('pkg/base.py', BASE_MODULE)
+        self._write('pkg/test_things.py', TEST_MODULE)
+        self.cachefile = os.path.join(root, 'cache')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def _write(self, name, content):
+        f = open(name, 'w')
+        f.write(content)
+        f.close()
+
+    def _find(self, testargs):
+        finder = discovery.Discoverer(self.cachefile)
+        found = finder.find(testargs)
+        finder.save()
+        classes = dict([("%s.%s" % (x.__module__, x.__name__), x) for x in found[0]])
+        return classes, found[1], found[2]
+
+    def test_module(self):
+        classes, all_x, unresolved = self._find(['pkg/test_things.py'])
+
+        self.assertEqual(sorted(classes.keys()), ['ion.core.process.test.test_service.EchoServiceTest',
+                                                  'pkg.base.SharedTest',
+                                                  'pkg.test_things.InheritedTest',
+                                                  'pkg.test_things.LocalTest'])
+        self.assertEqual(unresolved, [])
+
+        local = classes['pkg.test_things.LocalTest']
+        self.assertEqual(local.app_dependencies, [("res/deploy/level4.rel", "id=1"), "res/apps/a.app"])
+        self.assertEqual(local.reuse_app_dependencies, False)
+        self.assertEqual(classes['pkg.test_things.InheritedTest'].app_dependencies, ["res/apps/shared.app"])
+        self.failIf(hasattr(classes['ion.core.process.test.test_service.EchoServiceTest'], 'app_dependencies'))
+
+        self.failUnless('pkg.test_things.LocalTest.test_mixed' in all_x)
+        self.failUnless('pkg.test_things.InheritedTest.test_shared' in all_x)
+        self.failUnless('ion.core.process.test.test_service.EchoServiceTest.*' in all_x)
+
+    def test_names(self):
+        classes, all_x, unresolved = self._find(['pkg.test_things.LocalTest.test_one', 'pkg', 'nothere.Test'])
+
+        self.failUnless('pkg.test_things.LocalTest' in classes)
+        self.failUnless('pkg.test_things.LocalTest.test_one' in all_x)
+        self.assertEqual(unresolved, ['nothere.Test'])
+
+        classes, all_x, unresolved = self._find(['pkg.test_things.LocalTest.test_one'])
+        self.assertEqual(all_x, set(['pkg.test_things.LocalTest.test_one']))
+
+    def test_computed_deps_use_loader(self):
+        self._write('pkg/test_computed.py', 'from twisted.trial import unittest\n'
+                                            'class ComputedTest(unittest.TestCase):\n'
+                                            '    app_dependencies = ["res/apps/%s.app" % x for x in "ab"]\n'
+                                            '    def test_it(self):\n'
+                                            '        pass\n')
+
+        classes, all_x, unresolved = self._find(['pkg'])
+        self.assertEqual(unresolved, ['pkg.test_computed'])
+        self.failUnless('pkg.test_things.LocalTest' in classes)
+
+    def test_cache(self):
+        self._find(['pkg'])
+
+        # a cached module is not parsed again
+        finder = discovery.Discoverer(self.cachefile)
+        finder.cache[os.path.abspath('pkg/test_things.py')]['module']['classes']['LocalTest']['attrs']['app_dependencies'] = "['cached']"
+        classes = dict([(x.__name__, x) for x in finder.find(['pkg'])[0]])
+        self.assertEqual(classes['LocalTest'].app_dependencies, ['cached'])
+        self.failIf(finder.dirty)
+
+        # a changed one is
+        self._write('pkg/test_things.py', TEST_MODULE.replace('res/apps/a.app', 'res/apps/b.app'))
+        classes, all_x, unresolved = self._find(['pkg'])
+        self.assertEqual(classes['pkg.test_things.LocalTest'].app_dependencies[1], 'res/apps/b.app')
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_eventwait.py
+@test Waiting for events with a deadline.
+"""
+
+from twisted.trial import unittest
+from twisted.internet import task
+
+from itv_trial.eventwait import EventWait, wait_all
+
+class EventWaitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.results = []
+
+    def test_met(self):
+        events = EventWait(predicate=lambda x: x % 2 == 0, extract=lambda x: x * 10, clock=self.clock)
+        events.wait(2, timeout=5).addCallback(self.results.append)
+
+        self.clock.advance(1)
+        events(1)
+        events(2)
+        self.assertEqual(self.results, [])
+
+        self.clock.advance(1)
+        events(4)
+        self.assertEqual(self.results, [True])
+        self.assertEqual(events.values, [20, 40])
+        self.assertEqual(events.times, [1, 2])
+        self.assertEqual(events.waited, 2)
+        self.assertEqual(len(events), 2)
+
+        # the deadline was called off
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_deadline(self):
+        events = EventWait(clock=self.clock)
+        events.wait(2, timeout=5).addCallback(self.results.append)
+
+        events('a')
+        self.clock.advance(5)
+        self.assertEqual(self.results, [False])
+        self.assertEqual(events.waited, 5)
+
+        # late events are still kept, but don't fire the finished wait again
+        events('b')
+        self.assertEqual(events.values, ['a', 'b'])
+        self.assertEqual(self.results, [False])
+
+    def test_already_there(self):
+        events = EventWait(clock=self.clock)
+        events('a')
+        events.wait(1, timeout=5).addCallback(self.results.append)
+        self.assertEqual(self.results, [True])
+        self.assertEqual(events.waited, 0.0)
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_duplicates(self):
+        counted = EventWait(clock=self.clock)
+        distinct = EventWait(extract=lambda x: x[0], unique=True, clock=self.clock)
+        for events in [counted, distinct]:
+            events('a1')
+            events('a2')     # a redelivery of a
+            events('b1')
+
+        self.assertEqual(len(counted), 3)
+        self.assertEqual(distinct.values, ['a', 'b'])
+        self.assertEqual(distinct.times, [0, 0])
+
+        distinct.wait(3, timeout=5).addCallback(self.results.append)
+        distinct('b2')
+        self.assertEqual(self.results, [])
+        distinct('c1')
+        self.assertEqual(self.results, [True])
+
+    def test_wait_all(self):
+        waits = [EventWait(clock=self.clock) for i in range(3)]
+        wait_all(waits, 1, timeout=5).addCallback(self.results.append)
+
+        waits[0]('a')
+        waits[2]('b')
+        self.assertEqual(self.results, [])
+
+        self.clock.advance(5)
+        self.assertEqual(self.results, [2])
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_history.py
+@test Timing history recording and cost estimates.
+"""
+
+from twisted.trial import unittest
+
+from itv_trial import history
+
+class TimingHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = self.mktemp()
+
+    def test_no_history(self):
+        timings = history.TimingHistory(self.path)
+        self.assertEqual(timings.class_cost(['a.B'], [('res/apps/x.app', ''), ('res/apps/y.app', 'id=1')]),
+                         2 * history.DEFAULT_CONTAINER_COST + history.DEFAULT_TRIAL_COST)
+
+    def test_estimates(self):
+        containers = [{'app': 'res/apps/x.app', 'args': '', 'ready': 3.0, 'status': 'ready'}]
+        history.record(self.path, ['a.B'], 'abc', 0, 3.0, 10.0, 1.0, containers)
+        history.record(self.path, ['a.B'], 'abc', 0, 5.0, 10.0, 1.0, [])
+        # reused containers don't count towards the class estimate
+        history.record(self.path, ['a.B'], 'abc', 0, 0.0, 10.0, 0.0, [], True)
+
+        # a partially written line is skipped
+        f = open(self.path, 'a')
+        f.write('{"classes": ["a.B"], "sta')
+        f.close()
+
+        timings = history.TimingHistory(self.path)
+        self.assertEqual(timings.class_cost(['a.B'], []), 15.0)
+        self.assertEqual(timings.app_cost('res/apps/x.app', ''), 3.0)
+        self.assertEqual(timings.class_cost(['c.D'], [('res/apps/x.app', '')]), 3.0 + history.DEFAULT_TRIAL_COST)
+
+    def test_window(self):
+        for x in range(10):
+            history.record(self.path, ['a.B'], 'abc', 0, 0.0, float(x), 0.0, [])
+
+        timings = history.TimingHistory(self.path, window=2)
+        self.assertEqual(timings.class_cost(['a.B'], []), 8.5)
+
+    def test_lpt_makespan(self):
+        self.assertEqual(history.lpt_makespan([], 4), 0.0)
+        self.assertEqual(history.lpt_makespan([5, 4, 3, 3, 3], 1), 18)
+        self.assertEqual(history.lpt_makespan([5, 4, 3, 3, 3], 2), 10)
+        self.assertEqual(history.lpt_makespan([120, 10, 10, 10], 3), 120)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_ncserver.py
+@test The local NetCDF stand-in server.
+"""
+
+import os, time
+
+from twisted.trial import unittest
+from twisted.internet import defer
+from twisted.web import client, error
+
+from itv_trial.fixtures import ncserver, synthetic
+
+def get_page(url, **kwargs):
+    """
+    client.getPage, but a 206 Partial Content response isn't an error.
+    """
+    def partial(failure):
+        failure.trap(error.Error)
+        if failure.value.status != '206':
+            return failure
+        return failure.value.response
+
+    return client.getPage(url, **kwargs).addErrback(partial)
+
+class ParseTest(unittest.TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(ncserver.parse_size('4096'), 4096)
+        self.assertEqual(ncserver.parse_size('10MB'), 10 * 1024 * 1024)
+        self.assertEqual(ncserver.parse_size('1.5kb'), 1536)
+        self.assertRaises(ValueError, ncserver.parse_size, '10 parsecs')
+        self.assertRaises(ValueError, ncserver.parse_size, '')
+
+    def test_parse_range(self):
+        self.assertEqual(ncserver.parse_range(None, 100), None)
+        self.assertEqual(ncserver.parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(ncserver.parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(ncserver.parse_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(ncserver.parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(ncserver.parse_range('bytes=100-', 100), False)
+        self.assertEqual(ncserver.parse_range('bytes=0-1,5-6', 100), None)
+
+    def test_synthetic_url(self):
+        self.assertEqual(ncserver.synthetic_url('grid', '10MB', 'http://host:1'), 'http://host:1/synthetic/grid/10MB.nc')
+
+class ServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.port = ncserver.listen(0, bandwidth=256 * 1024, latency=0.2, interface='127.0.0.1')
+        self.url = ncserver.get_base_url(self.port, '127.0.0.1')
+        self.usgs_data = open(os.path.join(ncserver.DATA_DIR, 'USGS_Test.nc'), 'rb').read()
+
+    def tearDown(self):
+        return self.port.stopListening()
+
+    def test_base_url(self):
+        # listening on port 0 gets a free one, and the url has the real port
+        port = self.port.getHost().port
+        self.assertNotEqual(port, 0)
+        self.assertEqual(self.url, 'http://127.0.0.1:%d' % port)
+
+    @defer.inlineCallbacks
+    def test_file(self):
+        started = time.time()
+        data = yield client.getPage(self.url + '/test_data/USGS_Test.nc')
+        self.assertEqual(data, self.usgs_data)
+        self.assertTrue(time.time() - started >= 0.2)
+
+        data = yield get_page(self.url + '/test_data/USGS_Test.nc', headers={'Range': 'bytes=4-7'})
+        self.assertEqual(data, self.usgs_data[4:8])
+
+    @defer.inlineCallbacks
+    def test_not_found(self):
+        for path in ['/test_data/missing.nc', '/test_data/..', '/test_data/sub/USGS_Test.nc',
+                     '/synthetic/grid/lots.nc', '/synthetic/swath/10MB.nc', '/synthetic/10MB.nc']:
+            try:
+                yield client.getPage(self.url + path)
+            except Exception, ex:
+                self.assertEqual(ex.status, '404')
+            else:
+                self.fail("%s was found" % path)
+
+    @defer.inlineCallbacks
+    def test_synthetic_bandwidth(self):
+        started = time.time()
+        data = yield client.getPage(self.url + '/synthetic/station/100KB.nc')
+        self.assertEqual(data, synthetic.make_dataset_of_size('station', 100 * 1024).read(0, len(data)))
+        self.assertEqual(data[:4], 'CDF\x02')
+        # latency and then at least 100KB at 256KB/s
+        self.assertTrue(time.time() - started >= 0.2 + 0.39)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_netcdf.py
+@test NetCDF classic files made up as they're read.
+"""
+
+import os, struct
+from StringIO import StringIO
+
+from twisted.trial import unittest
+
+from itv_trial.fixtures import netcdf
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'test_data', 'USGS_Test.nc')
+
+class HeaderReader(object):
+    """
+    Just enough of a NetCDF classic header reader to check what netcdf.Dataset writes.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+        magic = self.take(4)
+        assert magic[:3] == 'CDF', magic
+        self.version = ord(magic[3])
+        self.numrecs = self.int()
+        self.dims = [(self.name(), self.int()) for i in range(self.list(netcdf.NC_DIMENSION))]
+        self.attrs = self.attr_list()
+        self.variables = []
+        for i in range(self.list(netcdf.NC_VARIABLE)):
+            name = self.name()
+            dimids = [self.int() for j in range(self.int())]
+            attrs = self.attr_list()
+            nc_type, vsize = self.int(), self.int()
+            begin = self.version == 1 and self.int() or struct.unpack('>q', self.take(8))[0]
+            self.variables.append({'name': name, 'dims': [self.dims[x][0] for x in dimids], 'attrs': attrs,
+                                   'nc_type': nc_type, 'vsize': vsize, 'begin': begin})
+        self.size = self.pos
+
+    def take(self, n):
+        self.pos += n
+        return self.data[self.pos - n:self.pos]
+
+    def int(self):
+        return struct.unpack('>i', self.take(4))[0]
+
+    def name(self):
+        n = self.int()
+        return self.take(n + (-n % 4))[:n]
+
+    def list(self, tag):
+        found, n = self.int(), self.int()
+        assert found in (tag, 0), found
+        return n
+
+    def attr_list(self):
+        attrs = {}
+        for i in range(self.list(netcdf.NC_ATTRIBUTE)):
+            name = self.name()
+            nc_type, n = self.int(), self.int()
+            size = n * netcdf.type_size(nc_type)
+            data = self.take(size + (-size % 4))[:size]
+            if nc_type == netcdf.NC_CHAR:
+                attrs[name] = data
+            else:
+                attrs[name] = list(struct.unpack('>%d%s' % (n, netcdf.TYPE_FORMATS[nc_type]), data))
+        return attrs
+
+def make_dataset(numrecs=3):
+    variables = [netcdf.Variable('station', ['name'], netcdf.NC_CHAR, lambda record: 'ab1'),
+                 netcdf.Variable('time', ['time'], netcdf.NC_DOUBLE, lambda record: [float(record)]),
+                 netcdf.Variable('flag', ['time', 'z'], netcdf.NC_SHORT, lambda record: [record, -record, 7]),
+                 netcdf.Variable('value', ['time', 'z'], netcdf.NC_FLOAT, lambda record: [0.5, 1.5, 2.5], period=2)]
+    return netcdf.Dataset([('time', None), ('name', 3), ('z', 3)], variables,
+                          [('title', 'test'), ('version', 2), ('range', [1.0, 2.0])], numrecs)
+
+class NetcdfTest(unittest.TestCase):
+
+    def test_reader(self):
+        # check the reader against a file netcdf didn't write
+        header = HeaderReader(open(TEST_FILE, 'rb').read())
+        self.assertEqual(header.version, 1)
+        self.assertEqual(header.dims[0][0], 'time')
+        self.assertEqual(header.attrs['CF:featureType'], 'station')
+
+    def test_layout(self):
+        ds = make_dataset()
+        data = ds.read(0, ds.size)
+        self.assertEqual(len(data), ds.size)
+
+        header = HeaderReader(data)
+        self.assertEqual(header.version, 2)
+        self.assertEqual(header.numrecs, 3)
+        self.assertEqual(header.dims, [('time', 0), ('name', 3), ('z', 3)])
+        self.assertEqual(header.attrs, {'title': 'test', 'version': [2], 'range': [1.0, 2.0]})
+        self.assertEqual(header.size, len(ds.header))
+
+        variables = dict([(x['name'], x) for x in header.variables])
+        self.assertEqual(variables['station']['begin'], len(ds.header))
+        self.assertEqual(variables['station']['vsize'], 4)
+        self.assertEqual(data[len(ds.header):len(ds.header) + 4], 'ab1\0')
+
+        # each record is time, flag (padded) and value
+        self.assertEqual(ds.recsize, 8 + 8 + 12)
+        self.assertEqual(variables['time']['begin'], ds.record_begin)
+        self.assertEqual(variables['flag']['begin'], ds.record_begin + 8)
+        self.assertEqual(variables['value']['begin'], ds.record_begin + 16)
+        self.assertEqual(ds.size, ds.record_begin + 3 * ds.recsize)
+
+        second = data[ds.record_begin + ds.recsize:ds.record_begin + 2 * ds.recsize]
+        self.assertEqual(struct.unpack('>d', second[:8]), (1.0,))
+        self.assertEqual(struct.unpack('>3h', second[8:14]), (1, -1, 7))
+        self.assertEqual(struct.unpack('>3f', second[16:]), (0.5, 1.5, 2.5))
+
+    def test_lone_record_variable(self):
+        variables = [netcdf.Variable('flag', ['time'], netcdf.NC_SHORT, lambda record: [record])]
+        ds = netcdf.Dataset([('time', None)], variables, numrecs=3)
+        self.assertEqual(ds.recsize, 2)
+        self.assertEqual(ds.read(ds.record_begin, 6), struct.pack('>3h', 0, 1, 2))
+
+    def test_read_ranges(self):
+        ds = make_dataset(10)
+        whole = ds.read(0, ds.size)
+        for offset, length in [(0, 1), (3, 100), (len(ds.header) - 2, 10), (ds.record_begin + 5, 60), (ds.size - 4, 100)]:
+            self.assertEqual(ds.read(offset, length), whole[offset:offset + length])
+        self.assertEqual(ds.read(ds.size, 10), '')
+
+        f = StringIO()
+        ds.write(f, chunk_size=7)
+        self.assertEqual(f.getvalue(), whole)
+
+    def test_wrong_size(self):
+        variables = [netcdf.Variable('value', ['time', 'z'], netcdf.NC_FLOAT, lambda record: [1.0])]
+        ds = netcdf.Dataset([('time', None), ('z', 3)], variables, numrecs=1)
+        self.assertRaises(ValueError, ds.read, 0, ds.size)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_procs.py
+@test Stopping container process groups and sweeping up leftover containers.
+"""
+
+import os, sys, signal, subprocess
+from twisted.trial import unittest
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from itv_trial import procs, tracing
+from itv_trial.itv_trial import stop_containers
+
+# stands in for a container: ignores SIGTERM if asked to, and starts a child of its own
+CONTAINER = """
+import os, sys, signal, time
+if sys.argv[1] == 'stubborn':
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+if os.fork() == 0:
+    time.sleep(60)
+    os._exit(0)
+sys.stdout.write('up\\n')
+sys.stdout.flush()
+time.sleep(60)
+"""
+
+class ProcsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pos = []
+
+    def tearDown(self):
+        for po in self.pos:
+            procs.kill_group(po.pid, signal.SIGKILL)
+            po.wait()
+
+    def _start(self, kind='normal', owner=None, sysname='abc123'):
+        env = os.environ.copy()
+        if owner is not None:
+            env[procs.OWNER_ENV] = str(owner)
+
+        po = subprocess.Popen([sys.executable, '-c', CONTAINER, kind, 'sysname=%s,id=1' % sysname],
+                              env=env, stdout=subprocess.PIPE, preexec_fn=os.setpgrp)
+        po.stdout.readline()
+        self.pos.append(po)
+        return po
+
+    def _dead_pid(self):
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        return pid
+
+    def test_stop_groups(self):
+        po = self._start()
+
+        killed = procs.stop_groups([po.pid], lambda pgid: po.poll(), timeout=5)
+        self.assertEqual(killed, [])
+        self.failIf(procs.group_exists(po.pid))     # the child went too
+        self.assertEqual(po.returncode, -signal.SIGTERM)
+
+    def test_escalation(self):
+        po = self._start('stubborn')
+
+        killed = procs.stop_groups([po.pid], lambda pgid: po.poll(), timeout=0.3)
+        self.assertEqual(killed, [po.pid])
+        self.assertEqual(po.wait(), -signal.SIGKILL)
+
+    def test_stop_containers_traced(self):
+        po = self._start()
+        path = self.mktemp()
+
+        tracing.begin(path)
+        stop_containers([po], path)
+        self.assertEqual(po.returncode, -signal.SIGTERM)
+
+        f = open(path)
+        events = [json.loads(x) for x in f]
+        f.close()
+
+        self.assertEqual([(x['name'], x['ph'], x['tid']) for x in events],
+                         [('SIGTERM', 'i', po.pid), ('exit', 'i', po.pid)])
+        self.failUnless(events[0]['ts'] <= events[1]['ts'])
+        self.assertEqual(events[1]['args'], {'returncode': -signal.SIGTERM})
+
+    def test_stop_exited_group(self):
+        self.assertEqual(procs.stop_groups([self._dead_pid()], timeout=0.3), [])
+
+    def test_owner_id(self):
+        if not os.path.isdir('/proc'):
+            raise unittest.SkipTest("no /proc")
+
+        pid, start = procs.get_owner_id().split(':')
+        self.assertEqual(int(pid), os.getpid())
+        self.assertEqual(start, procs.get_start_time(os.getpid()))
+        self.assertEqual(procs.get_start_time(self._dead_pid()), None)
+
+    def test_sweep_owner_reused(self):
+        if not os.path.isdir('/proc'):
+            raise unittest.SkipTest("no /proc")
+
+        # the owner's pid is running, but it's a later process than the one that started it
+        reused = self._start(owner='%d:1' % os.getppid(), sysname='reused')
+        owned = self._start(owner=procs.get_owner_id(os.getppid()), sysname='owned')
+
+        swept = procs.sweep(timeout=0.5)
+        self.assertEqual([x['pid'] for x in swept], [reused.pid])
+        self.assertNotEqual(reused.wait(), None)
+        self.assertEqual(owned.poll(), None)
+
+    def test_sweep_other_users(self):
+        if not os.path.isdir('/proc'):
+            raise unittest.SkipTest("no /proc")
+
+        orphan = self._start(owner=self._dead_pid(), sysname='orphan')
+        self.assertEqual(procs.sweep(['orphan'], timeout=0.5, uid=os.getuid() + 1), [])
+        self.assertEqual(orphan.poll(), None)
+
+    def test_sweep(self):
+        if not os.path.isdir('/proc'):
+            raise unittest.SkipTest("no /proc")
+
+        orphan = self._start(owner=self._dead_pid(), sysname='orphan')
+        owned = self._start(owner=os.getppid(), sysname='owned')
+        named = self._start(owner=os.getppid(), sysname='named')
+
+        found = dict([(x['pid'], x) for x in procs.find_containers()])
+        self.assertEqual(found[orphan.pid]['sysname'], 'orphan')
+        self.assertEqual(found[orphan.pid]['pgid'], orphan.pid)
+
+        swept = procs.sweep(['named'], timeout=0.5)     # our own zombies linger until we wait() below
+        self.assertEqual(sorted([x['pid'] for x in swept]), sorted([orphan.pid, named.pid]))
+
+        self.assertNotEqual(orphan.wait(), None)
+        self.assertNotEqual(named.wait(), None)
+        self.assertEqual(owned.poll(), None)
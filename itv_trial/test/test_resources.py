@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_resources.py
+@test Sampling container resource usage from /proc.
+"""
+
+import os
+from twisted.trial import unittest
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from itv_trial import resources
+
+class ResourcesTest(unittest.TestCase):
+
+    def setUp(self):
+        if not os.path.exists('/proc/self/stat'):
+            raise unittest.SkipTest("no /proc")
+
+    def test_read_proc_stats(self):
+        rss, cpu, fds, threads = resources.read_proc_stats(os.getpid())
+        self.failUnless(rss > 0)
+        self.failUnless(cpu >= 0)
+        self.failUnless(fds >= 3)
+        self.failUnless(threads >= 1)
+
+    def test_read_proc_io(self):
+        before = resources.read_proc_io(os.getpid())
+        f = open(self.mktemp(), 'w')
+        f.write('x' * 10000)
+        f.close()
+        after = resources.read_proc_io(os.getpid())
+        self.failUnless(after['wchar'] - before['wchar'] >= 10000)
+        self.failUnless('write_bytes' in after)
+
+    def test_gone(self):
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertEqual(resources.read_proc_stats(pid), None)
+        self.assertEqual(resources.read_proc_io(pid), None)
+
+    def test_summarize(self):
+        samples = [[1.0, 1000, 0.5, 10, 2],
+                   [2.0, 3000, 0.75, 12, 4],
+                   [3.0, 2000, 1.5, 11, 3],
+                   [4.0, None, None, None, None]]      # exited
+
+        self.assertEqual(resources.summarize(samples), {'peak_rss'      : 3000,
+                                                        'rss_growth'    : 1000,
+                                                        'cpu'           : 1.0,
+                                                        'peak_fds'      : 12,
+                                                        'fd_growth'     : 1,
+                                                        'peak_threads'  : 4})
+
+    def test_sample_and_record(self):
+        containers = [("res/apps/a.app", "id=1", os.getpid())]
+        sampler = resources.ResourceSampler(containers, 0.01)
+        sampler.start()
+        sampler.stop()
+
+        self.failUnless(len(sampler.series[0]) >= 2)
+        self.failUnless("res/apps/a.app (id=1)" in resources.format_summary(containers, sampler.series))
+
+        path = self.mktemp()
+        resources.record(path, ["mod.ATest"], "abc123", containers, sampler.series)
+
+        f = open(path)
+        entry = json.loads(f.readline())
+        f.close()
+
+        self.assertEqual(entry['classes'], ["mod.ATest"])
+        self.assertEqual(entry['apps'][0]['pid'], os.getpid())
+        self.assertEqual(len(entry['apps'][0]['samples']), len(sampler.series[0]))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_stats.py
+@test Percentiles and summaries of benchmark samples.
+"""
+
+from twisted.trial import unittest
+
+from itv_trial import stats
+
+class StatsTest(unittest.TestCase):
+
+    def test_percentile(self):
+        values = [4.0, 1.0, 3.0, 2.0, 5.0]
+        self.assertEqual(stats.percentile(values, 0), 1.0)
+        self.assertEqual(stats.percentile(values, 50), 3.0)
+        self.assertEqual(stats.percentile(values, 100), 5.0)
+        self.assertAlmostEqual(stats.percentile(values, 95), 4.8)
+        self.assertEqual(stats.percentile([7.0], 95), 7.0)
+        self.assertEqual(stats.percentile([], 50), None)
+
+    def test_summarize(self):
+        summary = stats.summarize([2.0, 1.0, 3.0])
+        self.assertEqual(summary['n'], 3)
+        self.assertEqual(summary['min'], 1.0)
+        self.assertEqual(summary['mean'], 2.0)
+        self.assertEqual(summary['p50'], 2.0)
+        self.assertEqual(summary['max'], 3.0)
+
+        empty = stats.summarize([])
+        self.assertEqual(empty['n'], 0)
+        self.assertEqual(empty['p95'], None)
+
+class HistogramTest(unittest.TestCase):
+
+    def test_percentiles(self):
+        hist = stats.Histogram(significant_digits=2)
+        for i in range(1, 1001):
+            hist.record(i / 1000.0)         # 1ms to 1s
+
+        self.assertEqual(hist.count, 1000)
+        self.assertEqual(hist.percentile(50), 0.5)
+        self.assertEqual(hist.percentile(99), 0.99)
+        self.assertEqual(hist.percentile(100), 1.0)
+
+        summary = hist.summary()
+        self.assertEqual(summary['min'], 0.001)
+        self.assertEqual(summary['max'], 1.0)
+        self.assertAlmostEqual(summary['mean'], 0.5005)
+        self.failUnless('p99.9' in summary)
+
+    def test_precision(self):
+        hist = stats.Histogram(significant_digits=2)
+        hist.record(0.123456)
+        hist.record(0.124999)
+
+        # both land in the same 2 digit bucket
+        self.assertEqual(len(hist.buckets), 1)
+        self.assertEqual(hist.percentile(50), 0.123456)     # clamped to the recorded min
+
+    def test_merge(self):
+        a = stats.Histogram()
+        b = stats.Histogram()
+        a.record(0.001)
+        b.record(0.002)
+        b.record(0.003)
+        a.merge(b)
+
+        self.assertEqual(a.count, 3)
+        self.assertEqual(a.summary()['max'], 0.003)
+        self.assertEqual(stats.Histogram().percentile(50), None)
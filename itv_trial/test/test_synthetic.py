@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_synthetic.py
+@test Synthetic CDM datasets for ingestion scale tests.
+"""
+
+import os, struct
+
+from twisted.trial import unittest
+
+from itv_trial.fixtures import synthetic
+from itv_trial.test.test_netcdf import HeaderReader
+
+class SyntheticTest(unittest.TestCase):
+
+    def _read(self, dataset):
+        return HeaderReader(dataset.read(0, dataset.size))
+
+    def test_station(self):
+        header = self._read(synthetic.make_dataset('station', times=5, variables=3))
+        self.assertEqual(header.attrs['CF:featureType'], 'station')
+        self.assertEqual(header.numrecs, 5)
+        variables = dict([(x['name'], x) for x in header.variables])
+        self.assertEqual(sorted(variables.keys()), ['lat', 'lon', 'stnDepth', 'stnId', 'time', 'var0', 'var1', 'var2'])
+        self.assertEqual(variables['var1']['dims'], ['time'])
+        self.assertEqual(variables['var1']['attrs']['coordinates'], 'time lon lat')
+        self.assertEqual(variables['var1']['attrs']['_FillValue'], [-999.0])
+
+    def test_profile(self):
+        header = self._read(synthetic.make_dataset('profile', times=2, variables=1, depths=10))
+        self.assertEqual(header.dims, [('profile', 0), ('z', 10)])
+        variables = dict([(x['name'], x) for x in header.variables])
+        self.assertEqual(variables['var0']['dims'], ['profile', 'z'])
+        self.assertEqual(variables['var0']['vsize'], 40)
+
+    def test_grid(self):
+        dataset = synthetic.make_dataset('grid', times=3, variables=2, lats=4, lons=8)
+        header = self._read(dataset)
+        self.assertEqual(header.dims, [('time', 0), ('lat', 4), ('lon', 8)])
+        self.assertEqual(dataset.recsize, 8 + 2 * 4 * 32)
+
+        # times step on from the start
+        times = [struct.unpack('>d', dataset.read(dataset.record_begin + x * dataset.recsize, 8))[0] for x in range(3)]
+        self.assertEqual(times, [synthetic.TIME_START + x * synthetic.TIME_STEP for x in range(3)])
+
+    def test_size(self):
+        for feature_type in synthetic.FEATURE_TYPES:
+            for size in [1, 200000, 3 * 1024 * 1024]:
+                dataset = synthetic.make_dataset_of_size(feature_type, size)
+                self.assertTrue(dataset.size >= size)
+                self.assertTrue(dataset.numrecs == 1 or dataset.size - dataset.recsize < size)
+
+        self.assertRaises(ValueError, synthetic.make_dataset, 'swath')
+
+    def test_write(self):
+        dataset = synthetic.make_dataset('profile', times=30, variables=2)
+        path = self.mktemp()
+        synthetic.write(dataset, path, chunk_size=1000)
+        self.assertEqual(open(path, 'rb').read(), dataset.read(0, dataset.size))
+        self.assertFalse(os.path.exists(path + '.tmp'))
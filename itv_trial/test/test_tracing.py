@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/test/test_tracing.py
+@test Recording spans and exporting them as a Chrome trace.
+"""
+
+import os
+from twisted.trial import unittest
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from itv_trial import tracing
+
+class TracingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = self.mktemp()
+
+    def test_export(self):
+        tracing.begin(self.path)
+        tracing.name_row(self.path, 1234, "res/apps/a.app (abc123)")
+        tracing.span(self.path, "a.app", 10.0, 12.5, "container", 1234, app="res/apps/a.app", status="ready")
+        tracing.instant(self.path, "exited", 13.0)
+
+        # a worker killed mid-write leaves a partial line
+        f = open(self.path, 'a')
+        f.write('{"name": "trial", "ph"')
+        f.close()
+
+        tracing.export(self.path)
+
+        f = open(self.path)
+        trace = json.load(f)
+        f.close()
+
+        events = trace['traceEvents']
+        self.assertEqual([x['ph'] for x in events], ['M', 'X', 'i', 'M'])
+
+        span = events[1]
+        self.assertEqual(span['ts'], 10000000)
+        self.assertEqual(span['dur'], 2500000)
+        self.assertEqual(span['tid'], 1234)
+        self.assertEqual(span['pid'], os.getpid())
+        self.assertEqual(span['args'], {'app': 'res/apps/a.app', 'status': 'ready'})
+        self.assertEqual(events[3]['args']['name'], 'itv_trial')
+
+    def test_begin_truncates(self):
+        tracing.begin(self.path)
+        tracing.instant(self.path, "old", 1.0)
+        tracing.begin(self.path)
+        tracing.export(self.path)
+
+        f = open(self.path)
+        self.assertEqual(json.load(f)['traceEvents'], [])
+        f.close()
+
+    def test_disabled(self):
+        tracing.begin(None)
+        tracing.span(None, "a", 1.0, 2.0)
+        tracing.export(None)
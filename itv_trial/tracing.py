@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""
+@file itv_trial/tracing.py
+@brief Records spans of a run (container boots, trial runs, teardowns) as a Chrome trace.
+
+While running, events are appended to the trace file one JSON object per line, so parallel
+workers can all write to it. export() then rewrites it in the Chrome trace-event format, which
+chrome://tracing and ui.perfetto.dev load as a timeline:
+
+    {"traceEvents": [{"name": "attributestore.app", "cat": "container", "ph": "X",
+                      "ts": 1307462400000000, "dur": 4180000, "pid": 4321, "tid": 4330,
+                      "args": {"sysname": "3f2a1b", "app": "res/apps/attributestore.app", ...}},
+                     ...],
+     "displayTimeUnit": "ms"}
+
+Each itv_trial process (the main one, and every --jobs worker) shows up as a process, and each
+container gets its own row (tid is its pid), so the containers on the critical path of a start
+are the ones whose row ends last. When a container is sent SIGTERM, needs a SIGKILL and exits is
+marked on its row too.
+
+Every function does nothing if path is None, so callers need not check whether tracing is on.
+"""
+
+import os
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import history
+
+def _us(t):
+    return int(t * 1000000)
+
+def _write(path, event):
+    event.setdefault('pid', os.getpid())
+    event.setdefault('tid', os.getpid())
+    history.append_json_line(path, event)
+
+def begin(path):
+    """
+    Empties the trace file at the start of a run.
+    """
+    if path is None:
+        return
+
+    open(path, 'w').close()
+
+def span(path, name, start, end, cat="itv", tid=None, **args):
+    """
+    Records something that took from start to end (time.time() values). Extra keyword args
+    are shown with it in the viewer.
+    """
+    if path is None:
+        return
+
+    event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': _us(start), 'dur': _us(end) - _us(start), 'args': args}
+    if tid is not None:
+        event['tid'] = tid
+
+    _write(path, event)
+
+def instant(path, name, when, cat="itv", tid=None, **args):
+    """
+    Records something that happened at one point in time.
+    """
+    if path is None:
+        return
+
+    event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': _us(when), 'args': args}
+    if tid is not None:
+        event['tid'] = tid
+
+    _write(path, event)
+
+def counter(path, name, when, **values):
+    """
+    Records the values of a counter at a point in time, drawn as a graph in the viewer.
+    """
+    if path is None:
+        return
+
+    _write(path, {'name': name, 'cat': 'counter', 'ph': 'C', 'ts': _us(when), 'args': values})
+
+def name_row(path, tid, name):
+    """
+    Labels the row of events recorded with this tid.
+    """
+    if path is None:
+        return
+
+    _write(path, {'name': 'thread_name', 'ph': 'M', 'tid': tid, 'args': {'name': name}})
+
+def export(path):
+    """
+    Rewrites the events recorded so far as a Chrome trace JSON file.
+    """
+    if path is None or not os.path.exists(path):
+        return
+
+    events = []
+    f = open(path)
+    for line in f:
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue        # a line cut short by a killed worker
+    f.close()
+
+    for pid in sorted(set([x['pid'] for x in events])):
+        if pid == os.getpid():
+            name = "itv_trial"
+        else:
+            name = "itv_trial worker %d" % pid
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': pid, 'args': {'name': name}})
+
+    tmpfile = "%s.%d" % (path, os.getpid())
+    f = open(tmpfile, 'w')
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    f.close()
+    os.rename(tmpfile, path)
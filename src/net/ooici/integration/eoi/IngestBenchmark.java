@@ -0,0 +1,293 @@
+/*
+ * Benchmark driver for the eoi_ingest round trip IntegrationTest makes once.
+ */
+
+package net.ooici.integration.eoi;
+
+import ion.core.messaging.IonMessage;
+import ion.core.messaging.MessagingName;
+import ion.core.messaging.MsgBrokerClient;
+import java.io.File;
+import java.io.FileWriter;
+import java.io.IOException;
+import java.util.ArrayList;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.atomic.AtomicInteger;
+import net.ooici.eoi.proto.Unidata2Ooi;
+import ooici.netcdf.iosp.IospUtils;
+import org.slf4j.Logger;
+import org.slf4j.LoggerFactory;
+import ucar.nc2.dataset.NetcdfDataset;
+
+/**
+ * Sends a dataset to the eoi_ingest service over and over, as IntegrationTest does once, and times
+ * the three parts of each round trip apart: serializing the dataset (Unidata2Ooi.ncdfToByteArray),
+ * sending it (MsgBrokerClient.sendMessage), and waiting for the reply, which is the broker delivering
+ * it plus the Python ingest service handling it. That tells a GPB encoding bottleneck from a broker
+ * or ingest service one.
+ *
+ * Each of the concurrency workers has its own broker connection and reply queue, and sends its next
+ * message as soon as the last is answered. The connection comes from ooici-conn.properties, like
+ * IntegrationTest. Arguments, all optional:
+ *
+ *   -dataset path      NetCDF file to send, default test_data/USGS_Test.nc. Bigger ones can be made
+ *                      with "python -m itv_trial.fixtures.synthetic station out.nc --size 100MB",
+ *                      which "ant ingest-benchmark -Dbench.size=100MB" does.
+ *   -messages n        round trips in all, default 10.
+ *   -concurrency n     workers, default 1.
+ *   -timeout seconds   how long to wait for all the replies, default 600.
+ *   -report path       where to write the JSON report, default bench_java_ingest.json.
+ *
+ * Times in the report are seconds, summarized the same way as the Python benchmarks' (itv_trial.stats).
+ */
+public class IngestBenchmark {
+
+    private static Logger log = LoggerFactory.getLogger(IngestBenchmark.class);
+
+    private static final double[] PERCENTILES = {50, 95, 99};
+
+    /** The times of one round trip, in nanoseconds, or why it failed. */
+    static class Sample {
+
+        long serializeNanos;
+        long sendNanos;
+        long replyNanos;
+        int bytes;
+        String error;
+    }
+
+    private String datasetPath = "test_data/USGS_Test.nc";
+    private int messages = 10;
+    private int concurrency = 1;
+    private long timeoutSeconds = 600;
+    private String reportPath = "bench_java_ingest.json";
+
+    private HashMap<String, String> connInfo;
+    private final AtomicInteger nextMessage = new AtomicInteger(0);
+    private final List<Sample> samples = Collections.synchronizedList(new ArrayList<Sample>());
+
+    public IngestBenchmark(String[] args) {
+        for (int i = 0; i + 1 < args.length; i += 2) {
+            String name = args[i];
+            String value = args[i + 1];
+            if (name.equals("-dataset")) {
+                datasetPath = value;
+            } else if (name.equals("-messages")) {
+                messages = Integer.parseInt(value);
+            } else if (name.equals("-concurrency")) {
+                concurrency = Integer.parseInt(value);
+            } else if (name.equals("-timeout")) {
+                timeoutSeconds = Long.parseLong(value);
+            } else if (name.equals("-report")) {
+                reportPath = value;
+            } else {
+                throw new IllegalArgumentException("Unknown argument " + name);
+            }
+        }
+        if (args.length % 2 != 0) {
+            throw new IllegalArgumentException("No value given for " + args[args.length - 1]);
+        }
+    }
+
+    /**
+     * Does round trips until all the messages are taken, over its own broker connection.
+     */
+    private class Worker implements Runnable {
+
+        public void run() {
+            MsgBrokerClient cli = null;
+            NetcdfDataset ncds = null;
+            try {
+                /* NetcdfDataset isn't thread safe, so each worker opens its own */
+                ncds = NetcdfDataset.openDataset(datasetPath);
+
+                MessagingName toName = new MessagingName(connInfo.get("exchange"), connInfo.get("service"));
+                cli = new MsgBrokerClient(connInfo.get("server"), com.rabbitmq.client.AMQP.PROTOCOL.PORT, connInfo.get("topic"));
+                MessagingName fromName = MessagingName.generateUniqueName();
+                cli.attach();
+                String recieverQueue = cli.declareQueue(null);
+                cli.bindQueue(recieverQueue, fromName, null);
+                cli.attachConsumer(recieverQueue);
+
+                while (nextMessage.getAndIncrement() < messages) {
+                    Sample sample = new Sample();
+                    try {
+                        long start = System.nanoTime();
+                        byte[] bytes_out = Unidata2Ooi.ncdfToByteArray(ncds);
+                        long serialized = System.nanoTime();
+
+                        IonMessage dataMessage = cli.createMessage(fromName, toName, "ingest", bytes_out);
+                        dataMessage.getIonHeaders().put("encoding", "ION R1 GPB");
+                        cli.sendMessage(dataMessage);
+                        long sent = System.nanoTime();
+
+                        IonMessage reply = cli.consumeMessage(recieverQueue);
+                        long replied = System.nanoTime();
+
+                        sample.bytes = bytes_out.length;
+                        sample.serializeNanos = serialized - start;
+                        sample.sendNanos = sent - serialized;
+                        sample.replyNanos = replied - sent;
+                        if (reply == null || reply.getContent() == null) {
+                            sample.error = "empty reply";
+                        }
+                    } catch (Exception ex) {
+                        log.error("Ingest round trip failed", ex);
+                        sample.error = ex.toString();
+                    }
+                    samples.add(sample);
+                }
+            } catch (Exception ex) {
+                log.error("Worker could not start", ex);
+            } finally {
+                if (cli != null) {
+                    cli.detach();
+                }
+                try {
+                    if (ncds != null) {
+                        ncds.close();
+                    }
+                } catch (IOException ex) {
+                    log.error("Error closing dataset", ex);
+                }
+            }
+        }
+    }
+
+    /**
+     * @return whether every message made it there and back without an error
+     */
+    public boolean run() throws Exception {
+        connInfo = IospUtils.parseProperties(new File("ooici-conn.properties"));
+
+        log.info("Sending " + datasetPath + " to " + connInfo.get("service") + " " + messages
+                + " times, " + concurrency + " at a time");
+
+        ExecutorService executor = Executors.newFixedThreadPool(concurrency);
+        long start = System.nanoTime();
+        for (int i = 0; i < concurrency; i++) {
+            executor.execute(new Worker());
+        }
+        executor.shutdown();
+        boolean finished = executor.awaitTermination(timeoutSeconds, TimeUnit.SECONDS);
+        double elapsed = (System.nanoTime() - start) / 1e9;
+
+        List<Sample> done;
+        synchronized (samples) {
+            done = new ArrayList<Sample>(samples);
+        }
+
+        List<Double> serialize = new ArrayList<Double>();
+        List<Double> send = new ArrayList<Double>();
+        List<Double> reply = new ArrayList<Double>();
+        int errors = 0;
+        long bytes = 0;
+        for (Sample sample : done) {
+            if (sample.error != null) {
+                errors++;
+                continue;
+            }
+            serialize.add(sample.serializeNanos / 1e9);
+            send.add(sample.sendNanos / 1e9);
+            reply.add(sample.replyNanos / 1e9);
+            bytes = sample.bytes;
+        }
+        int ok = reply.size();
+        int missing = messages - done.size();
+
+        StringBuilder report = new StringBuilder();
+        report.append("{\"dataset\": ").append(quote(datasetPath));
+        report.append(", \"bytes\": ").append(bytes);
+        report.append(", \"messages\": ").append(messages);
+        report.append(", \"concurrency\": ").append(concurrency);
+        report.append(", \"ok\": ").append(ok);
+        report.append(", \"errors\": ").append(errors);
+        report.append(", \"missing\": ").append(missing);
+        report.append(", \"elapsed\": ").append(elapsed);
+        report.append(", \"throughput\": ").append(ok / elapsed);
+        report.append(", \"serialize\": ").append(summarize(serialize));
+        report.append(", \"send\": ").append(summarize(send));
+        report.append(", \"reply\": ").append(summarize(reply));
+        report.append("}\n");
+
+        FileWriter out = new FileWriter(reportPath);
+        try {
+            out.write(report.toString());
+        } finally {
+            out.close();
+        }
+
+        System.out.println(String.format(Locale.US, ">>>> %d of %d round trips of %d bytes in %.1fs, %.2f/s, %d errors, %d missing",
+                ok, messages, bytes, elapsed, ok / elapsed, errors, missing));
+        System.out.println(">>>> serialize p50 " + format(serialize) + ", send p50 " + format(send)
+                + ", reply p50 " + format(reply) + "; report in " + reportPath);
+
+        return finished && errors == 0 && missing == 0;
+    }
+
+    static double percentile(List<Double> sorted, double p) {
+        double rank = (sorted.size() - 1) * p / 100.0;
+        int lower = (int) rank;
+        int upper = Math.min(lower + 1, sorted.size() - 1);
+        return sorted.get(lower) + (sorted.get(upper) - sorted.get(lower)) * (rank - lower);
+    }
+
+    /**
+     * @return a JSON object with n, min, mean, max and pNN of the values, as itv_trial.stats.summarize makes
+     */
+    static String summarize(List<Double> values) {
+        List<Double> sorted = new ArrayList<Double>(values);
+        Collections.sort(sorted);
+
+        StringBuilder sb = new StringBuilder();
+        sb.append("{\"n\": ").append(sorted.size());
+        if (sorted.isEmpty()) {
+            sb.append(", \"min\": null, \"mean\": null, \"max\": null");
+            for (double p : PERCENTILES) {
+                sb.append(", \"p").append((int) p).append("\": null");
+            }
+        } else {
+            double sum = 0;
+            for (double x : sorted) {
+                sum += x;
+            }
+            sb.append(", \"min\": ").append(sorted.get(0));
+            sb.append(", \"mean\": ").append(sum / sorted.size());
+            sb.append(", \"max\": ").append(sorted.get(sorted.size() - 1));
+            for (double p : PERCENTILES) {
+                sb.append(", \"p").append((int) p).append("\": ").append(percentile(sorted, p));
+            }
+        }
+        return sb.append("}").toString();
+    }
+
+    static String format(List<Double> values) {
+        if (values.isEmpty()) {
+            return "-";
+        }
+        List<Double> sorted = new ArrayList<Double>(values);
+        Collections.sort(sorted);
+        return String.format(Locale.US, "%.1fms", percentile(sorted, 50) * 1000);
+    }
+
+    static String quote(String s) {
+        return "\"" + s.replace("\\", "\\\\").replace("\"", "\\\"") + "\"";
+    }
+
+    public static void main(String[] args) {
+        int retInt = 1;
+        try {
+            retInt = new IngestBenchmark(args).run() ? 0 : 1;
+        } catch (Exception ex) {
+            log.error("Error running ingest benchmark", ex);
+        }
+        /* workers still waiting on replies at the timeout are abandoned */
+        System.exit(retInt);
+    }
+}
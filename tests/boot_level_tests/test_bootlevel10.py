@@ -24,6 +24,9 @@ class Bootlevel10ReadyTest(ItvTestCase):
                         "res/deploy/bootlevel9.rel",
                         "res/deploy/bootlevel10.rel",
                         ]
+
+    ping_services = ['java_agent_wrapper']
+
     @defer.inlineCallbacks
     def setUp(self):
         yield self._start_container()
@@ -37,7 +40,7 @@ class Bootlevel10ReadyTest(ItvTestCase):
         p = Process()
         yield p.spawn()
 
-        for servicename in ['java_agent_wrapper']:
+        for servicename in self.ping_services:
             (content, headers, msg) = yield p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {})
             # if timeout, will just fail the test
 
@@ -18,10 +18,14 @@ from ion.services.coi.datastore import ID_CFG
 log = ion.util.ionlog.getLogger(__name__)
 CONF = ioninit.config(__name__)
 
+PULL_CONCURRENCY = 8    # preload repos pulled at once, 'pull_concurrency' in the config overrides
+
 class Bootlevel4ReadyTest(ItvTestCase):
 
     app_dependencies = ["res/deploy/bootlevel4.rel"]
 
+    ping_services = ['datastore', 'association_service', 'resource_registry']
+
     @defer.inlineCallbacks
     def setUp(self):
         yield self._start_container()
@@ -32,50 +36,54 @@ class Bootlevel4ReadyTest(ItvTestCase):
 
     @defer.inlineCallbacks
     def test_all_services(self):
+        """
+        Pings the services, then pulls each preloaded repo, PULL_CONCURRENCY at a time, and checks
+        the name or word of its master object. The objects are checked out and compared field by
+        field rather than by hash: nothing holds expected hashes for the preload, the datastore
+        makes them at bootstrap. The checkout is local to what the pull brought over.
+        """
         p = Process()
         yield p.spawn()
 
-        for servicename in ['datastore', 'association_service', 'resource_registry']:
+        for servicename in self.ping_services:
             (content, headers, msg) = yield p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {})
             # if timeout, will just fail the test
 
         # perform basic datastore level tests to make sure required things are there
+        checks = {}     # repo name => list of (attribute, expected value) of its master object
+
         defaults={}
         defaults.update(ION_RESOURCE_TYPES)
         defaults.update(ION_IDENTITIES)
 
         for key, value in defaults.items():
 
-            repo_name = value[ID_CFG]
-
             c_args = value.get(CONTENT_ARGS_CFG)
             if c_args and not c_args.get('filename'):
-                break
-
-
-
-            result = yield p.workbench.pull('datastore',repo_name)
-            self.assertEqual(result.MessageResponseCode, result.ResponseCodes.OK)
-
-            repo = p.workbench.get_repository(repo_name)
-
-            # Check that we got back both branches!
-            default_obj = yield repo.checkout(branchname='master')
-
-            self.assertEqual(default_obj.name, value[NAME_CFG])
+                continue
 
+            checks.setdefault(value[ID_CFG], []).append(('name', value[NAME_CFG]))
 
         for key, value in ION_PREDICATES.items():
+            checks.setdefault(value[ID_CFG], []).append(('word', value[PREDICATE_CFG]))
 
-            repo_name = value[ID_CFG]
+        sem = defer.DeferredSemaphore(CONF.getValue('pull_concurrency', PULL_CONCURRENCY))
+        results = yield defer.DeferredList([sem.run(self._check_repo, p, repo_name, repo_checks)
+                                            for repo_name, repo_checks in checks.items()], consumeErrors=True)
 
-            result = yield p.workbench.pull('datastore',repo_name)
-            self.assertEqual(result.MessageResponseCode, result.ResponseCodes.OK)
+        for success, result in results:
+            if not success:
+                result.raiseException()
 
-            repo = p.workbench.get_repository(repo_name)
+    @defer.inlineCallbacks
+    def _check_repo(self, p, repo_name, checks):
+        result = yield p.workbench.pull('datastore',repo_name)
+        self.assertEqual(result.MessageResponseCode, result.ResponseCodes.OK)
 
-            # Check that we got back both branches!
-            default_obj = yield repo.checkout(branchname='master')
+        repo = p.workbench.get_repository(repo_name)
 
-            self.assertEqual(default_obj.word, value[PREDICATE_CFG])
+        # the pull brought the objects over, checking out is local
+        default_obj = yield repo.checkout(branchname='master')
 
+        for attr, expected in checks:
+            self.assertEqual(getattr(default_obj, attr), expected)
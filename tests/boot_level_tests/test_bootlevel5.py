@@ -20,6 +20,8 @@ class Bootlevel5ReadyTest(ItvTestCase):
                         "res/deploy/bootlevel5.rel",
                         ]
 
+    ping_services = ['exchange_management', 'cassandra_manager_agent']
+
     @defer.inlineCallbacks
     def setUp(self):
         yield self._start_container()
@@ -33,7 +35,7 @@ class Bootlevel5ReadyTest(ItvTestCase):
         p = Process()
         yield p.spawn()
 
-        for servicename in ['exchange_management', 'cassandra_manager_agent']:
+        for servicename in self.ping_services:
             (content, headers, msg) = yield p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {})
             # if timeout, will just fail the test
 
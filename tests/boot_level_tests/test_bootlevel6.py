@@ -20,6 +20,9 @@ class Bootlevel6ReadyTest(ItvTestCase):
                         "res/deploy/bootlevel5.rel",
                         "res/deploy/bootlevel6.rel",
                         ]
+
+    ping_services = ['attributestore']
+
     @defer.inlineCallbacks
     def setUp(self):
         yield self._start_container()
@@ -33,7 +36,7 @@ class Bootlevel6ReadyTest(ItvTestCase):
         p = Process()
         yield p.spawn()
 
-        for servicename in ['attributestore']:
+        for servicename in self.ping_services:
             (content, headers, msg) = yield p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {})
             # if timeout, will just fail the test
 
@@ -22,6 +22,8 @@ class Bootlevel7ReadyTest(ItvTestCase):
                         "res/deploy/bootlevel7.rel",
                         ]
 
+    ping_services = ['identity_service']
+
     @defer.inlineCallbacks
     def setUp(self):
         yield self._start_container()
@@ -35,7 +37,7 @@ class Bootlevel7ReadyTest(ItvTestCase):
         p = Process()
         yield p.spawn()
 
-        for servicename in ['identity_service']:
+        for servicename in self.ping_services:
             (content, headers, msg) = yield p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {})
             # if timeout, will just fail the test
 
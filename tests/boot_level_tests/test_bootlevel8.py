@@ -22,6 +22,9 @@ class Bootlevel8ReadyTest(ItvTestCase):
                         "res/deploy/bootlevel7.rel",
                         "res/deploy/bootlevel8.rel",
                         ]
+
+    ping_services = ['pubsub', 'scheduler', 'dataset_controller']
+
     @defer.inlineCallbacks
     def setUp(self):
         yield self._start_container()
@@ -35,7 +38,7 @@ class Bootlevel8ReadyTest(ItvTestCase):
         p = Process()
         yield p.spawn()
 
-        for servicename in ['pubsub','scheduler','dataset_controller']:
+        for servicename in self.ping_services:
             (content, headers, msg) = yield p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {})
             # if timeout, will just fail the test
 
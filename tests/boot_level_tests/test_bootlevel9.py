@@ -23,6 +23,9 @@ class Bootlevel9ReadyTest(ItvTestCase):
                         "res/deploy/bootlevel8.rel",
                         "res/deploy/bootlevel9.rel",
                         ]
+
+    ping_services = ['ingestion', 'notification_alert', 'store_service', 'cdm_validation_service', 'app_integration']
+
     @defer.inlineCallbacks
     def setUp(self):
         yield self._start_container()
@@ -36,7 +39,7 @@ class Bootlevel9ReadyTest(ItvTestCase):
         p = Process()
         yield p.spawn()
 
-        for servicename in ['ingestion','notification_alert','store_service','cdm_validation_service','app_integration']:
+        for servicename in self.ping_services:
             (content, headers, msg) = yield p.rpc_send(p.get_scoped_name('system', servicename), 'ping', {})
             # if timeout, will just fail the test
 
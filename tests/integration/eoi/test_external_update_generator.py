@@ -19,7 +19,8 @@ from ion.core.data.storage_configuration_utility import STORAGE_PROVIDER, PERSIS
 from ion.test.iontest import IonTestCase
 import ion.util.ionlog
 from ion.util.iontime import IonTime
-from ion.util.procutils import asleep
+
+from itv_trial.eventwait import EventWait
 
 log = ion.util.ionlog.getLogger(__name__)
 
@@ -29,6 +30,9 @@ from ion.util.itv_decorator import itv
 from ion.core import ioninit
 CONF = ioninit.config(__name__)
 
+# seconds to wait for the update notice before failing
+NOTICE_TIMEOUT = CONF.getValue('notice_timeout', 5)
+
 
 # other messages used for payloads
 SCHEDULE_TYPE_PERFORM_INGESTION_UPDATE_PAYLOAD_TYPE = object_utils.create_type_identifier(object_id=2607, version=1)
@@ -51,12 +55,12 @@ class ExternalUpdateTest(IonTestCase):
         yield self.proc.spawn()
 
         # setup subscriber for trigger event
-        self._notices = []
+        # you can not keep the received message around after the ondata callback is complete;
+        # a redelivered notice for the same dataset is dropped, this checks that one arrives
+        self._notices = EventWait(extract=lambda c: c['content'].additional_data.payload.dataset_id, unique=True)
         self.sub = ScheduleEventSubscriber(process=self.proc,
                                            origin=SCHEDULE_TYPE_PERFORM_INGESTION_UPDATE)
-
-        # you can not keep the received message around after the ondata callback is complete
-        self.sub.ondata = lambda c: self._notices.append(c['content'].additional_data.payload.dataset_id)
+        self.sub.ondata = self._notices
 
         # normally we'd register before initialize/activate but let's not bring the PSC/EMS into the mix
         # if we can avoid it.
@@ -84,7 +88,8 @@ class ExternalUpdateTest(IonTestCase):
         # @TODO use twisted process spawn to run the java update event generator.
 
 
-        yield asleep(3)
+        met = yield self._notices.wait(1, NOTICE_TIMEOUT)
         #cc = yield self.client.get_count()
         #self.failUnless(int(cc['value']) >= 1)
-        self.failUnless(len(self._notices) == 1, "this may fail intermittently due to messaging")
\ No newline at end of file
+        self.failUnless(met, "expected an update notice within %ss" % NOTICE_TIMEOUT)
+        log.info("Update notice took %.2fs" % self._notices.waited)
\ No newline at end of file
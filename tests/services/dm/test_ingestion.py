@@ -6,6 +6,8 @@
 @test 
 """
 
+import time
+
 import ion.util.ionlog
 from twisted.internet import defer
 
@@ -29,15 +31,20 @@ from ion.services.dm.scheduler.scheduler_service import SCHEDULE_TYPE_PERFORM_IN
 
 from ion.services.coi.datastore_bootstrap.ion_preload_config import HAS_A_ID
 
-DATA_SOURCE_RESOURCE_TYPE   = create_type_identifier(object_id=4503, version=1)
+from itv_trial.fixtures.ingestion import DATA_SOURCE_RESOURCE_TYPE, SCHEDULER_PERFORM_INGEST, REMOTE_DATASET_URL, \
+                                         get_dataset_url, create_ingest_resources, rpc_call_jaw, scheduled_jaw_event
+from itv_trial.eventwait import EventWait
+
 THREDDS_AUTHENTICATION_TYPE = create_type_identifier(object_id=4504, version=1)
-SCHEDULER_PERFORM_INGEST    = create_type_identifier(object_id=2607, version=1)
 
 
 
 log = ion.util.ionlog.getLogger(__name__)
 CONF = ioninit.config(__name__)
 
+# seconds to wait for the supplement added event, inside the class timeout so a missing one says so
+INGEST_TIMEOUT = 110
+
 class IntTestIngest(ItvTestCase):
 
     app_dependencies = [
@@ -51,6 +58,8 @@ class IntTestIngest(ItvTestCase):
 
                 ("res/apps/eoiagents.app", "id=1"),
 
+                ("res/apps/ncserver.app", "id=1"),
+
                 ]
 
     timeout = 120
@@ -86,49 +95,9 @@ class IntTestIngest(ItvTestCase):
     @defer.inlineCallbacks
     def jaw_ingest_test(self, call_jaw):
 
-
-        dataset = yield self.rc.create_instance(CDM_DATASET_TYPE,
-                                                ResourceName = 'Blank dataset for testing ingestion',
-                                                ResourceDescription= 'An example of a station dataset')
-
-        group = dataset.CreateObject(CDM_GROUP_TYPE)
-        dataset.root_group = group
-
-        #group.name = 'David'
-
-        #log.debug(dataset.ResourceObject.PPrint())
-
-        datasource = yield self.rc.create_instance(DATA_SOURCE_RESOURCE_TYPE,
-                                                ResourceName = 'CGSN example for ingestion testing',
-                                                ResourceDescription= 'An example of a data source for the CGSN OSU dataset for testing ingestion')
-
-
-        datasource.source_type = datasource.SourceType.NETCDF_S
-        datasource.request_type = datasource.RequestType.DAP
-
-        datasource.dataset_url = "http://uop.whoi.edu/oceansites/ooi/OS_NTAS_2010_R_M-1.nc"
-
-        datasource.max_ingest_millis = 120000
-        
-        datasource.registration_datetime_millis = IonTime().time_ms
-
-        datasource.ion_title = "NTAS 1"
-        datasource.ion_description = "OSU CGSN"
-
-        datasource.update_interval_seconds = 86400
-
-        #datasource.authentication = datasource.CreateObject(THREDDS_AUTHENTICATION_TYPE)
-        #datasource.authentication.name = 'cgsn'
-        #datasource.authentication.password = "ISMT2!!"
-
-
-        # Just create it - the workbench/datastore will take care of the rest!
-        asssociation = yield self.ac.create_association(datasource, HAS_A_ID,  dataset)
-
-        yield self.rc.put_resource_transaction([dataset, datasource])
-
-
-        #log.debug(dataset.ResourceObject.Debug())
+        # USGS_Test.nc from res/apps/ncserver.app, set 'dataset_url' in the config to use REMOTE_DATASET_URL instead
+        dataset_url = yield get_dataset_url(self.proc, CONF.getValue('dataset_url', None))
+        dataset, datasource = yield create_ingest_resources(self.rc, self.ac, dataset_url)
 
         log.info('Created dataset and datasource for testing')
 
@@ -137,43 +106,33 @@ class IntTestIngest(ItvTestCase):
         yield sub_added.initialize()
         yield sub_added.activate()
 
-        sub_added.ondata = lambda msg: test_deferred.callback( msg['content'].additional_data.datasource_id)
-
-        test_deferred = defer.Deferred()
+        added = EventWait(extract=lambda msg: msg['content'].additional_data.datasource_id)
+        sub_added.ondata = added
 
         log.info('Created subscriber to listen for test results')
 
+        # the rpc path ingests inside call_jaw, so time and bound it from before the call
+        started = time.time()
         yield call_jaw(dataset.ResourceIdentity, datasource.ResourceIdentity)
 
 
 
-        datasource_id = yield test_deferred
+        timeout = CONF.getValue('ingest_timeout', INGEST_TIMEOUT)
+        met = yield added.wait(1, started + timeout - time.time())
+        self.failUnless(met, "No supplement added event within %.0fs" % (time.time() - started))
+        log.info('Ingested in %.1fs' % (added.times[0] - started))
 
-        self.assertEqual(datasource_id, datasource.ResourceIdentity)
+        self.assertEqual(added.values[0], datasource.ResourceIdentity)
 
 
-    @defer.inlineCallbacks
     def rpc_call_jaw(self, dataset_id, datasource_id):
 
-        # get a subscriber going to notification from ingest service
-        jawc = JavaAgentWrapperClient()
-        resp = yield jawc.request_update(dataset_id, datasource_id)
+        return rpc_call_jaw(dataset_id, datasource_id)
 
 
-    @defer.inlineCallbacks
     def scheduled_jaw_event(self, dataset_id, datasource_id):
 
-        pub = ScheduleEventPublisher(process=self.proc)
-
-        msg = yield pub.create_event(origin=SCHEDULE_TYPE_PERFORM_INGESTION_UPDATE,
-                                          task_id="manage_data_resource_FAKED_TASK_ID")
-
-        msg.additional_data.payload = msg.CreateObject(SCHEDULER_PERFORM_INGEST)
-        msg.additional_data.payload.dataset_id     = dataset_id
-        msg.additional_data.payload.datasource_id  = datasource_id
-
-
-        yield pub.publish_event(msg, origin=SCHEDULE_TYPE_PERFORM_INGESTION_UPDATE)
+        return scheduled_jaw_event(self.proc, dataset_id, datasource_id)
 
 
 